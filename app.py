@@ -1,10 +1,153 @@
 import streamlit as st
-import io
-import tempfile
-import os
-import time
 import pandas as pd
-from utils import create_multi_barcode_sheet, save_sheets_as_pdf
+from concurrent.futures import ThreadPoolExecutor
+from background import GenerationJob
+from render_cache import render_cache
+from spec_table import (RANGE_COLUMNS, SPEC_COLUMNS, combine_tables, read_table, table_to_specs, validate_ranges,
+                        validate_table)
+
+SAMPLE_ROWS = [
+    {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
+    {'number': '1120000250625', 'count': 25, 'title': 'Product B'},
+    {'number': '1120000250808', 'count': 36, 'title': 'Product C'}
+]
+
+# Print head resolutions offered for the ZPL download (the first is the default)
+ZPL_DPI_OPTIONS = [203, 300, 600]
+
+def format_barcode_number(item):
+    """Text shown for a list entry: the number, or the first/last serial of a range"""
+    if 'start' not in item:
+        return item['number']
+    prefix = item.get('prefix', '')
+    last = int(item['start']) + (int(item['count']) - 1) * int(item.get('step', 1))
+    return f"{prefix}{item['start']} … {prefix}{last}"
+
+def set_barcode_table(table):
+    """Replace the barcode list and reset the editor so it shows the new rows
+    
+    The editor keeps the user's pending edits under its widget key; a new
+    key makes it start again from the stored table.
+    """
+    st.session_state.barcode_table = table.reset_index(drop=True)
+    st.session_state.editor_version += 1
+
+def set_serial_ranges(ranges):
+    """Replace the serial range list (see set_barcode_table)"""
+    st.session_state.serial_ranges = pd.DataFrame(ranges, columns=RANGE_COLUMNS)
+    st.session_state.editor_version += 1
+
+def session_executor():
+    """The session's generation thread (one job at a time per browser session)"""
+    if 'executor' not in st.session_state:
+        st.session_state.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+    return st.session_state.executor
+
+def start_generation(barcode_specs, printer_dpi):
+    """Cancel the session's running job, if any, and start a new one in the background
+    
+    The PDF is written straight into memory. Identical jobs (from any session)
+    come from the shared render cache, and after a list edit only the sheets
+    whose labels changed are rendered again.
+    """
+    previous = st.session_state.get('job')
+    if previous is not None and not previous.finished_state:
+        previous.cancel()
+    job = GenerationJob(barcode_specs, cache=render_cache, printer_dpi=printer_dpi)
+    st.session_state.job = job.start(session_executor())
+
+def show_job(job, polling, barcode_specs):
+    """Progress, previews and cancel button for a running job; results once it is done
+    
+    Runs as a fragment that polls while the job is running, so the rest of the
+    page (the list editor) stays usable.
+    """
+    if job.finished_state and polling:
+        # Rerun the whole page once, to show the results and stop polling
+        st.rerun()
+    
+    if not job.finished_state:
+        if job.pages_total is None:
+            st.progress(0.0, text="Planning layout...")
+        else:
+            st.progress(job.progress, text=f"Rendering page {job.pages_done} of {job.pages_total}")
+        cancel_col, note_col = st.columns([1, 3])
+        with cancel_col:
+            if st.button("⏹️ Cancel", use_container_width=True, disabled=job.cancel_event.is_set()):
+                job.cancel()
+        with note_col:
+            st.caption("You can keep editing the list while the PDF is generated.")
+    
+    previews = list(job.previews)
+    if previews:
+        st.subheader("📋 Preview")
+        for i, preview in enumerate(previews):
+            st.image(preview, caption=f"Sheet {i+1} of {job.pages_total}", use_container_width=True)
+        if job.pages_total and job.pages_total > len(previews) and job.state == 'done':
+            st.info(f"Showing preview of first {len(previews)} sheets. Total sheets: {job.pages_total}")
+    
+    if job.state == 'cancelled':
+        st.warning(f"⏹️ Generation cancelled after {job.pages_done} of {job.pages_total or '?'} page(s).")
+    elif job.state == 'failed':
+        st.error(f"❌ Error generating barcodes: {job.error}")
+    elif job.state == 'done':
+        show_results(job, barcode_specs)
+
+def show_results(job, barcode_specs):
+    """Success message, download button and summary of a finished job"""
+    sheet_count = job.pages_total
+    cache_note = " (served from cache)" if job.from_cache else ""
+    st.success(f"✅ Successfully generated {job.labels} barcodes on {sheet_count} sheet(s){cache_note}!")
+    if job.page_stats.get('reused'):
+        st.info(f"♻️ Reused {job.page_stats['reused']} unchanged page(s); rendered {job.page_stats['rendered']}")
+    if job.page_stats.get('repeated'):
+        st.info(f"📑 {job.page_stats['repeated']} identical page(s) share one stored image")
+    if job.specs != barcode_specs:
+        st.caption("✏️ The list has changed since this PDF was generated.")
+    
+    # Download button for PDF
+    st.subheader("📥 Download")
+    filename = f"multi_barcodes_{len(job.specs)}_types_{job.labels}_total.pdf"
+    
+    st.download_button(
+        label=f"📄 Download PDF ({sheet_count} sheet{'s' if sheet_count > 1 else ''})",
+        data=job.pdf,
+        file_name=filename,
+        mime="application/pdf",
+        use_container_width=True
+    )
+    # The same labels as printer commands: a few KB instead of raster pages
+    st.download_button(
+        label=f"🏷️ Download ZPL for label printers ({job.printer_dpi} DPI, {len(job.zpl) / 1024:.1f} KB)",
+        data=job.zpl,
+        file_name=filename[:-len('.pdf')] + ".zpl",
+        mime="text/plain",
+        use_container_width=True
+    )
+    # Display summary
+    st.markdown("---")
+    st.subheader("📊 Generation Summary")
+    summary_df = pd.DataFrame([
+        {'Barcode Number': format_barcode_number(spec), 'Quantity Generated': spec['count'], 'Title/Name': spec.get('title', '')}
+        for spec in job.specs
+    ])
+    st.dataframe(summary_df, use_container_width=True)
+    cache_stats = render_cache.stats()
+    st.caption(f"🗄️ Render cache hit rate: {cache_stats['hit_rate']:.0%} "
+               f"({cache_stats['memory_hits']} from memory, {cache_stats['disk_hits']} from disk, "
+               f"{cache_stats['misses']} misses)")
+    
+    # Where the time went
+    report = dict(job.report, render_cache=cache_stats)
+    timing_df = pd.DataFrame([
+        {'Stage': stage, 'Seconds': values['seconds'], 'Calls': values['calls']}
+        for stage, values in report['stages'].items()
+    ])
+    st.dataframe(timing_df, use_container_width=True, hide_index=True)
+    peak = f", peak memory {report['peak_rss_mb']:.0f} MB" if report['peak_rss_mb'] is not None else ""
+    st.caption(f"⏱️ {report['seconds']:.2f} s total{peak}")
+    with st.expander("Metrics report (JSON)"):
+        st.json(report)
 
 def main():
     st.set_page_config(
@@ -21,15 +164,15 @@ def main():
     
     with col1:
         st.subheader("🎯 Barcode Specifications")
-          # Initialize session state for barcode list
-        if 'barcode_list' not in st.session_state:
-            st.session_state.barcode_list = [
-                {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
-                {'number': '1120000250625', 'count': 25, 'title': 'Product B'},
-                {'number': '1120000250808', 'count': 36, 'title': 'Product C'}
-            ]
-          # Form for adding new barcodes
-        with st.form("add_barcode_form"):
+        # Initialize session state for the barcode list (a table, so it stays
+        # fast with tens of thousands of rows) and the serial ranges
+        if 'barcode_table' not in st.session_state:
+            st.session_state.barcode_table = pd.DataFrame(SAMPLE_ROWS, columns=SPEC_COLUMNS)
+            st.session_state.serial_ranges = pd.DataFrame(columns=RANGE_COLUMNS)
+            st.session_state.editor_version = 0
+        
+        # Form for adding new barcodes
+        with st.form("add_barcode_form", clear_on_submit=True):
             st.markdown("**Add New Barcode:**")
             add_col1, add_col2, add_col3, add_col4 = st.columns([2, 1, 1.5, 1])
             
@@ -61,160 +204,190 @@ def main():
             with add_col4:
                 st.markdown("<br>", unsafe_allow_html=True)  # Add spacing
                 add_button = st.form_submit_button("➕ Add", use_container_width=True)
-          # Add barcode to list
+        
+        # Form for adding a range of consecutive serial numbers
+        with st.expander("🔢 Add Serial Number Range"):
+            with st.form("add_range_form"):
+                range_col1, range_col2, range_col3 = st.columns([2, 1, 1])
+                with range_col1:
+                    range_start = st.text_input("Start Number:", placeholder="e.g., 100000", key="range_start")
+                with range_col2:
+                    range_count = st.number_input("How Many:", min_value=1, max_value=1000000, value=100, step=1, key="range_count")
+                with range_col3:
+                    range_step = st.number_input("Step:", value=1, step=1, key="range_step")
+                
+                range_col4, range_col5, range_col6 = st.columns([1, 2, 1])
+                with range_col4:
+                    range_prefix = st.text_input("Prefix:", placeholder="e.g., AST-", key="range_prefix")
+                with range_col5:
+                    range_title = st.text_input(
+                        "Title Template:",
+                        placeholder="e.g., Asset {index}",
+                        key="range_title",
+                        help="Optional. {number} is the full barcode text, {serial} the number and {index} the position in the range"
+                    )
+                with range_col6:
+                    st.markdown("<br>", unsafe_allow_html=True)  # Add spacing
+                    add_range_button = st.form_submit_button("➕ Add Range", use_container_width=True)
+        
+        # Bulk import: a CSV/XLSX file or rows pasted from a spreadsheet
+        with st.expander("📥 Import from CSV / Excel / Paste"):
+            with st.form("import_form", clear_on_submit=True):
+                uploaded = st.file_uploader(
+                    "CSV or Excel file:",
+                    type=['csv', 'txt', 'xlsx'],
+                    help="Columns number, count, title (a header row is optional)"
+                )
+                pasted = st.text_area(
+                    "Or paste rows:",
+                    placeholder="1120000250608\t25\tProduct A",
+                    height=120,
+                    help="One barcode per line: number, quantity, title (tab, comma or semicolon separated)"
+                )
+                import_button = st.form_submit_button("📥 Import", use_container_width=True)
+        
+        # Display current barcode list as one editable, virtualized table
+        st.markdown("**Current Barcode List:**")
+        version = st.session_state.editor_version
+        edited_table = st.data_editor(
+            st.session_state.barcode_table,
+            key=f"barcode_editor_{version}",
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                'number': st.column_config.TextColumn("Barcode Number", required=True),
+                'count': st.column_config.NumberColumn("Quantity", min_value=1, step=1, required=True),
+                'title': st.column_config.TextColumn("Title/Name"),
+            },
+        )
+        barcode_table, table_errors = validate_table(edited_table)
+        if table_errors:
+            st.warning(f"⚠️ {len(table_errors)} row(s) will be skipped: " + "; ".join(table_errors[:5])
+                       + (" …" if len(table_errors) > 5 else ""))
+        
+        serial_ranges = st.session_state.serial_ranges
+        if len(serial_ranges):
+            st.markdown("**Serial Number Ranges:**")
+            serial_ranges = st.data_editor(
+                serial_ranges,
+                key=f"range_editor_{version}",
+                num_rows="dynamic",
+                use_container_width=True,
+                column_config={
+                    'start': st.column_config.TextColumn("Start Number", required=True),
+                    'count': st.column_config.NumberColumn("How Many", min_value=1, step=1, required=True),
+                    'step': st.column_config.NumberColumn("Step", step=1),
+                    'prefix': st.column_config.TextColumn("Prefix"),
+                    'title': st.column_config.TextColumn("Title Template"),
+                },
+            )
+        range_specs, range_errors = validate_ranges(serial_ranges)
+        if range_errors:
+            st.warning(f"⚠️ {len(range_errors)} range(s) will be skipped: " + "; ".join(range_errors[:5])
+                       + (" …" if len(range_errors) > 5 else ""))
+        
+        # Apply additions on top of any edits made in the tables
         if add_button and new_barcode:
-            st.session_state.barcode_list.append({
-                'number': new_barcode,
-                'count': new_count,
-                'title': new_title if new_title else ''
-            })
+            added = pd.DataFrame([{'number': new_barcode, 'count': new_count, 'title': new_title or ''}])
+            new_rows, errors = validate_table(added)
+            if errors:
+                st.error(f"❌ {errors[0].split(': ', 1)[1]}")
+            else:
+                set_barcode_table(combine_tables(barcode_table, new_rows))
+                st.rerun()
+        
+        if add_range_button and range_start:
+            set_serial_ranges(serial_ranges.to_dict('records') + [{
+                'start': range_start,
+                'count': range_count,
+                'step': range_step,
+                'prefix': range_prefix,
+                'title': range_title
+            }])
             st.rerun()
-          # Display current barcode list
-        st.markdown("**Current Barcode List:**")
-        if st.session_state.barcode_list:
-            # Create DataFrame for display
-            df = pd.DataFrame(st.session_state.barcode_list)
-            df.index = df.index + 1  # Start index from 1
-            df.columns = ['Barcode Number', 'Quantity', 'Title/Name']
-            
-            # Display as table with actions
-            for idx, row in df.iterrows():
-                cols = st.columns([2, 1, 1.5, 1])
-                with cols[0]:
-                    st.text(f"{idx}. {row['Barcode Number']}")
-                with cols[1]:
-                    st.text(f"Qty: {row['Quantity']}")
-                with cols[2]:
-                    title_display = row['Title/Name'] if row['Title/Name'] else '(No title)'
-                    st.text(f"Title: {title_display}")
-                with cols[3]:
-                    if st.button("🗑️", key=f"delete_{idx}", help="Delete this barcode"):
-                        st.session_state.barcode_list.pop(idx - 1)
-                        st.rerun()
-            
-            # Summary
-            total_barcodes = sum(item['count'] for item in st.session_state.barcode_list)
-            st.info(f"📊 **Total barcodes to generate:** {total_barcodes}")
-            
+        
+        if import_button and (uploaded is not None or pasted.strip()):
+            try:
+                if uploaded is not None:
+                    raw = read_table(uploaded.getvalue(), uploaded.name)
+                else:
+                    raw = read_table(pasted)
+                imported, errors = validate_table(raw)
+            except (ValueError, pd.errors.ParserError) as e:
+                st.error(f"❌ Could not import: {e}")
+            else:
+                # Kept in the session so they survive the rerun below
+                st.session_state.import_messages = []
+                if errors:
+                    st.session_state.import_messages.append(
+                        (st.warning, f"⚠️ Skipped {len(errors)} invalid row(s): " + "; ".join(errors[:5])
+                         + (" …" if len(errors) > 5 else "")))
+                if len(imported):
+                    st.session_state.import_messages.append(
+                        (st.success, f"📥 Imported {len(raw) - len(errors)} row(s) as "
+                                     f"{len(imported)} barcode(s) (duplicates merged)"))
+                    set_barcode_table(combine_tables(barcode_table, imported))
+                    st.rerun()
+        
+        for show, message in st.session_state.pop('import_messages', []):
+            show(message)
+        
+        # Summary
+        total_barcodes = int(barcode_table['count'].sum()) + sum(spec['count'] for spec in range_specs)
+        if total_barcodes:
+            st.info(f"📊 **Total barcodes to generate:** {total_barcodes} "
+                    f"({len(barcode_table)} barcode(s), {len(range_specs)} range(s))")
         else:
             st.warning("No barcodes added yet. Add some barcodes to generate.")
+        barcode_specs = table_to_specs(barcode_table) + range_specs
     
     with col2:
         st.subheader("⚙️ Settings & Actions")
         
         # Clear all button
         if st.button("🗑️ Clear All", use_container_width=True):
-            st.session_state.barcode_list = []
+            set_barcode_table(pd.DataFrame(columns=SPEC_COLUMNS))
+            set_serial_ranges([])
             st.rerun()
           # Load sample data button
         if st.button("📝 Load Sample Data", use_container_width=True):
-            st.session_state.barcode_list = [
-                {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
-                {'number': '1120000250625', 'count': 25, 'title': 'Product B'},
-                {'number': '1120000250808', 'count': 36, 'title': 'Product C'}
-            ]
+            set_barcode_table(pd.DataFrame(SAMPLE_ROWS, columns=SPEC_COLUMNS))
+            set_serial_ranges([])
             st.rerun()
         
         st.markdown("---")
         
+        # Shared render cache statistics (all sessions)
+        cache_stats = render_cache.stats()
+        st.caption(
+            f"🗄️ Render cache: {cache_stats['hits']} hits / {cache_stats['hits'] + cache_stats['misses']} lookups "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, "
+            f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB"
+        )
+        
+        printer_dpi = st.selectbox(
+            "Label printer resolution (ZPL):",
+            ZPL_DPI_OPTIONS,
+            format_func=lambda dpi: f"{dpi} DPI",
+            help="For the ZPL download, sent straight to thermal label printers"
+        )
+        
         # Generate button
         generate_button = st.button(
             "🔄 Generate Barcodes", 
             use_container_width=True,
             type="primary",
-            disabled=len(st.session_state.barcode_list) == 0
+            disabled=len(barcode_specs) == 0
         )
     
-    # Process form submission
-    if generate_button and st.session_state.barcode_list:
-        with st.spinner("Generating barcodes..."):
-            try:                # Prepare barcode specifications
-                barcode_specs = [
-                    {
-                        'number': int(item['number']), 
-                        'count': int(item['count']),
-                        'title': item.get('title', '')
-                    }
-                    for item in st.session_state.barcode_list
-                ]
-                
-                # Generate the barcode sheets
-                sheets = create_multi_barcode_sheet(barcode_specs)
-                
-                # Ensure sheets is always a list
-                if not isinstance(sheets, list):
-                    sheets = [sheets]
-                
-                # Create temporary file for PDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file_path = tmp_file.name
-                
-                # Save as PDF
-                save_sheets_as_pdf(sheets, tmp_file_path)
-                
-                # Read the PDF file
-                with open(tmp_file_path, 'rb') as f:
-                    pdf_data = f.read()
-                
-                # Clean up temporary file
-                try:
-                    time.sleep(0.1)  # Small delay to ensure file is released
-                    os.unlink(tmp_file_path)
-                except PermissionError:
-                    # If we can't delete it immediately, it will be cleaned up by the OS later
-                    pass
-                
-                # Success message
-                total_barcodes = sum(item['count'] for item in st.session_state.barcode_list)
-                st.success(f"✅ Successfully generated {total_barcodes} barcodes on {len(sheets)} sheet(s)!")
-                
-                # Display previews
-                st.subheader("📋 Preview")
-                
-                for i, sheet in enumerate(sheets[:3]):  # Show max 3 sheets for performance
-                    # Display preview (convert to PNG for web display)
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_png:
-                        tmp_png_path = tmp_png.name
-                    
-                    # Create a smaller version for preview
-                    preview_img = sheet.copy()
-                    preview_img.thumbnail((600, 800), Image.Resampling.LANCZOS)
-                    preview_img.save(tmp_png_path, format='PNG')
-                    
-                    # Display preview
-                    st.image(tmp_png_path, caption=f"Sheet {i+1} of {len(sheets)}", use_column_width=True)
-                    
-                    # Clean up
-                    try:
-                        time.sleep(0.1)
-                        os.unlink(tmp_png_path)
-                    except PermissionError:
-                        pass
-                
-                if len(sheets) > 3:
-                    st.info(f"Showing preview of first 3 sheets. Total sheets: {len(sheets)}")
-                
-                # Download button for PDF
-                st.subheader("📥 Download")
-                filename = f"multi_barcodes_{len(st.session_state.barcode_list)}_types_{total_barcodes}_total.pdf"
-                
-                st.download_button(
-                    label=f"📄 Download PDF ({len(sheets)} sheet{'s' if len(sheets) > 1 else ''})",
-                    data=pdf_data,
-                    file_name=filename,
-                    mime="application/pdf",
-                    use_container_width=True
-                )
-                  # Display summary
-                st.markdown("---")
-                st.subheader("📊 Generation Summary")
-                summary_df = pd.DataFrame(st.session_state.barcode_list)
-                summary_df.columns = ['Barcode Number', 'Quantity Generated', 'Title/Name']
-                st.dataframe(summary_df, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"❌ Error generating barcodes: {str(e)}")
-                st.exception(e)
+    # Generation runs in the background; this panel follows it
+    if generate_button and barcode_specs:
+        start_generation(barcode_specs, printer_dpi)
+    
+    job = st.session_state.get('job')
+    if job is not None:
+        polling = not job.finished_state
+        st.fragment(show_job, run_every=0.5 if polling else None)(job, polling, barcode_specs)
     
     # Instructions
     st.markdown("---")
@@ -223,7 +396,7 @@ def main():
     
     1. **Add Barcodes**: Enter each barcode number, specify quantity, and add a custom title/name
     2. **Review List**: Check your barcode list in the table above
-    3. **Generate**: Click "Generate Barcodes" to create your PDF
+    3. **Generate**: Click "Generate Barcodes" to create your PDF (it runs in the background: watch the progress, cancel, or keep editing the list)
     4. **Download**: Get your multi-page PDF with all barcodes organized efficiently
     
     #### 💡 Features:
@@ -233,6 +406,7 @@ def main():
     - **Optimal layout**: Barcodes are arranged efficiently on each sheet
     - **High quality**: Generated PDFs are print-ready at 300 DPI resolution
     - **Batch processing**: Generate hundreds of barcodes in one go
+    - **Serial ranges**: Number asset tags consecutively (e.g. AST-100000 to AST-199999) without typing each one
     
     #### 📋 Example Input:
     ```
@@ -251,9 +425,4 @@ def main():
     """)
 
 if __name__ == "__main__":
-    # Import PIL here to avoid issues if not installed
-    try:
-        from PIL import Image
-        main()
-    except ImportError:
-        st.error("❌ PIL (Pillow) library is required. Please install it with: pip install Pillow")
+    main()
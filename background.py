@@ -0,0 +1,141 @@
+# Background PDF generation for interactive sessions (the Streamlit app)
+
+import io
+import threading
+import time
+
+from metrics import RenderMetrics
+from render_cache import job_key
+from utils import plan_sheets, render_preview, write_plan_pdf
+from zpl import DEFAULT_DPI, write_zpl
+
+# Pages shown as previews while a job runs
+PREVIEW_PAGES = 3
+PREVIEW_SIZE = (600, 800)
+
+class JobCancelled(Exception):
+    """Raised inside a job's thread when the job is cancelled"""
+
+class GenerationJob:
+    """One PDF generation running off the script thread
+
+    The job owns a copy of its specs, so the list can be edited while it
+    runs. Its fields are written by the worker thread and only read by the
+    UI: ``state`` ('queued', 'running', 'done', 'failed' or 'cancelled'),
+    ``pages_done``/``pages_total``, ``previews`` (thumbnails of the first
+    PREVIEW_PAGES pages, appended as they are written) and, once done,
+    ``pdf``, ``zpl`` (the same labels for a label printer at ``printer_dpi``),
+    ``page_stats``, ``from_cache`` and ``report``.
+
+    With a ``cache`` (a render_cache.RenderCache) identical jobs from any
+    session are served from it, and unchanged pages are reused. ``workers``
+    is passed on to write_plan_pdf; it defaults to 1 because jobs run on
+    threads of a multithreaded server, where forking a process pool could
+    copy another thread's held lock into the children (service.py renders
+    serially for the same reason).
+    """
+
+    def __init__(self, specs, cache=None, printer_dpi=DEFAULT_DPI, workers=1):
+        self.specs = [dict(spec) for spec in specs]
+        self.cache = cache
+        self.workers = workers
+        self.printer_dpi = printer_dpi
+        self.state = 'queued'
+        self.pages_done = 0
+        self.pages_total = None
+        self.labels = None
+        self.previews = []
+        self.pdf = None
+        self.zpl = None
+        self.page_stats = {}
+        self.from_cache = False
+        self.report = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished_state(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    @property
+    def progress(self):
+        """Fraction of pages written (0.0 until the job is planned)"""
+        return self.pages_done / self.pages_total if self.pages_total else 0.0
+
+    def start(self, executor):
+        """Run the job on ``executor`` (a concurrent.futures executor); returns self"""
+        self.future = executor.submit(self.run)
+        return self
+
+    def cancel(self):
+        """Ask the job to stop; it does so after the page being rendered"""
+        self.cancel_event.set()
+        if self.state == 'queued':
+            self.state = 'cancelled'
+            self.finished = time.time()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (mainly for tests); returns self"""
+        if self.future is not None:
+            self.future.result(timeout)
+        return self
+
+    def run(self):
+        if self.cancel_event.is_set():
+            return
+        self.state = 'running'
+        self.started = time.time()
+        try:
+            metrics = RenderMetrics(on_progress=self._on_progress)
+            plan = plan_sheets(self.specs, metrics=metrics)
+            self.labels = plan.total
+            self.pages_total = plan.sheets
+            self._check_cancelled()
+
+            if self.cache is not None:
+                key = job_key(self.specs, output='pdf', dpi=300, mode='RGB')
+                self.pdf, self.from_cache = self.cache.get_or_create(key, lambda: self._build(plan, metrics),
+                                                                     check_cancelled=self._check_cancelled)
+            else:
+                self.pdf = self._build(plan, metrics)
+            if self.from_cache:
+                self.pages_done = plan.sheets
+                for sheet in range(min(plan.sheets, PREVIEW_PAGES)):
+                    self.previews.append(render_preview(plan, sheet, PREVIEW_SIZE))
+            self._check_cancelled()
+            zpl = io.BytesIO()
+            write_zpl(self.specs, zpl, dpi=self.printer_dpi)
+            self.zpl = zpl.getvalue()
+            self.report = metrics.report()
+            self.state = 'done'
+        except JobCancelled:
+            self.state = 'cancelled'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            self.finished = time.time()
+
+    def _build(self, plan, metrics):
+        """Write the PDF into memory, keeping a thumbnail of the first pages"""
+        def on_page(sheet, image, fingerprint):
+            if sheet < PREVIEW_PAGES:
+                # Drawn from the layout at screen size, never from a copy of the full page
+                self.previews.append(render_preview(plan, sheet, PREVIEW_SIZE))
+
+        buffer = io.BytesIO()
+        self.page_stats = write_plan_pdf(plan, buffer, cache=self.cache, workers=self.workers,
+                                         on_page=on_page, metrics=metrics)
+        return buffer.getvalue()
+
+    def _on_progress(self, stage, done, total):
+        if stage == 'write':
+            self.pages_done = done
+        self._check_cancelled()
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the barcode rendering pipeline
+
+The suite renders labels through generate_single_barcode,
+generate_barcode_with_title, create_multi_barcode_sheet and
+save_sheets_as_pdf at 1, 100, 10k and 100k labels. Sheet and PDF jobs run
+with and without titles, and with 13-digit or mixed-length numbers. Every
+case runs in a fresh process, so its peak RSS is its own.
+
+    python bench.py --save bench_baseline.json       # record a baseline
+    python bench.py --compare bench_baseline.json    # flag regressions (exit 1)
+    python bench.py --scales 1,100 --only pdf        # a quick subset
+    python bench.py --engines --labels 500           # ImageWriter vs direct raster
+
+Fonts are never downloaded (BARCODE_FONTS_OFFLINE is set), so the suite runs
+offline; without a system or bundled font the titles use Pillow's default.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import FONTS_OFFLINE_ENV, generate_single_barcode_imagewriter
+from raster import render_code128
+
+# Same options create_multi_barcode_sheet uses
+OPTIONS = {
+    'module_width': 0.25,
+    'module_height': 8.0,
+    'quiet_zone': 3.0,
+    'font_size': 6,
+    'text_distance': 3.0,
+    'background': 'white',
+    'foreground': 'black',
+}
+
+SCALES = (1, 100, 10000, 100000)
+# Number lengths cycled through by the mixed-length variants
+MIXED_LENGTHS = (4, 8, 13, 20)
+# Distinct barcodes in a sheet or PDF job; the labels are shared out between them
+DISTINCT_PER_JOB = 100
+# Larger sheet jobs are streamed (iter_barcode_sheets) instead of held as a list
+IN_MEMORY_LABELS = 1000
+# Default slack before a change counts as a regression
+TOLERANCE = 0.15
+
+def time_per_label(render, numbers):
+    """Return the mean seconds per label for ``render(number)``"""
+    start = time.perf_counter()
+    for number in numbers:
+        render(number)
+    return (time.perf_counter() - start) / len(numbers)
+
+def bench_render(labels=500):
+    """Compare the ImageWriter PNG round trip with the direct raster engine"""
+    numbers = [1120000250608 + i for i in range(labels)]
+
+    imagewriter = time_per_label(lambda n: generate_single_barcode_imagewriter(n, OPTIONS).load(), numbers)
+    raster = time_per_label(lambda n: render_code128(n, OPTIONS), numbers)
+
+    print(f"Rendered {labels} distinct labels per engine")
+    print(f"ImageWriter + PNG round trip: {imagewriter * 1000:.3f} ms/label")
+    print(f"Direct raster:                {raster * 1000:.3f} ms/label")
+    print(f"Speedup:                      {imagewriter / raster:.1f}x")
+    return {'imagewriter': imagewriter, 'raster': raster}
+
+def make_numbers(count, mixed=False):
+    """``count`` distinct barcode numbers, all 13 digits or cycling through MIXED_LENGTHS"""
+    if not mixed:
+        return [str(1120000250608 + i) for i in range(count)]
+    numbers = []
+    for i in range(count):
+        length = MIXED_LENGTHS[i % len(MIXED_LENGTHS)]
+        numbers.append(str(10 ** (length - 1) + i))
+    return numbers
+
+def make_specs(labels, titles=False, mixed=False):
+    """A job of ``labels`` labels spread over up to DISTINCT_PER_JOB barcodes"""
+    distinct = min(labels, DISTINCT_PER_JOB)
+    numbers = make_numbers(distinct, mixed)
+    specs = []
+    for i, number in enumerate(numbers):
+        count = labels // distinct + (1 if i < labels % distinct else 0)
+        specs.append({'number': number, 'count': count, 'title': f"Product {i + 1}" if titles else ''})
+    return specs
+
+def build_cases(scales=SCALES, only=None):
+    """Every benchmark case as a dict of name, kind, labels and variant flags"""
+    variants = [(False, False), (False, True), (True, False), (True, True)]
+    cases = []
+    for labels in scales:
+        for kind in ('single', 'titled', 'sheets', 'pdf'):
+            for titles, mixed in variants:
+                # The tile functions have a fixed title setting
+                if kind == 'single' and titles or kind == 'titled' and not titles:
+                    continue
+                name = f"{kind}-{labels}" + ("-titles" if titles else "") + ("-mixed" if mixed else "")
+                cases.append({'name': name, 'kind': kind, 'labels': labels, 'titles': titles, 'mixed': mixed})
+    if only:
+        cases = [case for case in cases if case['kind'] in only]
+    return cases
+
+def run_case(case, workers=1):
+    """Run one case in this process and return its result (call in a fresh process)"""
+    from metrics import RenderMetrics, peak_rss_mb
+    from utils import (create_multi_barcode_sheet, generate_barcode_with_title, generate_single_barcode,
+                       iter_barcode_sheets, save_sheets_as_pdf)
+
+    labels, kind = case['labels'], case['kind']
+    result = {'labels': labels, 'kind': kind}
+    metrics = RenderMetrics()
+    output_bytes = 0
+
+    started = time.perf_counter()
+    if kind in ('single', 'titled'):
+        for i, number in enumerate(make_numbers(labels, case['mixed'])):
+            if kind == 'single':
+                tile = generate_single_barcode(number, OPTIONS)
+            else:
+                tile = generate_barcode_with_title(number, f"Product {i + 1}", OPTIONS)
+            output_bytes += len(tile.getbands()) * tile.width * tile.height
+    elif kind == 'sheets':
+        specs = make_specs(labels, case['titles'], case['mixed'])
+        if labels <= IN_MEMORY_LABELS:
+            result['api'] = 'create_multi_barcode_sheet'
+            sheets = create_multi_barcode_sheet(specs, workers=workers, metrics=metrics)
+            sheets = [sheets] if not isinstance(sheets, list) else sheets
+        else:
+            result['api'] = 'iter_barcode_sheets'
+            sheets = iter_barcode_sheets(specs, workers=workers, metrics=metrics)
+        for sheet in sheets:
+            output_bytes += len(sheet.getbands()) * sheet.width * sheet.height
+        del sheets
+    else:
+        specs = make_specs(labels, case['titles'], case['mixed'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.pdf")
+            save_sheets_as_pdf(iter_barcode_sheets(specs, workers=workers, metrics=metrics), path)
+            output_bytes = os.path.getsize(path)
+    elapsed = time.perf_counter() - started
+
+    result.update({
+        'seconds': round(elapsed, 4),
+        'labels_per_second': round(labels / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_rss_children_mb': peak_rss_mb(children=True),
+        'output_bytes': output_bytes,
+    })
+    if kind in ('sheets', 'pdf'):
+        result['sheets'] = metrics.sheets
+        result['stages'] = {stage: round(seconds, 4) for stage, seconds in metrics.seconds.items()}
+    return result
+
+def run_suite(cases, workers=1, log=sys.stderr):
+    """Run each case in its own spawned process and return {name: result}"""
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, case, workers).result()
+        results[case['name']] = result
+        print(f"{case['name']:<28} {result['labels_per_second'] or 0:>12,.1f} labels/s "
+              f"{result['peak_rss_mb'] or 0:>8.1f} MB {result['output_bytes']:>14,} bytes", file=log)
+    return results
+
+def environment():
+    """Machine and library details stored alongside a baseline"""
+    import PIL
+    import barcode
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'python_barcode': getattr(barcode, 'version', None),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def compare_results(baseline, current, tolerance=TOLERANCE):
+    """Return a list of regression messages for cases present in both runs
+
+    A case regresses when its throughput falls, or its peak RSS grows, by more
+    than ``tolerance`` (a fraction), or when its output size changes at all.
+    """
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if before.get('labels_per_second') and now.get('labels_per_second') is not None:
+            if now['labels_per_second'] < before['labels_per_second'] * (1 - tolerance):
+                regressions.append(f"{name}: throughput {before['labels_per_second']:,.1f} -> "
+                                   f"{now['labels_per_second']:,.1f} labels/s")
+        if before.get('peak_rss_mb') and now.get('peak_rss_mb') is not None:
+            if now['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f"{name}: peak RSS {before['peak_rss_mb']} -> {now['peak_rss_mb']} MB")
+        if before.get('output_bytes') != now.get('output_bytes'):
+            regressions.append(f"{name}: output size {before.get('output_bytes'):,} -> {now.get('output_bytes'):,} bytes")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark barcode rendering")
+    parser.add_argument('--engines', action='store_true', help="only compare ImageWriter with the direct raster engine")
+    parser.add_argument('--labels', type=int, default=500, help="distinct labels to render per engine (with --engines)")
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                        help="comma-separated label counts (default: 1,100,10000,100000)")
+    parser.add_argument('--only', default=None, help="comma-separated case kinds: single, titled, sheets, pdf")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="render processes for sheet jobs (default: 1)")
+    parser.add_argument('--save', default=None, help="write the results as a JSON baseline")
+    parser.add_argument('--compare', default=None, help="compare against a saved baseline; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed throughput/memory slack as a fraction (default: 0.15)")
+    args = parser.parse_args(argv)
+
+    if args.engines:
+        bench_render(args.labels)
+        return 0
+
+    os.environ.setdefault(FONTS_OFFLINE_ENV, '1')
+    try:
+        scales = [int(value) for value in args.scales.split(',') if value.strip()]
+    except ValueError:
+        parser.error("--scales must be comma-separated integers")
+    only = set(args.only.split(',')) if args.only else None
+    results = run_suite(build_cases(scales, only), workers=args.workers)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline['results'], results, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    if not args.save and not args.compare:
+        print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Command-line batch mode for the barcode sheet generator
+
+Reads barcode rows from a CSV file (or stdin) and streams the sheets straight
+to a PDF or per-sheet PNG files, without Streamlit or pandas:
+
+    python cli.py labels.csv -o labels.pdf
+    cat labels.csv | python cli.py - -o - --format pdf > labels.pdf
+    python cli.py labels.csv -o sheets.png --format png --dpi 203 --workers 4
+    python cli.py labels.csv -o labels.zpl --dpi 203      # native label printer commands
+
+CSV rows are ``number,count,title``. A header row is optional; with one, the
+columns may come in any order, and rows can describe serial ranges with
+``start``, ``count``, ``step``, ``prefix`` and ``title`` (a template, see
+utils.expand_specs) instead of ``number``.
+
+A JSON timing summary, including the per-stage metrics report (see
+metrics.RenderMetrics), is written to stderr when the job finishes (or to the
+file given with ``--summary``).
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+from barcode.codex import Code128
+from barcode.errors import BarcodeError
+from metrics import RenderMetrics
+from utils import plan_sheets, render_pages, write_sheets_pdf, write_vector_pdf
+from zpl import write_zpl
+
+FORMATS = ('pdf', 'png', 'vector-pdf', 'zpl')
+
+class CountingWriter:
+    """Binary file wrapper that counts the bytes written through it"""
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._fp.write(data)
+
+    def flush(self):
+        self._fp.flush()
+
+def read_specs(lines):
+    """Parse CSV lines into barcode specs for create_multi_barcode_sheet"""
+    rows = [row for row in csv.reader(lines) if row and any(cell.strip() for cell in row)]
+    if not rows:
+        raise ValueError("No barcode rows found in the input")
+
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'number' in header or 'start' in header:
+        rows = [dict(zip(header, row)) for row in rows[1:]]
+    else:
+        rows = [dict(zip(('number', 'count', 'title'), row)) for row in rows]
+
+    specs = []
+    for line, row in enumerate(rows, start=1):
+        row = {key: (value or '').strip() for key, value in row.items()}
+        try:
+            count = int(row.get('count') or 1)
+            if row.get('start'):
+                specs.append({
+                    'start': int(row['start']),
+                    'count': count,
+                    'step': int(row.get('step') or 1),
+                    'prefix': row.get('prefix', ''),
+                    'title': row.get('title', ''),
+                })
+            else:
+                specs.append({'number': row['number'], 'count': count, 'title': row.get('title', '')})
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Invalid row {line}: {row}") from e
+        if count < 1:
+            raise ValueError(f"Invalid row {line}: count must be at least 1")
+        try:
+            # Serial numbers are digits, so only a range's prefix can hold a bad character
+            Code128(row['prefix'] if 'start' in specs[-1] else row['number'])
+        except BarcodeError as e:
+            raise ValueError(f"Invalid row {line}: {e}") from e
+    if not specs:
+        raise ValueError("No barcode rows found in the input")
+    return specs
+
+def png_path(output, page, pages):
+    """Per-sheet PNG filename: ``labels.png`` becomes ``labels-001.png`` etc."""
+    if '{page' in output:
+        return output.format(page=page)
+    if pages == 1:
+        return output
+    root, ext = os.path.splitext(output)
+    return f"{root}-{page:0{max(3, len(str(pages)))}d}{ext or '.png'}"
+
+def timed(iterator, timings, key):
+    """Yield from ``iterator``, adding the time spent inside it to ``timings[key]``"""
+    iterator = iter(iterator)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[key] += time.perf_counter() - started
+            return
+        timings[key] += time.perf_counter() - started
+        yield item
+
+def run(specs, output, fmt='pdf', dpi=300, workers=None, mode='RGB', stdout=None, on_progress=None):
+    """Render ``specs`` to ``output`` ('-' for stdout) and return the summary dict
+    
+    ``on_progress(stage, done, total)`` is called per sheet rendered and page written.
+    """
+    stdout = stdout if stdout is not None else sys.stdout.buffer
+    metrics = RenderMetrics(on_progress=on_progress)
+    timings = {'plan': 0.0, 'render': 0.0, 'write': 0.0}
+    started = time.perf_counter()
+
+    if fmt == 'vector-pdf':
+        # Vector pages are drawn and written in one pass
+        target = CountingWriter(stdout) if output == '-' else output
+        pages = write_vector_pdf(specs, target)
+        timings['write'] = time.perf_counter() - started
+        total = sum(int(spec['count']) for spec in specs)
+        files = [output]
+    elif fmt == 'zpl':
+        # No pages: one label format per distinct label, printed by quantity
+        target = CountingWriter(stdout) if output == '-' else output
+        pages = None
+        formats = write_zpl(specs, target, dpi=dpi)
+        timings['write'] = time.perf_counter() - started
+        total = sum(int(spec['count']) for spec in specs)
+        files = [output]
+    else:
+        plan = plan_sheets(specs, mode=mode, dpi=dpi, metrics=metrics)
+        timings['plan'] = time.perf_counter() - started
+        total, pages = plan.total, plan.sheets
+        # PDF pages take RGB jobs as greyscale sheets (see LayoutPlan.page_mode)
+        page_mode = plan.page_mode if fmt == 'pdf' else plan.mode
+        sheets = timed(render_pages(plan, workers=workers, metrics=metrics, mode=page_mode), timings, 'render')
+
+        write_started = time.perf_counter()
+        if fmt == 'pdf':
+            target = CountingWriter(stdout) if output == '-' else output
+            write_sheets_pdf(sheets, target, dpi=dpi, metrics=metrics)
+            files = [output]
+        else:
+            target = CountingWriter(stdout) if output == '-' else None
+            files = []
+            for page, sheet in enumerate(sheets, start=1):
+                if target is not None:
+                    # Complete PNG files back to back
+                    sheet.save(target, format='PNG', dpi=(dpi, dpi))
+                else:
+                    files.append(png_path(output, page, pages))
+                    sheet.save(files[-1], format='PNG', dpi=(dpi, dpi))
+                del sheet
+            if target is not None:
+                target.flush()
+                files = [output]
+        timings['write'] = time.perf_counter() - write_started - timings['render']
+
+    elapsed = time.perf_counter() - started
+    if output == '-':
+        size = target.bytes_written
+    else:
+        size = sum(os.path.getsize(path) for path in files)
+    summary = {
+        'labels': total,
+        'sheets': pages,
+        'format': fmt,
+        'dpi': dpi,
+        'mode': mode,
+        'workers': workers,
+        'output': files,
+        'bytes': size,
+        'seconds': {key: round(value, 4) for key, value in dict(timings, total=elapsed).items()},
+        'labels_per_second': round(total / elapsed, 1) if elapsed else None,
+        'metrics': metrics.report(),
+    }
+    if fmt == 'zpl':
+        summary['formats'] = formats
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate A4 barcode sheets from a CSV of number,count,title rows")
+    parser.add_argument('input', help="CSV file, or - to read from stdin")
+    parser.add_argument('-o', '--output', required=True,
+                        help="output file, or - for stdout; PNG output gets one file per sheet "
+                             "(labels.png -> labels-001.png, or use {page} in the name)")
+    parser.add_argument('-f', '--format', choices=FORMATS, default=None,
+                        help="output format (default: from the output extension, else pdf)")
+    parser.add_argument('--dpi', type=int, default=300, help="sheet resolution, or the printer's for ZPL (default: 300)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="render processes (default: one per CPU, up to 4; 1 = serial)")
+    parser.add_argument('--bilevel', action='store_true',
+                        help="render 1-bit sheets (smaller, lossless PDF pages)")
+    parser.add_argument('--summary', default=None, help="write the JSON timing summary here instead of stderr")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show planning details and per-sheet progress on stderr")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output.lower())[1]
+        fmt = {'.png': 'png', '.zpl': 'zpl'}.get(extension, 'pdf')
+    if args.dpi < 1:
+        parser.error("--dpi must be positive")
+
+    read_started = time.perf_counter()
+    try:
+        if args.input == '-':
+            specs = read_specs(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline=''))
+        else:
+            with open(args.input, newline='', encoding='utf-8-sig') as f:
+                specs = read_specs(f)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    read_seconds = time.perf_counter() - read_started
+
+    def show_progress(stage, done, total):
+        print(f"{stage}: {done}/{total or '?'}", file=sys.stderr)
+    
+    # Progress and planning details go to stderr; stdout may carry the output file
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+    try:
+        summary = run(specs, args.output, fmt=fmt, dpi=args.dpi, workers=args.workers,
+                      mode='1' if args.bilevel else 'RGB', stdout=sys.stdout.buffer,
+                      on_progress=show_progress if args.verbose else None)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    summary['seconds']['read'] = round(read_seconds, 4)
+
+    report = json.dumps(summary)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report, file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
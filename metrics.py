@@ -0,0 +1,129 @@
+# Progress, timing and memory instrumentation for the render pipeline
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# Pipeline stages, in the order a label passes through them
+STAGES = ('plan', 'encode', 'rasterize', 'compose', 'paste', 'pdf_write')
+
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process (or its finished children) in MB, or None
+
+    This is the high-water mark for the process' whole life, not one job.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+class RenderMetrics:
+    """Collects per-stage timers, counters and progress for one render job
+
+    Pass one as ``metrics=`` to plan_sheets, render_pages, write_plan_pdf or
+    write_sheets_pdf. Stage times are summed across sheets (and across pool
+    workers, so with several processes they can exceed the wall time).
+
+    ``on_progress(stage, done, total)`` is called after every sheet rendered
+    ('render') and every page written ('write').
+    """
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.counters = {}
+        self.labels = None
+        self.sheets = None
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the enclosed block as one call of ``stage``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage, seconds, calls=1):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_cache(self, name, before, after):
+        """Add the hits/misses/evictions between two ``stats()`` snapshots of a cache"""
+        for key in ('hits', 'misses', 'evictions'):
+            if key in before:
+                self.count(f"{name}.{key}", after[key] - before[key])
+
+    def set_job(self, labels, sheets):
+        """Record the job size (used for throughput)"""
+        self.labels = labels
+        self.sheets = sheets
+
+    def progress(self, stage, done, total):
+        if self.on_progress is not None:
+            self.on_progress(stage, done, total)
+
+    def stage_totals(self):
+        """Plain-dict stage times and counters (what pool workers send back)"""
+        return {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def merge(self, totals):
+        """Fold in a ``stage_totals()`` dict from another process"""
+        for stage, seconds in totals['seconds'].items():
+            self.add(stage, seconds, totals['calls'].get(stage, 0))
+        for name, amount in totals['counters'].items():
+            self.count(name, amount)
+
+    def report(self):
+        """Return the JSON-friendly report: stages, counters, throughput and peak memory"""
+        elapsed = time.perf_counter() - self.started
+        return {
+            'labels': self.labels,
+            'sheets': self.sheets,
+            'seconds': round(elapsed, 4),
+            'labels_per_second': round(self.labels / elapsed, 1) if self.labels and elapsed else None,
+            'stages': {
+                stage: {'seconds': round(self.seconds[stage], 4), 'calls': self.calls[stage]}
+                for stage in self.seconds
+            },
+            'counters': dict(self.counters),
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(children=True),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+class NullMetrics(RenderMetrics):
+    """The quiet default: same interface, records nothing"""
+
+    @contextmanager
+    def timer(self, stage):
+        yield
+
+    def add(self, stage, seconds, calls=1):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def set_job(self, labels, sheets):
+        pass
+
+    def progress(self, stage, done, total):
+        pass
+
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,278 @@
+# Streaming multi-page PDF writer for barcode sheets
+
+import io
+import math
+import os
+import weakref
+import zlib
+from collections import namedtuple
+
+class EncodedPage(namedtuple('EncodedPage', 'width height entries stream procset')):
+    """A page image already encoded for embedding (see encode_page)
+
+    Encoding is the expensive part of writing a page, so encoded pages can be
+    kept (e.g. in a cache) and written again with PdfStreamWriter.add_encoded_page.
+    """
+
+    __slots__ = ()
+
+    def to_bytes(self):
+        """Serialise to a single blob: a two-line header followed by the stream"""
+        return b"%d %d %s\n%s\n" % (self.width, self.height, self.procset, self.entries) + self.stream
+
+    @classmethod
+    def from_bytes(cls, data):
+        size_line, entries, stream = data.split(b"\n", 2)
+        width, height, procset = size_line.split(b" ")
+        return cls(int(width), int(height), entries, stream, procset)
+
+class PdfStreamWriter:
+    """Write a PDF one page at a time without keeping earlier pages in memory
+
+    Each page image is encoded and written to the output as soon as it is
+    added, then dropped. Only the byte offsets of the written objects are kept
+    until ``close()`` writes the page tree, cross-reference table and trailer,
+    so the output may be any writable binary file-like object (including
+    non-seekable ones such as ``sys.stdout.buffer``).
+
+    Repeated pages are written once: ``repeat_page`` adds a page that shares
+    an earlier page's image XObject and content stream, so a PDF grows with
+    its distinct pages rather than its page count.
+
+    Usage:
+        with PdfStreamWriter('out.pdf', dpi=300) as pdf:
+            for sheet in iter_barcode_sheets(specs):
+                pdf.add_page(sheet)
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, fp, dpi=300, bilevel_compression='flate'):
+        if isinstance(fp, (str, bytes, os.PathLike)):
+            self._fp = open(fp, 'wb')
+            self._owns_fp = True
+        else:
+            self._fp = fp
+            self._owns_fp = False
+        self.dpi = dpi
+        self.bilevel_compression = bilevel_compression
+        self.page_count = 0
+        self._offsets = {}
+        self._page_ids = []
+        # key -> (contents id, resources, width, height) of every written page
+        self._shared = {}
+        self._last_image = None
+        self._last_key = None
+        self._next_id = self.PAGES_ID + 1
+        self._position = 0
+        self._closed = False
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.write_object(self.CATALOG_ID, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES_ID)
+
+    def __enter__(self):
+        return self
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._owns_fp:
+            self._fp.close()
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._position += len(data)
+
+    def reserve_id(self):
+        """Allocate an object number to be written now or later (before close)"""
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def write_object(self, object_id, body, stream=None):
+        """Write one indirect object (optionally with a stream) and record its offset"""
+        self._offsets[object_id] = self._position
+        self._write(b"%d 0 obj\n" % object_id)
+        if stream is None:
+            self._write(body + b"\nendobj\n")
+        else:
+            self._write(body[:-2] + b" /Length %d >>\nstream\n" % len(stream))
+            self._write(stream)
+            self._write(b"\nendstream\nendobj\n")
+
+    def add_image(self, image):
+        """Write an image XObject and return (object id, procset name)"""
+        return self.add_encoded_image(encode_page(image, self.bilevel_compression))
+
+    def add_encoded_image(self, page):
+        """Write an already encoded image (EncodedPage) and return (object id, procset name)"""
+        image_id = self.reserve_id()
+        self.write_object(
+            image_id,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d %s >>" % (page.width, page.height, page.entries),
+            page.stream,
+        )
+        return image_id, page.procset
+
+    def add_page(self, image):
+        """Encode ``image`` as a full page and write it out
+
+        Passing the same Image object as the previous page (render_pages
+        yields consecutive identical sheets that way) repeats that page
+        without encoding it again.
+        """
+        last = self._last_image() if self._last_image is not None else None
+        if last is image:
+            self.repeat_page(self._last_key)
+            return
+        self._last_key = self.add_encoded_page(encode_page(image, self.bilevel_compression))
+        self._last_image = weakref.ref(image)
+
+    def add_encoded_page(self, page, key=None):
+        """Write a full page from an EncodedPage (no re-encoding)
+
+        Returns the page's key (``key`` if given, else a new one) for repeat_page.
+        """
+        image_id, procset = self.add_encoded_image(page)
+        width = page.width * 72.0 / self.dpi
+        height = page.height * 72.0 / self.dpi
+        contents = b"q %f 0 0 %f 0 0 cm /image Do Q\n" % (width, height)
+        resources = b"<< /ProcSet [/PDF /%s] /XObject << /image %d 0 R >> >>" % (procset, image_id)
+        return self.add_content_page(contents, resources, width, height, key=key)
+
+    def add_content_page(self, contents, resources, width, height, compress=False, key=None):
+        """Write a page from a raw content stream and resource dictionary
+
+        ``width`` and ``height`` are in PDF points. Returns the page's key
+        (``key`` if given, else a new one) for repeat_page.
+        """
+        if self._closed:
+            raise ValueError("PDF writer is already closed")
+
+        contents_id = self.reserve_id()
+        if compress:
+            self.write_object(contents_id, b"<< /Filter /FlateDecode >>", zlib.compress(contents, 6))
+        else:
+            self.write_object(contents_id, b"<< >>", contents)
+
+        key = contents_id if key is None else key
+        self._shared[key] = (contents_id, resources, width, height)
+        self._write_page(contents_id, resources, width, height)
+        return key
+
+    def has_page(self, key):
+        """True if a page was written under ``key`` (so repeat_page can reuse it)"""
+        return key in self._shared
+
+    def repeat_page(self, key):
+        """Add a page that shows an earlier page again
+
+        The new page object points at the earlier page's content stream and
+        resources, so nothing is encoded or embedded a second time.
+        """
+        if self._closed:
+            raise ValueError("PDF writer is already closed")
+        self._write_page(*self._shared[key])
+
+    def _write_page(self, contents_id, resources, width, height):
+        page_id = self.reserve_id()
+        self.write_object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %f %f] /Resources %s /Contents %d 0 R >>"
+            % (self.PAGES_ID, width, height, resources, contents_id),
+        )
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    def close(self):
+        """Write the page tree, cross-reference table and trailer"""
+        if self._closed:
+            return
+        if not self._page_ids:
+            raise ValueError("Cannot write a PDF without pages")
+
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self.write_object(self.PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)))
+
+        xref_offset = self._position
+        size = self._next_id
+        lines = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            lines.append(b"%010d 00000 n \n" % self._offsets[object_id])
+        self._write(b"".join(lines))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, self.CATALOG_ID, xref_offset))
+
+        self._closed = True
+        if hasattr(self._fp, 'flush'):
+            self._fp.flush()
+        if self._owns_fp:
+            self._fp.close()
+
+def encode_image(image, bilevel_compression='flate'):
+    """Encode a page image for embedding as an image XObject
+
+    Colour and greyscale pages are stored as JPEG like Pillow's PDF plugin.
+    Bilevel (mode '1') pages are stored losslessly at 1 bit per pixel, either
+    as Flate-compressed packed rows ('flate') or CCITT Group 4 ('group4', needs
+    Pillow built with libtiff). On barcode sheets Flate is both smaller and
+    faster, since the long vertical bars repeat row after row.
+
+    Returns (dictionary entries, stream bytes, procset name).
+    """
+    buffer = io.BytesIO()
+    if image.mode == '1':
+        if bilevel_compression == 'group4':
+            # Single-strip CCITT Group 4, as Pillow's PDF plugin writes it
+            image.save(buffer, 'TIFF', compression='group4', strip_size=math.ceil(image.width / 8) * image.height)
+            entries = (b"/BitsPerComponent 1 /ColorSpace /DeviceGray /Filter [/CCITTFaxDecode] "
+                       b"/DecodeParms [<< /K -1 /BlackIs1 true /Columns %d /Rows %d >>]" % image.size)
+            return entries, buffer.getvalue()[8:], b"ImageB"
+        if bilevel_compression == 'flate':
+            # Mode '1' rows are already packed MSB-first with 1 = white, which is
+            # exactly DeviceGray at 1 bit per component
+            return (b"/BitsPerComponent 1 /ColorSpace /DeviceGray /Filter /FlateDecode",
+                    zlib.compress(image.tobytes(), 6), b"ImageB")
+        raise ValueError(f"Unknown bilevel compression: {bilevel_compression}")
+    if image.mode == 'L':
+        image.save(buffer, 'JPEG')
+        return b"/BitsPerComponent 8 /ColorSpace /DeviceGray /Filter /DCTDecode", buffer.getvalue(), b"ImageB"
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(buffer, 'JPEG')
+    return b"/BitsPerComponent 8 /ColorSpace /DeviceRGB /Filter /DCTDecode", buffer.getvalue(), b"ImageC"
+
+def encode_page(image, bilevel_compression='flate'):
+    """Encode a page image once, ready for PdfStreamWriter.add_encoded_page"""
+    entries, stream, procset = encode_image(image, bilevel_compression)
+    return EncodedPage(image.width, image.height, entries, stream, procset)
+
+def iter_pdf(pages, dpi=300, bilevel_compression='flate'):
+    """Yield a PDF of ``pages`` as byte chunks, one per page plus the trailer
+
+    For chunked HTTP responses and similar consumers: nothing touches the
+    filesystem and only the current page's bytes are buffered.
+    """
+    buffer = io.BytesIO()
+    pdf = PdfStreamWriter(buffer, dpi=dpi, bilevel_compression=bilevel_compression)
+    for page in pages:
+        pdf.add_page(page)
+        del page
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    pdf.close()
+    yield buffer.getvalue()
+
+def write_pdf(pages, fp, dpi=300, bilevel_compression='flate'):
+    """Stream an iterable of page images into a PDF and return the page count"""
+    with PdfStreamWriter(fp, dpi=dpi, bilevel_compression=bilevel_compression) as pdf:
+        for page in pages:
+            pdf.add_page(page)
+            # Release the page before the iterator renders the next one
+            del page
+        return pdf.page_count
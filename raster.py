@@ -0,0 +1,258 @@
+# Direct-to-raster Code128 rendering (no PNG encode/decode round trip)
+
+from barcode.base import Barcode
+from barcode.charsets import code128
+from barcode.codex import Code128, MIN_QUIET_ZONE, MIN_SIZE
+from barcode.writer import BaseWriter, mm2px, pt2mm
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import threading
+
+# Fonts used for the human-readable line, keyed by (path, pixel size)
+_text_fonts = {}
+_text_fonts_lock = threading.Lock()
+
+def _text_font(path, size):
+    """Load the human-readable font once per (path, size)"""
+    key = (path, size)
+    font = _text_fonts.get(key)
+    if font is None:
+        font = ImageFont.truetype(path, size)
+        with _text_fonts_lock:
+            _text_fonts[key] = font
+    return font
+
+def resolve_writer_settings(number, options):
+    """Apply writer options exactly like ``Code128(...).write()`` does
+
+    Returns a BaseWriter carrying the resolved module sizes, margins and text,
+    so the raster engine sees the same values as python-barcode's ImageWriter.
+    """
+    code128_options = {'module_width': MIN_SIZE, 'quiet_zone': MIN_QUIET_ZONE}
+    code128_options.update(options or {})
+
+    merged = Barcode.default_writer_options.copy()
+    merged.update(code128_options)
+    if merged['write_text']:
+        merged['text'] = str(number)
+
+    settings = BaseWriter()
+    settings.set_options(merged)
+    return settings
+
+def supports_options(options):
+    """Check whether the raster engine reproduces ImageWriter for these options"""
+    options = options or {}
+    if options.get('background', 'white') != 'white' or options.get('foreground', 'black') != 'black':
+        return False
+    if 'text' in options or options.get('center_text', True) is not True:
+        return False
+    # A zero font size with text enabled crashes ImageWriter; leave that to it
+    if options.get('write_text', True) and not options.get('font_size', 10):
+        return False
+    return True
+
+def bar_spans(pattern, settings, dpi=300):
+    """Turn a module pattern into pixel (start, stop) spans of black bars
+
+    Follows BaseWriter.render: positions accumulate in millimetres and each bar
+    covers ``mm2px(x)`` to ``mm2px(x + width) - 1`` inclusive, truncated to
+    integer pixels the same way ImageDraw.rectangle does.
+
+    Returns (starts, stops, barcode_start_mm, barcode_end_mm).
+    """
+    starts = []
+    stops = []
+    xpos = settings.quiet_zone
+    for mod, _height_factor in settings.packed(pattern):
+        width = settings.module_width * abs(mod)
+        if mod > 0:
+            starts.append(int(mm2px(xpos, dpi)))
+            stops.append(int(mm2px(xpos + width, dpi) - 1) + 1)
+        xpos += width
+    return np.array(starts, dtype=np.intp), np.array(stops, dtype=np.intp), settings.quiet_zone, xpos
+
+def expand_row(starts, stops, width):
+    """Run-length expand bar spans into one row of 8-bit pixels (0 = bar)"""
+    bounds = np.empty(len(starts) * 2 + 2, dtype=np.intp)
+    bounds[0] = 0
+    bounds[1:-1:2] = starts
+    bounds[2:-1:2] = stops
+    bounds[-1] = width
+    bounds = np.clip(bounds, 0, width)
+    lengths = np.diff(bounds)
+    # White gaps and black bars alternate, starting with the left quiet zone
+    colours = np.tile(np.array([255, 0], dtype=np.uint8), len(starts) + 1)[:len(lengths)]
+    return np.repeat(colours, lengths)
+
+def serial_patterns(prefix, values):
+    """Build Code128 module patterns for ``prefix + str(value)`` in one batch
+
+    All values must have the same number of digits. The symbol structure
+    (charset switches and which digits share a code) then only depends on the
+    prefix and digit count, and every code is affine in the digits, so one
+    probe encoding per digit position gives a matrix that encodes the whole
+    batch at once. Returns the same strings as ``Code128(text).build()[0]``.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if not len(values):
+        return []
+    digits = len(str(int(values[0])))
+    lowest = 10 ** (digits - 1) if digits > 1 else 0
+    if values.min() < lowest or values.max() >= 10 ** digits:
+        raise ValueError("Serial values in one batch must have the same number of digits")
+
+    def encode(text):
+        return np.array(Code128(text)._build(), dtype=np.int64)
+
+    base = encode(prefix + "0" * digits)
+    weights = np.empty((len(base), digits), dtype=np.int64)
+    for position in range(digits):
+        probe = prefix + "0" * position + "1" + "0" * (digits - position - 1)
+        weights[:, position] = encode(probe) - base
+
+    powers = 10 ** np.arange(digits - 1, -1, -1, dtype=np.int64)
+    codes = base + ((values[:, None] // powers) % 10) @ weights.T
+    checksums = (codes[:, 0] + codes[:, 1:] @ np.arange(1, len(base), dtype=np.int64)) % 103
+
+    table = code128.CODES
+    tail = code128.STOP + "11"
+    return ["".join([table[code] for code in row]) + table[checksum] + tail
+            for row, checksum in zip(codes.tolist(), checksums.tolist())]
+
+def barcode_size(number, options, dpi=300, pattern=None):
+    """Return the (width, height) in pixels ImageWriter would produce, without drawing"""
+    settings = resolve_writer_settings(number, options)
+    if pattern is None:
+        pattern = Code128(str(number)).build()[0]
+    width_mm, height_mm = settings.calculate_size(len(pattern), 1)
+    return int(mm2px(width_mm, dpi)), int(mm2px(height_mm, dpi))
+
+def render_code128(number, options, dpi=300, pattern=None, mode='RGB'):
+    """Render a Code128 barcode straight into a PIL Image
+
+    Produces the same pixels as ``Code128(str(number), writer=ImageWriter())``
+    with ``writer.dpi = dpi`` for any options accepted by ``supports_options``.
+    A pre-built module ``pattern`` (from ``Code128.build()``) may be passed to
+    skip encoding. With ``mode='1'`` the tile is bilevel end to end: the bars
+    are exact and the human-readable text is drawn without anti-aliasing.
+    """
+    settings = resolve_writer_settings(number, options)
+    if pattern is None:
+        pattern = Code128(str(number)).build()[0]
+
+    width_mm, height_mm = settings.calculate_size(len(pattern), 1)
+    width = int(mm2px(width_mm, dpi))
+    height = int(mm2px(height_mm, dpi))
+
+    # Bars: one run-length expanded row, broadcast over the bar height
+    starts, stops, bar_start, bar_end = bar_spans(pattern, settings, dpi)
+    row = expand_row(starts, stops, width)
+    pixels = np.full((height, width), 255, dtype=np.uint8)
+    top = int(mm2px(settings.margin_top, dpi))
+    bottom = int(mm2px(settings.margin_top + settings.module_height, dpi))
+    pixels[top:bottom + 1] = row
+    image = Image.fromarray(pixels, 'L')
+    if mode == '1':
+        # Only 0/255 so far, so thresholding is exact (no dithering needed)
+        image = image.convert('1', dither=Image.Dither.NONE)
+
+    # Human-readable text, drawn once below the bars
+    if settings.text:
+        font = _text_font(settings.font_path, int(mm2px(pt2mm(settings.font_size), dpi)))
+        draw = ImageDraw.Draw(image)
+        xpos = bar_start + (bar_end - bar_start) / 2.0
+        ypos = settings.margin_top + settings.module_height + settings.text_distance
+        for subtext in settings.text.split("\n"):
+            draw.text((mm2px(xpos, dpi), mm2px(ypos, dpi)), subtext, font=font, fill=0, anchor="md")
+            ypos += pt2mm(settings.font_size) / 2 + settings.text_line_distance
+
+    return image if image.mode == mode else image.convert(mode)
+
+def tile_pixels(tile):
+    """Return a tile's pixels as an array for SheetCompositor
+
+    Bilevel tiles give a bool array (True = white), anything else a uint8
+    greyscale array. Labels are black on white, so converting an RGB tile to
+    'L' loses nothing.
+    """
+    if tile.mode not in ('1', 'L'):
+        tile = tile.convert('L')
+    return np.asarray(tile)
+
+class SheetCompositor:
+    """A sheet held as one NumPy buffer that tiles are written into
+
+    Placing a tile is a slice assignment, and a row of identical tiles is a
+    single broadcast through a strided view, so composition costs about a
+    memcpy per label instead of a Pillow paste with its per-call overhead.
+    RGB sheets are composed in greyscale (labels only hold greys) and
+    expanded once in ``image()``.
+    """
+
+    def __init__(self, size, mode='RGB'):
+        width, height = size
+        self.size = (width, height)
+        self.mode = mode
+        if mode == '1':
+            self.pixels = np.ones((height, width), dtype=bool)
+        else:
+            self.pixels = np.full((height, width), 255, dtype=np.uint8)
+
+    def paste(self, tile, x, y):
+        """Write a tile array at (x, y), clipped to the sheet like Image.paste"""
+        height, width = tile.shape
+        right = min(x + width, self.size[0])
+        bottom = min(y + height, self.size[1])
+        if right > x and bottom > y:
+            self.pixels[y:bottom, x:right] = tile[:bottom - y, :right - x]
+
+    def paste_row(self, tile, x, y, count, pitch):
+        """Write ``count`` copies of a tile left to right, ``pitch`` pixels apart, in one assignment"""
+        height, width = tile.shape
+        if count == 1 or pitch < width or x + (count - 1) * pitch + width > self.size[0] or y + height > self.size[1]:
+            # Overlapping or clipped rows take the safe path
+            for column in range(count):
+                self.paste(tile, x + column * pitch, y)
+            return
+        corner = self.pixels[y:, x:]
+        row_stride, column_stride = corner.strides
+        slots = np.lib.stride_tricks.as_strided(
+            corner, shape=(height, count, width), strides=(row_stride, pitch * column_stride, column_stride))
+        slots[...] = tile[:, None, :]
+
+    def paste_many(self, tile, positions):
+        """Write one tile at every (x, y), batching runs of evenly spaced slots on the same row"""
+        run_x = run_y = pitch = None
+        count = 0
+        for x, y in positions:
+            if count and y == run_y and (count == 1 or x - previous == pitch) and x > previous:
+                pitch = x - run_x if count == 1 else pitch
+                count += 1
+            else:
+                if count:
+                    self.paste_row(tile, run_x, run_y, count, pitch or 0)
+                run_x, run_y, pitch, count = x, y, None, 1
+            previous = x
+        if count:
+            self.paste_row(tile, run_x, run_y, count, pitch or 0)
+
+    def image(self, mode=None):
+        """Return the sheet as a PIL Image in ``mode`` (default: the compositor's mode)
+
+        A greyscale image wraps the buffer without copying it (so the
+        compositor must not be drawn on afterwards); RGB is expanded from it
+        in one pass, and bilevel sheets are packed to 1 bit per pixel.
+        """
+        if self.mode == '1':
+            return Image.fromarray(self.pixels)
+        grey = Image.frombuffer('L', self.size, self.pixels, 'raw', 'L', 0, 1)
+        mode = mode or self.mode
+        return grey if mode == 'L' else grey.convert(mode)
+
+    def tobytes(self):
+        """Raw sheet bytes: greyscale for RGB/L sheets, packed bits for bilevel ones"""
+        if self.mode == '1':
+            # Pillow's raw '1' layout: MSB first, 1 = white, rows padded to a byte
+            return np.packbits(self.pixels, axis=1).tobytes()
+        return self.pixels.tobytes()
@@ -0,0 +1,246 @@
+# Content-addressed cache of rendered output (PDFs, previews), shared by every session
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when a change to the pipeline alters rendered output, so stale entries
+# (including ones on disk) are never served
+CACHE_VERSION = 2
+
+# How often (in seconds) a caller waiting on someone else's build checks for cancellation
+WAIT_POLL_SECONDS = 0.1
+
+CACHE_MB_ENV = "BARCODE_CACHE_MB"
+CACHE_DIR_ENV = "BARCODE_CACHE_DIR"
+
+def canonical_spec(spec):
+    """Normalise one barcode spec so equal jobs hash equally"""
+    if 'start' in spec:
+        return {
+            'start': int(spec['start']),
+            'count': int(spec['count']),
+            'step': int(spec.get('step', 1)),
+            'prefix': str(spec.get('prefix', '') or ''),
+            'title': str(spec.get('title', '') or ''),
+        }
+    return {
+        'number': str(spec['number']),
+        'count': int(spec['count']),
+        'title': str(spec.get('title', '') or ''),
+    }
+
+def job_key(barcode_specs, **options):
+    """Return the content address (SHA-256 hex) of a job and its output options
+
+    ``12345`` and ``'12345'``, a missing title and ``''``, and option order
+    all give the same key.
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'specs': [canonical_spec(spec) for spec in barcode_specs],
+        'options': options,
+    }
+    data = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    """Byte blobs by content address: an LRU memory tier bounded by total size,
+    plus an optional directory on disk
+
+    ``get_or_create`` coalesces concurrent requests for the same key, so when
+    several sessions ask for the same job at once it is rendered only once.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._blobs = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _remember(self, key, data):
+        """Add to the memory tier (caller holds the lock)"""
+        if key in self._blobs:
+            self._bytes -= len(self._blobs.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self._blobs[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._blobs.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _lookup(self, key, count=True):
+        """Return the blob from memory or disk, counting the hit (caller holds the lock)"""
+        data = self._blobs.get(key)
+        if data is not None:
+            self._blobs.move_to_end(key)
+            if count:
+                self.hits += 1
+                self.memory_hits += 1
+            return data
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+            if count:
+                self.hits += 1
+                self.disk_hits += 1
+            self._remember(key, data)
+            return data
+        return None
+
+    def get(self, key, count=True):
+        """Return the blob for ``key`` or None
+
+        Pass ``count=False`` for companion blobs (previews, metadata) fetched
+        after a job lookup, so the hit rate reflects jobs rather than files.
+        """
+        with self._lock:
+            data = self._lookup(key, count)
+            if data is None and count:
+                self.misses += 1
+            return data
+
+    def put(self, key, data):
+        """Store a blob in memory and, if configured, on disk"""
+        data = bytes(data)
+        with self._lock:
+            self._remember(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def _write_disk(self, key, data):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        if self.max_disk_bytes is not None:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the least recently written files until the disk tier fits"""
+        files = []
+        for root, _dirs, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def get_or_create(self, key, create, check_cancelled=None):
+        """Return the blob for ``key``, calling ``create()`` once on a miss
+
+        Threads asking for a key that is already being created wait for that
+        result instead of rendering it again. While waiting they call
+        ``check_cancelled()`` every WAIT_POLL_SECONDS; whatever it raises (e.g.
+        background.JobCancelled) ends the wait. Returns (data, hit) where
+        ``hit`` is False only for the caller that ran ``create``.
+        """
+        while True:
+            with self._lock:
+                data = self._lookup(key)
+                if data is not None:
+                    return data, True
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+                self.coalesced += 1
+            # Someone else is rendering this key; wait and look again (if they
+            # failed, or the result was too big to keep, the next pass renders)
+            while not pending.wait(WAIT_POLL_SECONDS if check_cancelled is not None else None):
+                check_cancelled()
+
+        try:
+            data = bytes(create())
+            self.put(key, data)
+            return data, False
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def clear(self):
+        """Drop the memory tier and reset the counters (the disk tier is kept)"""
+        with self._lock:
+            self._blobs.clear()
+            self._bytes = 0
+            self.hits = self.memory_hits = self.disk_hits = 0
+            self.misses = self.coalesced = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters, the hit rate and memory use"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'entries': len(self._blobs),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+def cache_from_environment():
+    """Build the shared cache from BARCODE_CACHE_MB (memory budget, default
+    256) and BARCODE_CACHE_DIR (enables the disk tier)"""
+    try:
+        megabytes = float(os.environ.get(CACHE_MB_ENV, 256))
+    except ValueError:
+        megabytes = 256
+    return RenderCache(max_bytes=int(megabytes * 1024 * 1024), disk_dir=os.environ.get(CACHE_DIR_ENV) or None)
+
+# Process-wide cache shared by every Streamlit session
+render_cache = cache_from_environment()
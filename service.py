@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Local HTTP render service for barcode sheets
+
+Runs the utils pipeline behind a small JSON API so several terminals can
+submit jobs at once without a Streamlit session each. Jobs wait in a bounded
+queue, run on a fixed pool of worker threads, and stream their pages into a
+PDF in a spool directory, so memory per job stays at about one sheet.
+
+    python service.py --port 8502 --workers 2
+
+API:
+    POST   /jobs            {"specs": [...], "mode": "RGB" | "1", "dpi": 300}
+                            -> 202 {"id": ..., ...}; 503 when the queue is full
+    GET    /jobs            status of every known job
+    GET    /jobs/<id>       status with per-page progress
+    DELETE /jobs/<id>       cancel a queued or running job
+    GET    /jobs/<id>/pdf   the finished PDF (409 until the job is done)
+
+Specs use the same dictionaries as create_multi_barcode_sheet, including
+serial ranges.
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pdf_writer import PdfStreamWriter
+from utils import plan_sheets, render_pages
+
+# Largest accepted request body (spec lists, not labels, so this is generous)
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job is cancelled"""
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when no more jobs can be queued"""
+
+class Job:
+    """One render request and its progress"""
+
+    def __init__(self, specs, mode='RGB', dpi=300):
+        self.id = uuid.uuid4().hex
+        self.specs = specs
+        self.mode = mode
+        self.dpi = dpi
+        self.state = 'queued'
+        self.pages_done = 0
+        self.pages_total = None
+        self.labels = None
+        self.error = None
+        self.path = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished_state(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def status(self):
+        """JSON-friendly snapshot of the job"""
+        status = {
+            'id': self.id,
+            'state': self.state,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'labels': self.labels,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.started is not None:
+            status['seconds'] = round((self.finished or time.time()) - self.started, 3)
+        if self.state == 'done':
+            status['download'] = f"/jobs/{self.id}/pdf"
+        return status
+
+def validate_specs(specs):
+    """Check the shape of submitted specs before they are queued"""
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("'specs' must be a non-empty list")
+    for spec in specs:
+        if not isinstance(spec, dict) or ('number' not in spec and 'start' not in spec):
+            raise ValueError("Each spec needs a 'number' (or a 'start' for a serial range)")
+        count = spec.get('count')
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise ValueError("Each spec needs a positive integer 'count'")
+
+class JobManager:
+    """Bounded job queue served by a fixed pool of render threads
+
+    Finished jobs are kept (with their PDFs in ``spool_dir``) until more than
+    ``keep_finished`` have piled up; the oldest are then forgotten.
+    """
+
+    def __init__(self, workers=2, queue_size=16, spool_dir=None, keep_finished=100):
+        self.jobs = OrderedDict()
+        self.keep_finished = keep_finished
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="barcode-jobs-")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        for number in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"render-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, specs, mode='RGB', dpi=300):
+        """Queue a job and return it; raises ValueError or QueueFull"""
+        validate_specs(specs)
+        if mode not in ('RGB', '1'):
+            raise ValueError("'mode' must be 'RGB' or '1'")
+        if not isinstance(dpi, int) or isinstance(dpi, bool) or not 72 <= dpi <= 1200:
+            raise ValueError("'dpi' must be an integer between 72 and 1200")
+
+        job = Job(specs, mode=mode, dpi=dpi)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull("Job queue is full, try again later") from None
+            self.jobs[job.id] = job
+            self._forget_old_jobs()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """Ask a job to stop; returns the job or None if unknown"""
+        job = self.get(job_id)
+        if job is not None and not job.finished_state:
+            job.cancel_event.set()
+            if job.state == 'queued':
+                job.state = 'cancelled'
+                job.finished = time.time()
+        return job
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished_state]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+            if job.path:
+                try:
+                    os.unlink(job.path)
+                except OSError:
+                    pass
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if not job.cancel_event.is_set():
+                    self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        job.state = 'running'
+        job.started = time.time()
+        path = os.path.join(self.spool_dir, f"{job.id}.pdf")
+        try:
+            plan = plan_sheets(job.specs, mode=job.mode, dpi=job.dpi)
+            job.labels = plan.total
+            job.pages_total = plan.sheets
+            with PdfStreamWriter(path, dpi=job.dpi) as pdf:
+                # Threads share the process; render pages serially per job
+                for sheet in render_pages(plan, workers=1, mode=plan.page_mode):
+                    if job.cancel_event.is_set():
+                        raise JobCancelled()
+                    pdf.add_page(sheet)
+                    del sheet
+                    job.pages_done += 1
+            job.path = path
+            job.state = 'done'
+        except JobCancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished = time.time()
+            if job.state != 'done' and os.path.exists(path):
+                os.unlink(path)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job has finished (mainly for tests); returns the job"""
+        deadline = None if timeout is None else time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and not job.finished_state:
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f"Job {job_id} is still {job.state}")
+            time.sleep(0.05)
+        return job
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """JSON API over a JobManager (``self.server.manager``)"""
+
+    server_version = "BarcodeRender/1.0"
+    JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/pdf)?/?$")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def _job_from_path(self):
+        match = self.JOB_PATH.match(self.path.split('?', 1)[0])
+        if not match:
+            return None, None
+        return self.server.manager.get(match.group(1)), bool(match.group(2))
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self._error(HTTPStatus.NOT_FOUND, "Not found")
+        try:
+            length = self.headers.get('Content-Length') or '0'
+            if not length.strip().isdigit():
+                raise ValueError("Content-Length must be a whole number of bytes")
+            length = int(length)
+            if length > MAX_BODY_BYTES:
+                return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large")
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            job = self.server.manager.submit(payload.get('specs'), mode=payload.get('mode', 'RGB'),
+                                             dpi=payload.get('dpi', 300))
+        except QueueFull as e:
+            return self._error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+        except ValueError as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        self._send_json(HTTPStatus.ACCEPTED, job.status())
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/jobs':
+            return self._send_json(HTTPStatus.OK, {'jobs': [job.status() for job in self.server.manager.list()]})
+
+        job, wants_pdf = self._job_from_path()
+        if job is None:
+            return self._error(HTTPStatus.NOT_FOUND, "Unknown job")
+        if not wants_pdf:
+            return self._send_json(HTTPStatus.OK, job.status())
+        if job.state != 'done':
+            return self._error(HTTPStatus.CONFLICT, f"Job is {job.state}")
+
+        try:
+            pdf = open(job.path, 'rb')
+        except OSError:
+            return self._error(HTTPStatus.GONE, "PDF is no longer available")
+        with pdf:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(os.fstat(pdf.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="barcodes_{job.id}.pdf"')
+            self.end_headers()
+            shutil.copyfileobj(pdf, self.wfile)
+
+    def do_DELETE(self):
+        job, wants_pdf = self._job_from_path()
+        if job is None or wants_pdf:
+            return self._error(HTTPStatus.NOT_FOUND, "Unknown job")
+        self._send_json(HTTPStatus.OK, self.server.manager.cancel(job.id).status())
+
+def make_server(host='127.0.0.1', port=8502, manager=None, verbose=False):
+    """Create (but do not start) the HTTP server around a JobManager"""
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.manager = manager or JobManager()
+    server.verbose = verbose
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve barcode sheet rendering over HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8502, help="port to listen on (default: 8502)")
+    parser.add_argument('--workers', type=int, default=2, help="jobs rendered at the same time (default: 2)")
+    parser.add_argument('--queue', type=int, default=16, help="jobs allowed to wait (default: 16)")
+    parser.add_argument('--spool-dir', default=None, help="where finished PDFs are kept (default: a temp dir)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every request")
+    parser.add_argument('--no-prewarm', action='store_true', help="start listening without warming the caches first")
+    args = parser.parse_args()
+
+    if not args.no_prewarm:
+        # Warm before binding, so a load balancer only sees a ready instance
+        from warmup import prewarm
+        print(f"Warm-up: {json.dumps(prewarm())}")
+
+    manager = JobManager(workers=max(1, args.workers), queue_size=max(1, args.queue), spool_dir=args.spool_dir)
+    server = make_server(args.host, args.port, manager, verbose=args.verbose)
+    print(f"Barcode render service on http://{args.host}:{server.server_port} (spool: {manager.spool_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Bulk import, validation and duplicate merging for barcode lists (pandas)
+
+import io
+
+import pandas as pd
+
+from utils import _check_title_template
+
+# Columns of a barcode list table, in display order
+SPEC_COLUMNS = ['number', 'count', 'title']
+# Columns of a serial range table, in display order
+RANGE_COLUMNS = ['start', 'count', 'step', 'prefix', 'title']
+
+# Header names accepted on import (lower-case) and the column they fill
+COLUMN_ALIASES = {
+    'number': 'number',
+    'barcode': 'number',
+    'barcode number': 'number',
+    'code': 'number',
+    'count': 'count',
+    'quantity': 'count',
+    'qty': 'count',
+    'title': 'title',
+    'title/name': 'title',
+    'name': 'title',
+    'label': 'title',
+}
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+def empty_table():
+    """An empty barcode list with the right column types"""
+    return pd.DataFrame({
+        'number': pd.Series(dtype=object),
+        'count': pd.Series(dtype='int64'),
+        'title': pd.Series(dtype=object),
+    })
+
+def read_table(data, filename=''):
+    """Read an uploaded CSV/XLSX file or pasted text into a DataFrame of strings
+
+    ``data`` is bytes (an upload) or text (pasted rows). Pasted rows may be
+    separated by tabs (copied from a spreadsheet), commas or semicolons. A
+    header row is optional: with one, columns may come in any order and use
+    any name in COLUMN_ALIASES; without one they are number, count, title.
+    """
+    if filename.lower().endswith(EXCEL_EXTENSIONS):
+        try:
+            frame = pd.read_excel(io.BytesIO(data), dtype=str, header=None)
+        except ImportError as e:
+            raise ValueError("Excel import needs the openpyxl package (pip install openpyxl)") from e
+    else:
+        text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not lines:
+            raise ValueError("No rows found to import")
+        first = lines[0]
+        separator = '\t' if '\t' in first else ';' if ';' in first and ',' not in first else ','
+        frame = pd.read_csv(io.StringIO("\n".join(lines)), sep=separator, dtype=str, header=None,
+                            keep_default_na=False, skipinitialspace=True)
+    if frame.empty:
+        raise ValueError("No rows found to import")
+
+    header = [str(value).strip().lower() for value in frame.iloc[0]]
+    if 'number' in {COLUMN_ALIASES.get(name) for name in header}:
+        frame = frame.iloc[1:]
+        frame.columns = [COLUMN_ALIASES.get(name, name) for name in header]
+        frame = frame.loc[:, ~frame.columns.duplicated()]
+    else:
+        frame = frame.iloc[:, :len(SPEC_COLUMNS)]
+        frame.columns = SPEC_COLUMNS[:frame.shape[1]]
+    return frame.reset_index(drop=True)
+
+def validate_table(frame):
+    """Check a barcode list in one vectorized pass
+
+    Returns (clean, errors): the valid rows as a table of SPEC_COLUMNS with
+    duplicates merged, and one message per rejected row ("Row 3: ..."; rows
+    count from 1). A missing count means 1. Numbers are kept as text, so
+    leading zeros and letters survive; Excel's "12345.0" becomes "12345".
+    """
+    frame = frame.reindex(columns=SPEC_COLUMNS)
+    number = (frame['number'].fillna('').astype(str).str.strip()
+              .str.replace(r'^(\d+)\.0+$', r'\1', regex=True))
+    count_text = frame['count'].fillna('').astype(str).str.strip()
+    count = pd.to_numeric(count_text.mask(count_text == '', '1'), errors='coerce')
+    title = frame['title'].fillna('').astype(str).str.strip()
+
+    problem = pd.Series('', index=frame.index, dtype=object)
+    problem = problem.mask(count.isna() | (count % 1 != 0) | (count < 1), "quantity must be a whole number of at least 1")
+    # Code128 covers printable ASCII
+    problem = problem.mask(~number.str.fullmatch(r'[\x20-\x7e]+'), "barcode number must be printable ASCII")
+    problem = problem.mask(number == '', "missing barcode number")
+
+    bad = problem != ''
+    errors = [f"Row {position + 1}: {message}"
+              for position, message in zip(bad.to_numpy().nonzero()[0].tolist(), problem[bad].tolist())]
+    clean = pd.DataFrame({'number': number[~bad], 'count': count[~bad].astype('int64'), 'title': title[~bad]})
+    return merge_duplicates(clean), errors
+
+def _whole_numbers(column, default=None):
+    """Text or numbers to floats (NaN where not a number); blanks become ``default``"""
+    text = column.fillna('').astype(str).str.strip().str.replace(r'^(-?\d+)\.0+$', r'\1', regex=True)
+    if default is not None:
+        text = text.mask(text == '', str(default))
+    return pd.to_numeric(text, errors='coerce')
+
+def _template_error(title):
+    """The problem with a range title template, or '' when it is usable"""
+    try:
+        if title:
+            _check_title_template(title)
+    except ValueError as e:
+        return str(e)
+    return ''
+
+def validate_ranges(frame):
+    """Check a serial range table like validate_table checks a barcode list
+
+    Returns (specs, errors): range specs for the valid rows and one message
+    per rejected row ("Range row 2: ..."). A missing count or step means 1.
+    Serial numbers are counted without leading zeros, so a zero-padded start
+    is rejected (the zeros belong in the prefix), and titles are checked as
+    templates (see utils.expand_specs).
+    """
+    frame = frame.reindex(columns=RANGE_COLUMNS)
+    start_text = frame['start'].fillna('').astype(str).str.strip()
+    titles = frame['title'].fillna('').astype(str)
+    start = _whole_numbers(frame['start'])
+    count = _whole_numbers(frame['count'], 1)
+    step = _whole_numbers(frame['step'], 1)
+
+    problem = titles.map(_template_error).astype(object)
+    problem = problem.mask(step.isna() | (step % 1 != 0), "step must be a whole number")
+    problem = problem.mask(count.isna() | (count % 1 != 0) | (count < 1), "quantity must be a whole number of at least 1")
+    problem = problem.mask(start.isna() | (start % 1 != 0) | (start < 0), "start must be a whole number of at least 0")
+    problem = problem.mask((problem == '') & (start + (count - 1) * step < 0), "serial numbers must stay at or above zero")
+    problem = problem.mask(start_text.str.match(r'^0\d'),
+                           "start has leading zeros, which would be dropped (put them in the prefix)")
+    problem = problem.mask(start_text == '', "missing start number")
+
+    bad = problem != ''
+    errors = [f"Range row {position + 1}: {message}"
+              for position, message in zip(bad.to_numpy().nonzero()[0].tolist(), problem[bad].tolist())]
+    good = ~bad
+    specs = [
+        {'start': int(first), 'count': int(how_many), 'step': int(by), 'prefix': prefix, 'title': title}
+        for first, how_many, by, prefix, title in zip(
+            start[good].tolist(), count[good].tolist(), step[good].tolist(),
+            frame['prefix'][good].fillna('').astype(str).tolist(), titles[good].tolist())
+    ]
+    return specs, errors
+
+def merge_duplicates(frame):
+    """Combine rows with the same number and title, adding up their quantities
+
+    The first occurrence keeps its place in the list.
+    """
+    if frame.empty:
+        return empty_table()
+    merged = frame.groupby(['number', 'title'], sort=False, as_index=False)['count'].sum()
+    return merged[SPEC_COLUMNS].reset_index(drop=True)
+
+def combine_tables(existing, imported):
+    """Append imported rows to a list, merging any duplicates across both"""
+    return merge_duplicates(pd.concat([existing[SPEC_COLUMNS], imported[SPEC_COLUMNS]], ignore_index=True))
+
+def table_to_specs(frame):
+    """Turn a validated table into create_multi_barcode_sheet specs"""
+    return [
+        {'number': number, 'count': count, 'title': title}
+        for number, count, title in zip(frame['number'].tolist(), frame['count'].tolist(), frame['title'].tolist())
+    ]
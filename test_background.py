@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for background generation jobs (used by the Streamlit app)
+"""
+
+import concurrent.futures
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+from background import PREVIEW_PAGES, GenerationJob
+from render_cache import RenderCache, job_key
+
+SPECS = [
+    {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
+    {'start': 1, 'count': 200, 'prefix': 'S'},
+]
+
+def test_job_runs_in_background_and_streams_previews():
+    """A job reports progress, keeps its own specs and serves repeats from the cache"""
+    cache = RenderCache()
+    specs = [dict(spec) for spec in SPECS]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = GenerationJob(specs, cache=cache).start(executor)
+        specs[0]['count'] = 1           # editing the list does not touch the job
+        job.wait(timeout=60)
+    assert job.state == 'done', job.error
+    assert job.labels == 225 and job.pages_done == job.pages_total and job.progress == 1.0
+    assert job.pdf.startswith(b'%PDF') and len(job.previews) == min(job.pages_total, PREVIEW_PAGES)
+    assert job.report['stages']['pdf_write']['calls'] >= 1
+    assert job.zpl.startswith(b'^XA') and job.zpl.count(b'^PQ') == 1 + 3   # the range counts per digit count
+
+    again = GenerationJob(SPECS, cache=cache)
+    again.run()
+    assert again.from_cache and again.pdf == job.pdf and len(again.previews) == len(job.previews)
+    # Rendered and cached pages get the same layout-drawn preview
+    assert [preview.tobytes() for preview in again.previews] == [preview.tobytes() for preview in job.previews]
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1     # jobs only, not their page lookups
+
+def test_cancel_stops_early():
+    """Cancelling stops after the current page and keeps only the pages written before the cancel"""
+    cache = RenderCache()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = GenerationJob([{'start': 1, 'count': 20000, 'title': 'Tag'}], cache=cache).start(executor)
+        while job.pages_done < 1 and not job.finished_state:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        job.cancel()
+        job.wait(timeout=60)
+        elapsed = time.perf_counter() - started
+    print(f"Cancelled after {job.pages_done} of {job.pages_total} pages in {elapsed:.3f}s")
+    assert job.state == 'cancelled' and job.pdf is None
+    assert job.pages_done < job.pages_total
+    assert cache.stats()['entries'] == job.pages_done   # pages written before the cancel only
+
+def test_cancel_with_worker_processes():
+    """Cancelling a job rendered by a process pool ends as cancelled, not failed"""
+    specs = [{'number': 12345 + i, 'count': 12} for i in range(32 * 8)]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = GenerationJob(specs, workers=2).start(executor)
+        while job.pages_done < 1 and not job.finished_state:
+            time.sleep(0.01)
+        job.cancel()
+        job.wait(timeout=120)
+    assert job.state == 'cancelled', job.error
+    assert job.pages_done < job.pages_total
+
+def test_overlapping_sessions_render_in_process():
+    """Two sessions' jobs run side by side on their own threads without forking a pool"""
+    def no_pool(*args, **kwargs):
+        raise AssertionError("a background job started a process pool")
+
+    cache = RenderCache()
+    original_pool, original_workers = concurrent.futures.ProcessPoolExecutor, utils.resolve_workers
+    concurrent.futures.ProcessPoolExecutor = no_pool
+    # As on a multi-core host, where the default would be several processes
+    utils.resolve_workers = lambda workers=None: 4 if workers is None else original_workers(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=1) as second:
+            jobs = [
+                GenerationJob([{'number': 12345 + i, 'count': 12} for i in range(100)], cache=cache).start(first),
+                GenerationJob([{'start': 1, 'count': 1200, 'prefix': 'S'}], cache=cache).start(second),
+            ]
+            for job in jobs:
+                job.wait(timeout=120)
+    finally:
+        concurrent.futures.ProcessPoolExecutor, utils.resolve_workers = original_pool, original_workers
+    for job in jobs:
+        assert job.state == 'done', job.error
+        assert job.pages_total >= 8 and job.pdf.startswith(b'%PDF')
+
+def test_cancel_while_waiting_on_another_session():
+    """A job merged into another session's identical build can still be cancelled"""
+    cache = RenderCache()
+    release = threading.Event()
+    key = job_key(SPECS, output='pdf', dpi=300, mode='RGB')
+    # The other session's build of the same job, held open until released
+    other = threading.Thread(target=cache.get_or_create, args=(key, lambda: release.wait(60) and b'%PDF'))
+    other.start()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            job = GenerationJob(SPECS, cache=cache).start(executor)
+            while cache.stats()['coalesced'] < 1:
+                time.sleep(0.01)
+            job.cancel()
+            job.wait(timeout=10)
+            assert job.state == 'cancelled' and not release.is_set()
+    finally:
+        release.set()
+        other.join()
+
+def test_cancel_before_start():
+    """A queued job that is cancelled never runs"""
+    job = GenerationJob(SPECS)
+    job.cancel()
+    job.run()
+    assert job.state == 'cancelled' and job.started is None
+
+if __name__ == "__main__":
+    test_job_runs_in_background_and_streams_previews()
+    test_cancel_stops_early()
+    test_cancel_with_worker_processes()
+    test_overlapping_sessions_render_in_process()
+    test_cancel_while_waiting_on_another_session()
+    test_cancel_before_start()
+    print("✅ Background job tests passed")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script for the benchmark suite (the suite itself is run with bench.py)
+"""
+
+import json
+
+from bench import build_cases, compare_results, main, make_numbers, make_specs, run_case
+
+def test_cases_and_specs():
+    """Every scale gets the tile, sheet and PDF cases; jobs hold exactly the labels asked for"""
+    cases = build_cases(scales=(1, 100))
+    assert len(cases) == 24 and len({case['name'] for case in cases}) == 24
+    assert {case['kind'] for case in build_cases(scales=(1,), only={'pdf'})} == {'pdf'}
+
+    specs = make_specs(10001, titles=True, mixed=True)
+    assert len(specs) == 100 and sum(spec['count'] for spec in specs) == 10001
+    assert {len(number) for number in make_numbers(8, mixed=True)} == {4, 8, 13, 20}
+
+def test_compare_flags_regressions():
+    """Slower, bigger or different output is flagged; small noise is not"""
+    baseline = {'pdf-100': {'labels_per_second': 1000.0, 'peak_rss_mb': 100.0, 'output_bytes': 5000}}
+    assert compare_results(baseline, {'pdf-100': {'labels_per_second': 900.0, 'peak_rss_mb': 110.0, 'output_bytes': 5000}}) == []
+    messages = compare_results(baseline, {'pdf-100': {'labels_per_second': 700.0, 'peak_rss_mb': 150.0, 'output_bytes': 5001}})
+    assert len(messages) == 3
+    assert compare_results(baseline, {'pdf-1': {'labels_per_second': 1.0}}) == []
+
+def test_run_case_and_baseline(tmp_path):
+    """A case reports throughput, memory and output size, and a baseline round-trips"""
+    result = run_case({'name': 'pdf-1', 'kind': 'pdf', 'labels': 1, 'titles': True, 'mixed': False})
+    assert result['labels_per_second'] > 0 and result['output_bytes'] > 0 and result['sheets'] == 1
+
+    baseline = tmp_path / "baseline.json"
+    assert main(['--scales', '1', '--only', 'single', '--save', str(baseline)]) == 0
+    saved = json.loads(baseline.read_text())
+    assert set(saved['results']) == {'single-1', 'single-1-mixed'} and saved['environment']['cpus']
+    assert main(['--scales', '1', '--only', 'single', '--compare', str(baseline), '--tolerance', '100']) == 0
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_cases_and_specs()
+    test_compare_flags_regressions()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_run_case_and_baseline(Path(tmp))
+    print("✅ Benchmark tests passed")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the command-line batch mode
+"""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+from cli import main, read_specs, run
+
+HERE = Path(__file__).resolve().parent
+
+def test_read_specs():
+    """Rows work with or without a header, and headers may describe ranges"""
+    assert read_specs(io.StringIO("1120000250608,25,Product A\n45678,3\n\n")) == [
+        {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
+        {'number': '45678', 'count': 3, 'title': ''},
+    ]
+    assert read_specs(io.StringIO("title,count,number\nBox,2,12345\n")) == [
+        {'number': '12345', 'count': 2, 'title': 'Box'},
+    ]
+    assert read_specs(io.StringIO("start,count,step,prefix,title\n100,50,2,AST-,Asset {index}\n")) == [
+        {'start': 100, 'count': 50, 'step': 2, 'prefix': 'AST-', 'title': 'Asset {index}'},
+    ]
+    try:
+        read_specs(io.StringIO("12345,many\n"))
+    except ValueError as e:
+        assert "row 1" in str(e)
+    else:
+        raise AssertionError("bad count accepted")
+    for text in ["12345,1\n\u00e9,1\n", "start,count,prefix\n1,5,N\u00ba\n"]:
+        try:
+            read_specs(io.StringIO(text))
+        except ValueError as e:
+            assert "row" in str(e) and "Code 128" in str(e), e
+        else:
+            raise AssertionError(f"{text!r} accepted")
+
+def test_pdf_to_stdout():
+    """PDF output streams to a binary stdout and the summary counts it"""
+    stdout = io.BytesIO()
+    summary = run([{'number': 12345, 'count': 10, 'title': 'Box'}], '-', stdout=stdout, workers=1)
+    data = stdout.getvalue()
+    assert data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+    assert summary['bytes'] == len(data)
+    assert summary['labels'] == 10 and summary['sheets'] == 1
+    assert set(summary['seconds']) >= {'plan', 'render', 'write', 'total'}
+    assert summary['metrics']['stages']['pdf_write']['calls'] == 1
+
+def test_png_per_sheet(tmp_path):
+    """PNG output writes one file per sheet at the requested DPI"""
+    csv_path = tmp_path / "labels.csv"
+    csv_path.write_text("start,count,prefix\n1,200,S\n")
+    summary_path = tmp_path / "summary.json"
+    output = tmp_path / "sheets.png"
+
+    assert main([str(csv_path), '-o', str(output), '--dpi', '150', '-w', '1', '--summary', str(summary_path)]) == 0
+    summary = json.loads(summary_path.read_text())
+    assert summary['format'] == 'png' and summary['sheets'] >= 2
+    assert len(summary['output']) == summary['sheets']
+    with Image.open(summary['output'][0]) as sheet:
+        assert sheet.size == (1240, 1754)
+
+def test_no_ui_imports():
+    """The CLI does not pull in Streamlit or pandas"""
+    code = "import sys, cli; print(sorted(m for m in ('streamlit', 'pandas') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+if __name__ == "__main__":
+    import tempfile
+    test_read_specs()
+    test_pdf_to_stdout()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_png_per_sheet(Path(tmp))
+    test_no_ui_imports()
+    print("✅ CLI tests passed")
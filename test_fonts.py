@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for font resolution and caching
+"""
+
+import os
+import tempfile
+import urllib.request
+
+import utils
+from utils import clear_font_cache, get_font, get_font_sources
+
+def test_font_cached_per_size():
+    """get_font resolves each size once and records where it came from"""
+    clear_font_cache()
+    first = get_font(size=30)
+    assert get_font(size=30) is first
+    assert get_font(size=12) is not first
+
+    sources = get_font_sources()
+    assert set(sources) == {30, 12}
+    assert sources[30]['source'] in ('system', 'bundled', 'download', 'default')
+    # The second size reuses the font file found for the first one, and says so
+    assert sources[12]['path'] == sources[30]['path']
+    assert sources[12]['source'] == ('cached' if sources[30]['path'] else 'default')
+
+def test_offline_mode_never_downloads():
+    """With BARCODE_FONTS_OFFLINE set, missing fonts fall back instead of downloading"""
+    print("Testing offline font resolution...")
+    calls = []
+    original_options = utils.FONT_OPTIONS
+    original_retrieve = urllib.request.urlretrieve
+    original_env = {key: os.environ.get(key) for key in (utils.FONTS_DIR_ENV, utils.FONTS_OFFLINE_ENV)}
+
+    with tempfile.TemporaryDirectory() as fonts_dir:
+        try:
+            utils.FONT_OPTIONS = [option for option in original_options if option['type'] == 'download']
+            urllib.request.urlretrieve = lambda *args: calls.append(args)
+            os.environ[utils.FONTS_DIR_ENV] = fonts_dir
+            os.environ[utils.FONTS_OFFLINE_ENV] = '1'
+            clear_font_cache()
+
+            get_font(size=30)
+            assert calls == []
+            assert get_font_sources()[30]['source'] == 'default'
+
+            # A pre-seeded font in the fonts directory is picked up without the network
+            system_font = next(option['path'] for option in original_options
+                               if option['type'] == 'system' and os.path.exists(option['path']))
+            with open(system_font, 'rb') as src, open(os.path.join(fonts_dir, 'Roboto-Regular.ttf'), 'wb') as dst:
+                dst.write(src.read())
+            clear_font_cache()
+            get_font(size=30)
+            assert calls == []
+            assert get_font_sources()[30]['source'] == 'bundled'
+        finally:
+            utils.FONT_OPTIONS = original_options
+            urllib.request.urlretrieve = original_retrieve
+            for key, value in original_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            clear_font_cache()
+
+if __name__ == "__main__":
+    test_font_cached_per_size()
+    test_offline_mode_never_downloads()
+    print("✅ Font tests passed")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental (per-sheet) regeneration
+"""
+
+import io
+
+from render_cache import RenderCache
+from utils import plan_sheets, render_pages, sheet_fingerprint, write_plan_pdf, write_sheets_pdf
+
+SPECS = [{'number': 1120000250608 + i, 'count': 60, 'title': f'Product {i}'} for i in range(6)]
+
+def test_fingerprints_follow_content():
+    """Sheets with the same labels in the same places share a fingerprint"""
+    plan = plan_sheets(SPECS)
+    edited = plan_sheets(SPECS[:-1] + [dict(SPECS[-1], count=61)])
+    assert plan.sheets == edited.sheets
+    same = [sheet_fingerprint(plan, s) == sheet_fingerprint(edited, s) for s in range(plan.sheets)]
+    assert same == [True] * (plan.sheets - 1) + [False]
+
+def test_only_dirty_sheets_are_rendered():
+    """Editing the last spec re-renders only the last sheet, with identical output"""
+    cache = RenderCache()
+    first = write_plan_pdf(plan_sheets(SPECS), io.BytesIO(), cache=cache, workers=1)
+    assert first == {'pages': 5, 'rendered': 5, 'reused': 0, 'repeated': 0}
+
+    edited_specs = SPECS[:-1] + [dict(SPECS[-1], title='Renamed')]
+    edited = plan_sheets(edited_specs)
+    seen = []
+    incremental = io.BytesIO()
+    stats = write_plan_pdf(edited, incremental, cache=cache, workers=1,
+                           on_page=lambda sheet, image, key: seen.append((sheet, image is None)))
+    assert stats == {'pages': 5, 'rendered': 1, 'reused': 4, 'repeated': 0}
+    assert seen == [(0, True), (1, True), (2, True), (3, True), (4, False)]
+
+    full = io.BytesIO()
+    write_sheets_pdf(render_pages(edited, workers=1, mode=edited.page_mode), full)
+    assert incremental.getvalue() == full.getvalue()
+
+if __name__ == "__main__":
+    test_fingerprints_follow_content()
+    test_only_dirty_sheets_are_rendered()
+    print("✅ Incremental regeneration tests passed")
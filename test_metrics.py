@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for render pipeline instrumentation
+"""
+
+import contextlib
+import io
+import json
+import logging
+
+from metrics import STAGES, RenderMetrics
+from utils import plan_sheets, render_pages, tile_cache, write_plan_pdf
+
+SPECS = [
+    {'number': 1120000250608, 'count': 30, 'title': 'Product A'},
+    {'start': 1, 'count': 40, 'prefix': 'S'},
+]
+
+def test_stages_progress_and_report():
+    """A job reports every stage, per-sheet progress and a JSON report"""
+    events = []
+    metrics = RenderMetrics(on_progress=lambda stage, done, total: events.append((stage, done, total)))
+    plan = plan_sheets(SPECS, metrics=metrics)
+    write_plan_pdf(plan, io.BytesIO(), workers=1, metrics=metrics)
+
+    report = json.loads(metrics.to_json())
+    assert report['labels'] == 70 and report['sheets'] == plan.sheets
+    assert set(report['stages']) == set(STAGES)
+    for stage in STAGES:
+        assert report['stages'][stage]['seconds'] > 0, stage
+    assert report['stages']['paste']['calls'] == 70
+    assert report['stages']['pdf_write']['calls'] == plan.sheets
+    assert report['counters']['pages.rendered'] == plan.sheets
+    assert report['counters']['tile_cache.hits'] + report['counters']['tile_cache.misses'] >= 1
+    assert report['peak_rss_mb'] is None or report['peak_rss_mb'] > 0
+
+    assert [event for event in events if event[0] == 'render'] == [('render', n, plan.sheets) for n in range(1, plan.sheets + 1)]
+    assert [event for event in events if event[0] == 'write'] == [('write', n, plan.sheets) for n in range(1, plan.sheets + 1)]
+
+def test_quiet_by_default():
+    """Planning, rendering and writing a PDF print nothing"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        plan = plan_sheets([{'number': 45678, 'count': 200}])
+        for _ in render_pages(plan, workers=1):
+            pass
+        write_plan_pdf(plan, io.BytesIO(), workers=1)
+    assert "Generated barcode" not in output.getvalue()
+    assert output.getvalue().count("\n") == 0
+
+def test_summaries_are_logged():
+    """The layout and page summaries go to the utils logger at INFO level"""
+    records = []
+    handler = logging.Handler(logging.INFO)
+    handler.emit = records.append
+    logger = logging.getLogger('utils')
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        plan = plan_sheets([{'number': 45678, 'count': 200}])
+        stats = write_plan_pdf(plan, io.BytesIO(), workers=1)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    messages = [record.getMessage() for record in records]
+    assert f"Sheets needed: {plan.sheets}" in messages
+    assert any("of printable area used" in message for message in messages)
+    assert messages[-1] == f"Pages: {stats['rendered']} rendered, 0 reused, {stats['repeated']} repeated"
+
+def test_parallel_workers_report_back():
+    """Stage times and cache counters from pool workers reach the parent"""
+    tile_cache.clear()
+    metrics = RenderMetrics()
+    plan = plan_sheets([{'number': 12345 + i, 'count': 12} for i in range(100)], metrics=metrics)
+    sheets = list(render_pages(plan, workers=2, metrics=metrics))
+    assert len(sheets) == plan.sheets >= 8
+    report = metrics.report()
+    assert report['stages']['paste']['calls'] == 1200
+    assert report['stages']['rasterize']['calls'] >= 100
+    assert report['counters']['tile_cache.misses'] >= 1
+
+if __name__ == "__main__":
+    test_stages_progress_and_report()
+    test_quiet_by_default()
+    test_summaries_are_logged()
+    test_parallel_workers_report_back()
+    print("✅ Metrics tests passed")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test script for PDF export
+"""
+
+import gc
+import io
+import time
+import types
+import weakref
+
+from PIL import Image, PdfParser
+
+from pdf_writer import iter_pdf
+from utils import (LABEL_OPTIONS, create_multi_barcode_sheet, get_barcode_tile, get_font, iter_barcode_sheets,
+                   plan_sheets, render_pages, save_sheets_as_pdf, sheets_pdf_bytes, write_plan_pdf,
+                   write_sheets_pdf, write_vector_pdf)
+import vector_pdf
+from vector_pdf import can_embed, label_geometry
+
+def page_count(pdf_bytes):
+    return len(PdfParser.PdfParser(buf=pdf_bytes).pages)
+
+def test_streaming_writer_releases_pages():
+    """Each sheet is written and dropped before the next one is rendered"""
+    print("Testing streaming PDF export...")
+    released = []
+    previous = []
+
+    def sheets():
+        for number in range(5):
+            if previous:
+                gc.collect()
+                released.append(previous[-1]() is None)
+            sheet = Image.new('RGB', (248, 350), 'white')
+            previous.append(weakref.ref(sheet))
+            yield sheet
+            del sheet
+
+    buffer = io.BytesIO()
+    assert write_sheets_pdf(sheets(), buffer) == 5
+    assert released == [True] * 4
+    assert page_count(buffer.getvalue()) == 5
+
+def test_generator_pipeline_to_pdf(tmp_path):
+    """iter_barcode_sheets streams straight into a PDF file"""
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 70, 'title': 'Product A'},
+        {'number': 45678, 'count': 40}
+    ]
+    sheets = iter_barcode_sheets(barcode_specs, workers=1)
+    assert not isinstance(sheets, list)
+
+    output = tmp_path / "streamed.pdf"
+    pages = write_sheets_pdf(sheets, str(output))
+    assert pages == 2
+    assert page_count(output.read_bytes()) == 2
+
+def test_save_sheets_as_pdf_single_sheet(tmp_path):
+    """The list-based wrapper still accepts a lone sheet"""
+    output = tmp_path / "single.pdf"
+    save_sheets_as_pdf(Image.new('RGB', (2480, 3508), 'white'), str(output))
+    pdf = PdfParser.PdfParser(str(output))
+    assert len(pdf.pages) == 1
+    media_box = pdf.read_indirect(pdf.pages[0])[b'MediaBox']
+    assert [round(v, 2) for v in media_box] == [0, 0, 595.2, 841.92]
+    pdf.close()
+
+def test_in_memory_export(tmp_path):
+    """Bytes, file objects, chunks and files all carry the same PDF"""
+    sheets = [Image.new('RGB', (248, 350), 'white'), Image.new('RGB', (248, 350), 'black')]
+    save_sheets_as_pdf(sheets, tmp_path / "sheets.pdf")
+    on_disk = (tmp_path / "sheets.pdf").read_bytes()
+
+    buffer = io.BytesIO()
+    save_sheets_as_pdf(sheets, buffer)
+    assert buffer.getvalue() == on_disk
+    assert sheets_pdf_bytes(sheets) == on_disk
+
+    chunks = list(iter_pdf(iter(sheets)))
+    assert len(chunks) == 3   # one per page plus the trailer
+    assert b"".join(chunks) == on_disk
+
+def test_repeated_pages_are_shared():
+    """Full pages of one barcode are rendered once and embedded once"""
+    specs = [{'number': 1120000250608, 'count': 1000, 'title': 'Product A'}, {'number': 45678, 'count': 5}]
+    plan = plan_sheets(specs)
+    assert plan.sheets > 3
+
+    sheets = list(render_pages(plan, workers=1))
+    assert len(sheets) == plan.sheets and len({id(sheet) for sheet in sheets}) == 2
+
+    buffer = io.BytesIO()
+    stats = write_plan_pdf(plan, buffer, workers=1)
+    assert stats == {'pages': plan.sheets, 'rendered': 2, 'reused': 0, 'repeated': plan.sheets - 2}
+    data = buffer.getvalue()
+    assert page_count(data) == plan.sheets
+    assert data.count(b"/Subtype /Image") == 2
+
+    # Plain image streams repeat a page when handed the same Image again
+    buffer = io.BytesIO()
+    assert write_sheets_pdf(sheets, buffer) == plan.sheets
+    assert buffer.getvalue().count(b"/Subtype /Image") == 2
+
+    # The list API hands out a separate Image per page, so edits stay local
+    listed = create_multi_barcode_sheet(specs, workers=1)
+    assert len({id(sheet) for sheet in listed}) == plan.sheets
+    before = listed[2].getpixel((0, 0))
+    listed[1].putpixel((0, 0), (255, 0, 0))
+    assert listed[2].getpixel((0, 0)) == before
+    assert listed[2].tobytes() == sheets[2].convert('RGB').tobytes()
+
+def timed_pdf(sheets, **kwargs):
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    write_sheets_pdf(sheets, buffer, **kwargs)
+    return buffer.getvalue(), time.perf_counter() - start
+
+def test_bilevel_pdf_is_smaller():
+    """Mode '1' sheets are written as 1-bit Flate or CCITT images, far below the RGB/JPEG output"""
+    print("Comparing bilevel and RGB PDF output...")
+    barcode_specs = [{'number': 1120000250608 + i, 'count': 30, 'title': f'Product {i}'} for i in range(6)]
+    rgb_sheets = create_multi_barcode_sheet(barcode_specs, workers=1)
+    bilevel_sheets = create_multi_barcode_sheet(barcode_specs, workers=1, mode='1')
+    assert len(rgb_sheets) == len(bilevel_sheets)
+    assert all(sheet.mode == '1' for sheet in bilevel_sheets)
+
+    rgb_pdf, rgb_time = timed_pdf(rgb_sheets)
+    flate_pdf, flate_time = timed_pdf(bilevel_sheets, bilevel_compression='flate')
+    g4_pdf, g4_time = timed_pdf(bilevel_sheets, bilevel_compression='group4')
+
+    print(f"RGB/JPEG: {len(rgb_pdf)} bytes in {rgb_time:.3f}s")
+    print(f"1-bit Flate: {len(flate_pdf)} bytes in {flate_time:.3f}s")
+    print(f"1-bit CCITT G4: {len(g4_pdf)} bytes in {g4_time:.3f}s")
+
+    assert len(flate_pdf) * 10 < len(rgb_pdf)
+    assert len(g4_pdf) < len(rgb_pdf)
+    # Timings are only printed: they vary too much between machines to assert on
+    assert b'/DCTDecode' in rgb_pdf and b'/BitsPerComponent 8' in rgb_pdf
+    assert b'/FlateDecode' in flate_pdf and b'/BitsPerComponent 1' in flate_pdf and b'/DCTDecode' not in flate_pdf
+    assert b'/CCITTFaxDecode' in g4_pdf and b'/BitsPerComponent 1' in g4_pdf and b'/DCTDecode' not in g4_pdf
+    assert page_count(flate_pdf) == page_count(g4_pdf) == len(rgb_sheets)
+
+def test_vector_pdf():
+    """Vector output keeps the raster layout but stays in the kilobyte range"""
+    print("Testing vector PDF output...")
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 100, 'title': 'Product A'},
+        {'number': 45678, 'count': 60},
+        {'number': 7885526, 'count': 40, 'title': 'Special Item'}
+    ]
+    buffer = io.BytesIO()
+    pages = write_vector_pdf(barcode_specs, buffer)
+    pdf_bytes = buffer.getvalue()
+    print(f"Vector PDF: {pages} pages, {len(pdf_bytes)} bytes")
+
+    assert pages == len(create_multi_barcode_sheet(barcode_specs, workers=1))
+    assert page_count(pdf_bytes) == pages
+    assert len(pdf_bytes) < 100_000
+    # One Form XObject per distinct label, however often it is placed
+    assert pdf_bytes.count(b"/Subtype /Form") == 3
+    assert pdf_bytes.count(b"/FontFile2") == 2
+
+def test_vector_pdf_font_fallback():
+    """Titles in a font that cannot be subset fall back to a raster PDF with the same pages"""
+    assert can_embed(get_font(size=30))
+    assert not can_embed(types.SimpleNamespace(path=io.BytesIO(b'OTTO' + bytes(64))))   # CFF OpenType
+    assert not can_embed(types.SimpleNamespace(path=io.BytesIO(b'ttcf' + bytes(64))))   # collection
+
+    barcode_specs = [{'number': 1120000250608, 'count': 30, 'title': 'Product A'}]
+    embeddable = vector_pdf.can_embed
+    vector_pdf.can_embed = lambda font: False
+    try:
+        buffer = io.BytesIO()
+        pages = write_vector_pdf(barcode_specs, buffer)
+    finally:
+        vector_pdf.can_embed = embeddable
+    pdf_bytes = buffer.getvalue()
+    assert pages == page_count(pdf_bytes) == plan_sheets(barcode_specs).sheets
+    assert b"/Subtype /Image" in pdf_bytes and b"/FontFile2" not in pdf_bytes
+
+def test_vector_geometry_matches_tiles():
+    """Vector labels occupy exactly the raster tile size"""
+    for number, title in [(12345, ''), (1120000250608, 'Product A'), (45678, 'A much longer title than the bars')]:
+        geometry = label_geometry(number, title, LABEL_OPTIONS, get_font(size=30))
+        assert geometry['size'] == get_barcode_tile(number, title, LABEL_OPTIONS).size
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+    test_streaming_writer_releases_pages()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_in_memory_export(pathlib.Path(tmp))
+    test_repeated_pages_are_shared()
+    test_bilevel_pdf_is_smaller()
+    test_vector_pdf()
+    test_vector_pdf_font_fallback()
+    test_vector_geometry_matches_tiles()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_generator_pipeline_to_pdf(pathlib.Path(tmp))
+        test_save_sheets_as_pdf_single_sheet(pathlib.Path(tmp))
+    print("✅ PDF tests passed")
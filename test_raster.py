@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the direct-to-raster Code128 renderer
+"""
+
+from PIL import Image, ImageChops
+
+from raster import SheetCompositor, render_code128, supports_options, tile_pixels
+from utils import LABEL_OPTIONS, generate_single_barcode, generate_single_barcode_imagewriter
+
+def assert_same_pixels(expected, actual):
+    assert expected.size == actual.size, (expected.size, actual.size)
+    diff = ImageChops.difference(expected.convert('RGB'), actual.convert('RGB'))
+    assert diff.getbbox() is None, f"pixels differ in {diff.getbbox()}"
+
+def test_matches_imagewriter():
+    """The raster engine is pixel-identical to the ImageWriter path"""
+    print("Comparing raster engine with ImageWriter...")
+    for number in [12345, 45678, 7885526, 1120000250608, 1120000250625, 'ABC-123']:
+        for dpi in (300, 600):
+            expected = generate_single_barcode_imagewriter(number, LABEL_OPTIONS, dpi=dpi)
+            assert_same_pixels(expected, render_code128(number, LABEL_OPTIONS, dpi=dpi))
+
+def test_matches_imagewriter_defaults():
+    """Default python-barcode options and hidden text also match"""
+    for options in ({}, {'write_text': False}, {'module_width': 0.33, 'font_size': 10}):
+        expected = generate_single_barcode_imagewriter(1120000250608, options)
+        assert_same_pixels(expected, render_code128(1120000250608, options))
+
+def test_generate_single_barcode_uses_fast_path():
+    """generate_single_barcode keeps its contract and falls back for colours"""
+    image = generate_single_barcode(1120000250608, LABEL_OPTIONS)
+    assert isinstance(image, Image.Image) and image.mode == 'RGB'
+
+    coloured = dict(LABEL_OPTIONS, foreground='navy')
+    assert not supports_options(coloured)
+    assert_same_pixels(generate_single_barcode_imagewriter(12345, coloured),
+                       generate_single_barcode(12345, coloured))
+
+def test_bilevel_tile():
+    """Mode '1' tiles keep the exact bars and only drop text anti-aliasing"""
+    rgb = render_code128(1120000250608, LABEL_OPTIONS)
+    bilevel = render_code128(1120000250608, LABEL_OPTIONS, mode='1')
+    assert bilevel.mode == '1' and bilevel.size == rgb.size
+    # Bar rows (above the human-readable text) are identical
+    bars = (0, 0, rgb.width, rgb.height // 2)
+    assert_same_pixels(rgb.crop(bars), bilevel.crop(bars))
+
+def test_compositor_matches_paste():
+    """Slice assignment, row broadcasts and clipping give the same sheet as Image.paste"""
+    for mode in ('RGB', '1'):
+        tile = render_code128(12345, LABEL_OPTIONS, mode=mode)
+        positions = [(10 + column * (tile.width + 7), 20) for column in range(4)] + [(5, 300), (900, 500)]
+        expected = Image.new(mode, (1000, 600), 'white')
+        for x, y in positions:
+            expected.paste(tile, (x, y))
+
+        compositor = SheetCompositor(expected.size, mode)
+        compositor.paste_many(tile_pixels(tile), positions)
+        sheet = compositor.image()
+        assert sheet.mode == mode and sheet.tobytes() == expected.tobytes()
+        assert compositor.tobytes() == expected.convert('L' if mode == 'RGB' else mode).tobytes()
+    assert compositor.image('L').mode == '1'   # bilevel sheets stay bilevel
+
+if __name__ == "__main__":
+    test_matches_imagewriter()
+    test_matches_imagewriter_defaults()
+    test_generate_single_barcode_uses_fast_path()
+    test_bilevel_tile()
+    test_compositor_matches_paste()
+    print("✅ Raster renderer tests passed")
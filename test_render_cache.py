@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared render cache
+"""
+
+import threading
+import time
+
+from render_cache import RenderCache, job_key
+
+def test_job_key_is_canonical():
+    """Equivalent spec lists share a key; any real difference changes it"""
+    a = job_key([{'number': 12345, 'count': 2}], output='pdf', dpi=300)
+    b = job_key([{'title': '', 'count': '2', 'number': '12345'}], dpi=300, output='pdf')
+    assert a == b
+    assert a != job_key([{'number': 12345, 'count': 3}], output='pdf', dpi=300)
+    assert a != job_key([{'number': 12345, 'count': 2}], output='pdf', dpi=600)
+    assert job_key([{'start': 1, 'count': 5}]) == job_key([{'start': '1', 'count': 5, 'step': 1, 'prefix': ''}])
+
+def test_memory_tier_is_bounded():
+    """The memory tier evicts least recently used blobs by total size"""
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'5678')
+    assert cache.get('a') == b'1234'      # 'a' is now most recent
+    cache.put('c', b'9012')               # evicts 'b'
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 8
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
+
+def test_disk_tier(tmp_path):
+    """Blobs survive in the disk tier and are promoted back into memory"""
+    RenderCache(disk_dir=str(tmp_path)).put('f' * 64, b'%PDF-data')
+    cache = RenderCache(disk_dir=str(tmp_path))
+    assert cache.get('f' * 64) == b'%PDF-data'
+    assert cache.get('f' * 64) == b'%PDF-data'
+    stats = cache.stats()
+    assert stats['disk_hits'] == 1 and stats['memory_hits'] == 1
+
+def test_concurrent_requests_render_once():
+    """Identical requests arriving together share one render"""
+    cache = RenderCache()
+    calls = []
+
+    def create():
+        calls.append(1)
+        time.sleep(0.2)
+        return b'pdf'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create('job', create))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+    assert cache.stats()['coalesced'] == 4
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_job_key_is_canonical()
+    test_memory_tier_is_bounded()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_disk_tier(Path(tmp))
+    test_concurrent_requests_render_once()
+    print("✅ Render cache tests passed")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for serial-number ranges
+"""
+
+import random
+import time
+
+from barcode.codex import Code128
+from PIL import ImageChops
+
+from raster import serial_patterns
+from utils import LayoutPlan, create_multi_barcode_sheet, expand_specs, plan_sheets
+
+def test_batched_patterns_match_code128():
+    """Batch encoding gives exactly the patterns python-barcode builds"""
+    rng = random.Random(7)
+    for prefix in ['', 'A', 'AST-', '12', '123', 'x1y']:
+        for digits in range(1, 14):
+            lowest = 10 ** (digits - 1) if digits > 1 else 0
+            values = [rng.randrange(lowest, 10 ** digits) for _ in range(20)]
+            assert serial_patterns(prefix, values) == [Code128(f"{prefix}{value}").build()[0] for value in values]
+
+def test_range_labels():
+    """Ranges count up or down, split where the digit count changes"""
+    segments = expand_specs([{'start': 105, 'count': 12, 'step': -3, 'prefix': 'S'}])
+    assert [(segment['number'].start, segment['count']) for segment in segments] == [(105, 2), (99, 10)]
+
+    plan = LayoutPlan([{'start': 98, 'count': 4, 'prefix': 'AST-', 'title': 'Asset {index} of {serial}'}], [(400, 200)] * 2)
+    assert [plan.label(i) for i in range(4)] == [
+        ('AST-98', 'Asset 1 of 98'), ('AST-99', 'Asset 2 of 99'),
+        ('AST-100', 'Asset 3 of 100'), ('AST-101', 'Asset 4 of 101'),
+    ]
+
+def test_title_templates():
+    """Titles get int fields everywhere, and a bad template fails up front"""
+    specs = [{'start': 8, 'count': 4, 'prefix': 'L', 'title': 'Lot {index:03d} / {serial:>4}'}]
+    plan = plan_sheets(specs)
+    assert plan.label(3) == ('L11', 'Lot 004 /   11')
+    run = expand_specs(specs)[0]['number']
+    assert run.sample(2, digit='7') == ('L8', 'Lot 777 /    7')
+
+    for title in ['Lot {', 'Lot }', '{lot}', '{}', '{serial:s}']:
+        try:
+            expand_specs([{'start': 1, 'count': 2, 'title': title}])
+        except ValueError as e:
+            assert 'Invalid title template' in str(e), e
+        else:
+            raise AssertionError(f"{title!r} was accepted")
+    assert plan_sheets([{'start': 1, 'count': 2, 'title': 'Set {{A}}'}]).label(0) == ('1', 'Set {A}')
+
+def test_range_renders_like_individual_specs():
+    """A range produces the same sheets as listing every serial by hand"""
+    print("Rendering a serial range...")
+    ranged = create_multi_barcode_sheet([{'start': 95, 'count': 150, 'prefix': 'A', 'title': 'Tag {index}'}], workers=1)
+    listed = create_multi_barcode_sheet(
+        [{'number': f'A{value}', 'count': 1, 'title': f'Tag {i + 1}'} for i, value in enumerate(range(95, 245))],
+        workers=1,
+    )
+    assert len(ranged) == len(listed)
+    for a, b in zip(ranged, listed):
+        assert ImageChops.difference(a, b).getbbox() is None
+
+def test_large_range_plans_lazily():
+    """Planning a million serials does not expand them"""
+    started = time.perf_counter()
+    plan = plan_sheets([{'start': 1, 'count': 1_000_000, 'prefix': 'S'}])
+    elapsed = time.perf_counter() - started
+    print(f"Planned {plan.total} labels on {plan.sheets} sheets in {elapsed:.3f}s")
+    assert len(plan.numbers) == 7   # one segment per digit count
+    assert plan.label(999_999) == ('S1000000', '')
+
+if __name__ == "__main__":
+    test_batched_patterns_match_code128()
+    test_range_labels()
+    test_title_templates()
+    test_range_renders_like_individual_specs()
+    test_large_range_plans_lazily()
+    print("✅ Serial range tests passed")
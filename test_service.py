@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the HTTP render service
+"""
+
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from service import JobManager, QueueFull, make_server
+
+# A few thousand serials: enough pages to still be running when cancelled
+LONG_JOB = [{'start': 1, 'count': 5000, 'prefix': 'S'}]
+
+def request(base, method, path, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_submit_progress_download(tmp_path):
+    """A job runs to completion over HTTP and its PDF can be downloaded"""
+    server = make_server(port=0, manager=JobManager(workers=1, spool_dir=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        specs = [{'number': 1120000250608, 'count': 140, 'title': 'Product A'}, {'number': 45678, 'count': 20}]
+        status, _, body = request(base, 'POST', '/jobs', {'specs': specs})
+        assert status == 202
+        job_id = json.loads(body)['id']
+
+        job = server.manager.wait(job_id, timeout=60)
+        assert job.state == 'done', job.error
+
+        status, _, body = request(base, 'GET', f'/jobs/{job_id}')
+        info = json.loads(body)
+        assert info['pages_done'] == info['pages_total'] == 3
+        assert info['labels'] == 160
+
+        status, headers, body = request(base, 'GET', info['download'])
+        assert status == 200 and headers['Content-Type'] == 'application/pdf'
+        assert body.startswith(b"%PDF-") and body.count(b"/Type /Page ") == 3
+
+        assert request(base, 'POST', '/jobs', {'specs': []})[0] == 400
+        assert request(base, 'GET', '/jobs/' + '0' * 32)[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_bad_content_length(tmp_path):
+    """Malformed or negative Content-Length headers are rejected with 400"""
+    server = make_server(port=0, manager=JobManager(workers=1, spool_dir=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for length in ['abc', '-5', '1.5']:
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+            connection.putrequest('POST', '/jobs')
+            connection.putheader('Content-Length', length)
+            connection.endheaders()
+            response = connection.getresponse()
+            assert response.status == 400, length
+            assert 'Content-Length' in json.loads(response.read())['error']
+            connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_cancel_running_job(tmp_path):
+    """Cancelling stops a job between pages and leaves no PDF behind"""
+    manager = JobManager(workers=1, spool_dir=str(tmp_path))
+    job = manager.submit(LONG_JOB)
+    while job.pages_done == 0 and not job.finished_state:
+        threading.Event().wait(0.01)
+    manager.cancel(job.id)
+    manager.wait(job.id, timeout=60)
+    assert job.state == 'cancelled'
+    assert job.pages_done < job.pages_total
+    assert list(tmp_path.iterdir()) == []
+
+def test_queue_is_bounded(tmp_path):
+    """Submissions beyond the queue size are refused instead of piling up"""
+    manager = JobManager(workers=1, queue_size=1, spool_dir=str(tmp_path))
+    running = manager.submit(LONG_JOB)
+    while running.state == 'queued':
+        threading.Event().wait(0.01)
+    waiting = manager.submit(LONG_JOB)
+    try:
+        manager.submit(LONG_JOB)
+    except QueueFull:
+        pass
+    else:
+        raise AssertionError("queue accepted more jobs than its size")
+
+    # A cancelled queued job never starts
+    manager.cancel(waiting.id)
+    manager.cancel(running.id)
+    manager.wait(running.id, timeout=60)
+    manager.wait(waiting.id, timeout=60)
+    assert waiting.state == 'cancelled' and waiting.started is None
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_submit_progress_download, test_bad_content_length, test_cancel_running_job, test_queue_is_bounded):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Render service tests passed")
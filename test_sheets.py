@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for sheet layout and rendering
+"""
+
+from PIL import Image, ImageChops, ImageStat
+
+import utils
+from utils import LayoutPlan, create_multi_barcode_sheet, plan_sheets, render_pages, render_preview, resolve_workers
+
+def same_pixels(a, b):
+    return a.size == b.size and ImageChops.difference(a, b).getbbox() is None
+
+def test_layout_plan_lookups():
+    """Label and position lookups work without expanding the job"""
+    specs = [{'number': 111, 'count': 3, 'title': 'A'}, {'number': 222, 'count': 2}, {'number': 333, 'count': 4, 'title': 'C'}]
+    plan = LayoutPlan(specs, [(400, 200)] * 3)
+    assert plan.total == 9
+    assert plan.label(0) == (111, 'A')
+    assert plan.label(4) == (222, '')
+    assert plan.label(8) == (333, 'C')
+    assert list(plan.runs(2, 6)) == [(111, 'A', 2, 1), (222, '', 3, 2), (333, 'C', 5, 1)]
+
+    # Uniform jobs keep the centered grid: 5 columns of 410px cells
+    left, top = plan.area[:2]
+    assert plan.position(0) == (0, left, top)
+    assert plan.position(6) == (0, left + 410, top + 210)
+
+def test_mixed_widths_are_packed():
+    """Labels are placed by their own size: no overlaps and fewer sheets"""
+    specs = [{'number': 1, 'count': 30}, {'number': 2, 'count': 200}, {'number': 3, 'count': 100}]
+    sizes = [(300, 160), (700, 160), (300, 200)]
+    plan = LayoutPlan(specs, sizes)
+
+    boxes = {}
+    for index in range(plan.total):
+        sheet, x, y = plan.position(index)
+        width, height = sizes[[1, 2, 3].index(plan.label(index)[0])]
+        assert 100 <= x and x + width <= 2380 and 100 <= y and y + height <= 3408
+        for other in boxes.get(sheet, []):
+            assert x + width <= other[0] or other[2] <= x or y + height <= other[1] or other[3] <= y
+        boxes.setdefault(sheet, []).append((x, y, x + width, y + height))
+
+    # A grid of 700x200 cells (3x15 per sheet) would need 8 sheets
+    assert plan.sheets == 5
+    report = plan.utilization()
+    assert [row['labels'] for row in report] == [74, 57, 57, 70, 72]
+    assert all(0 < row['utilization'] <= 1 for row in report)
+
+def test_layout_plan_is_compact():
+    """A huge job costs one entry per spec, not per label"""
+    plan = LayoutPlan([{'number': 1, 'count': 10_000_000}], [(400, 200)])
+    assert len(plan.numbers) == 1 and len(plan.block_first) == 2
+    assert plan.label(9_999_999) == (1, '')
+    assert plan.position(9_999_999)[0] == plan.sheets - 1
+
+def test_render_pages_subset():
+    """Any page can be rendered on its own and matches the full render"""
+    print("Rendering a single page out of a job...")
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 60, 'title': 'Product A'},
+        {'number': 45678, 'count': 50},
+        {'number': 7885526, 'count': 70, 'title': 'Special Item'}
+    ]
+    full = create_multi_barcode_sheet(barcode_specs, workers=1)
+    plan = plan_sheets(barcode_specs)
+    reprint = list(render_pages(plan, pages=[2, 0], workers=1))
+    assert same_pixels(reprint[0], full[2])
+    assert same_pixels(reprint[1], full[0])
+
+def test_preview_matches_thumbnail():
+    """Screen-resolution previews look like a thumbnail of the full sheet"""
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 25, 'title': 'Product A'},
+        {'start': 98, 'count': 30, 'prefix': 'AST-'},
+    ]
+    plan = plan_sheets(barcode_specs)
+    preview = render_preview(plan, 0, max_size=(600, 800))
+    assert preview.width <= 600 and preview.height <= 800
+
+    thumbnail = next(render_pages(plan, pages=[0], workers=1))
+    thumbnail.thumbnail((600, 800), Image.Resampling.LANCZOS)
+    assert preview.size == thumbnail.size
+    difference = ImageStat.Stat(ImageChops.difference(preview, thumbnail.convert('L'))).mean[0]
+    assert difference < 20, difference
+
+def test_parallel_matches_serial():
+    """Process-based rendering returns the same pages in the same order"""
+    print("Comparing parallel and serial sheet rendering...")
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 60, 'title': 'Product A'},
+        {'number': 45678, 'count': 50},
+        {'number': 7885526, 'count': 70, 'title': 'Special Item'}
+    ]
+    original_min_sheets = utils.PARALLEL_MIN_SHEETS
+    utils.PARALLEL_MIN_SHEETS = 2
+    try:
+        serial = create_multi_barcode_sheet(barcode_specs, workers=1)
+        parallel = create_multi_barcode_sheet(barcode_specs, workers=2)
+    finally:
+        utils.PARALLEL_MIN_SHEETS = original_min_sheets
+
+    assert len(serial) == len(parallel) > 2
+    for expected, actual in zip(serial, parallel):
+        assert actual.mode == 'RGB'
+        assert same_pixels(expected, actual)
+
+def test_greyscale_pages_match_rgb():
+    """RGB jobs handed over as greyscale pages hold the same pixels, serially and in parallel"""
+    plan = plan_sheets([{'number': 1120000250608, 'count': 130, 'title': 'Product A'}, {'number': 45678, 'count': 50}])
+    assert plan.page_mode == 'L'
+    original_min_sheets = utils.PARALLEL_MIN_SHEETS
+    utils.PARALLEL_MIN_SHEETS = 2
+    try:
+        rgb = list(render_pages(plan, workers=1))
+        for workers in (1, 2):
+            grey = list(render_pages(plan, workers=workers, mode='L'))
+            assert [sheet.mode for sheet in grey] == ['L'] * plan.sheets
+            assert all(a.convert('L').tobytes() == b.tobytes() for a, b in zip(rgb, grey))
+    finally:
+        utils.PARALLEL_MIN_SHEETS = original_min_sheets
+
+def test_resolve_workers():
+    assert resolve_workers(1) == 1
+    assert resolve_workers(0) == 1
+    assert 1 <= resolve_workers() <= utils.MAX_DEFAULT_WORKERS
+
+if __name__ == "__main__":
+    test_layout_plan_lookups()
+    test_mixed_widths_are_packed()
+    test_layout_plan_is_compact()
+    test_render_pages_subset()
+    test_preview_matches_thumbnail()
+    test_parallel_matches_serial()
+    test_greyscale_pages_match_rgb()
+    test_resolve_workers()
+    print("✅ Sheet tests passed")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Test script for start-up time and pre-warming
+"""
+
+from warmup import STARTUP_BUDGET, check_startup, measure_startup, prewarm
+
+def test_cold_start_imports_lazily():
+    """A fresh interpreter renders its first titled label without the optional modules
+
+    Timings are only printed; the budgets are enforced by ``warmup.py --check``.
+    """
+    report = measure_startup()
+    print(f"Cold start: {report}")
+    assert report['eager_modules'] == []
+
+def test_check_flags_slow_starts():
+    """Timings over budget and eager imports are reported"""
+    fast = {stage: limit / 2 for stage, limit in STARTUP_BUDGET.items()}
+    assert check_startup(dict(fast, eager_modules=[])) == []
+    slow = dict(fast, first_render=STARTUP_BUDGET['first_render'] * 2, eager_modules=['pandas'])
+    assert len(check_startup(slow)) == 2
+
+def test_prewarm_fills_caches():
+    """A warm-up leaves the tile cache filled and the title font resolved"""
+    import utils
+    timings = prewarm()
+    assert set(timings) == {'import', 'fonts', 'render'}
+    assert utils.tile_cache.stats()['size'] > 0
+    assert 30 in utils.get_font_sources()      # the title font is resolved
+
+if __name__ == "__main__":
+    test_cold_start_imports_lazily()
+    test_check_flags_slow_starts()
+    test_prewarm_fills_caches()
+    print("✅ Start-up tests passed")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for the barcode tile cache
+"""
+
+from utils import LABEL_OPTIONS, TileCache, create_multi_barcode_sheet, get_barcode_tile, tile_cache
+
+def test_repeated_copies_render_once():
+    """A 25x3 job should render 3 tiles, not 75"""
+    print("Testing tile cache on a 25x3 job...")
+
+    tile_cache.clear()
+    barcode_specs = [
+        {'number': 1120000250608, 'count': 25, 'title': 'Product A'},
+        {'number': 1120000250625, 'count': 25, 'title': 'Product B'},
+        {'number': 1120000250808, 'count': 25, 'title': 'Product C'}
+    ]
+    create_multi_barcode_sheet(barcode_specs)
+
+    stats = tile_cache.stats()
+    print(f"Cache stats: {stats}")
+    # One render per distinct label; planning measures tiles without rendering
+    assert stats['misses'] == 3
+    assert stats['size'] == 3
+
+def test_tiles_are_shared():
+    """Identical keys return the very same tile object"""
+    cache = TileCache(maxsize=4)
+    first = get_barcode_tile(12345, 'Shelf', LABEL_OPTIONS, cache=cache)
+    second = get_barcode_tile('12345', 'Shelf', dict(LABEL_OPTIONS), cache=cache)
+    assert first is second
+    assert cache.stats()['hits'] == 1
+
+    # A different DPI or title is a different tile
+    assert get_barcode_tile(12345, '', LABEL_OPTIONS, cache=cache) is not first
+    assert get_barcode_tile(12345, 'Shelf', LABEL_OPTIONS, dpi=150, cache=cache).size != first.size
+
+def test_lru_eviction():
+    """The cache stays bounded and evicts the least recently used tile"""
+    cache = TileCache(maxsize=2)
+    get_barcode_tile(111, '', LABEL_OPTIONS, cache=cache)
+    get_barcode_tile(222, '', LABEL_OPTIONS, cache=cache)
+    get_barcode_tile(111, '', LABEL_OPTIONS, cache=cache)   # 111 is now most recent
+    get_barcode_tile(333, '', LABEL_OPTIONS, cache=cache)   # evicts 222
+
+    stats = cache.stats()
+    assert stats == {'hits': 1, 'misses': 3, 'evictions': 1, 'size': 2, 'maxsize': 2}
+
+    get_barcode_tile(111, '', LABEL_OPTIONS, cache=cache)
+    assert cache.stats()['hits'] == 2
+    get_barcode_tile(222, '', LABEL_OPTIONS, cache=cache)
+    assert cache.stats()['misses'] == 4
+
+if __name__ == "__main__":
+    test_repeated_copies_render_once()
+    test_tiles_are_shared()
+    test_lru_eviction()
+    print("✅ Tile cache tests passed")
@@ -3,7 +3,10 @@
 Test script for the updated multi-barcode generator with titles
 """
 
-from utils import create_multi_barcode_sheet, save_sheets_as_pdf
+from PIL import Image, ImageChops, ImageDraw
+
+from utils import (LABEL_OPTIONS, create_multi_barcode_sheet, generate_barcode_with_title, generate_single_barcode,
+                   get_font, measure_title, save_sheets_as_pdf, title_strip_cache)
 
 def test_barcode_with_titles():
     """Test generating barcodes with custom titles"""
@@ -71,12 +74,46 @@ def test_barcode_without_titles():
         traceback.print_exc()
         return False
 
+def draw_title_directly(number, title, options):
+    """The original approach: measure on a scratch image and draw onto each label"""
+    barcode_img = generate_single_barcode(number, options)
+    font = get_font(size=30)
+    bbox = ImageDraw.Draw(Image.new('RGB', (1, 1), 'white')).textbbox((0, 0), title, font=font)
+    text_width = bbox[2] - bbox[0]
+    title_section_height = bbox[3] - bbox[1] + 20
+    combined_width = max(barcode_img.width, text_width + 20)
+    combined = Image.new('RGB', (combined_width, barcode_img.height + title_section_height), 'white')
+    ImageDraw.Draw(combined).text(((combined_width - text_width) // 2, 10), title, fill='black', font=font)
+    combined.paste(barcode_img, ((combined_width - barcode_img.width) // 2, title_section_height))
+    return combined
+
+def test_title_strips_match_direct_drawing():
+    """Pre-composed title strips give the same pixels as drawing the title per label"""
+    for title in ['Product A', 'gjpq descenders', 'A title much wider than the barcode itself']:
+        expected = draw_title_directly(1120000250608, title, LABEL_OPTIONS)
+        actual = generate_barcode_with_title(1120000250608, title, LABEL_OPTIONS)
+        assert expected.size == actual.size
+        assert ImageChops.difference(expected, actual).getbbox() is None
+
+def test_shared_title_measured_and_drawn_once():
+    """Labels sharing a title reuse one measurement and one title strip"""
+    measure_title.cache_clear()
+    title_strip_cache.clear()
+    for offset in range(20):
+        generate_barcode_with_title(1120000250608 + offset, 'Shared Title', LABEL_OPTIONS)
+
+    assert measure_title.cache_info().misses == 1
+    assert title_strip_cache.stats()['misses'] == 1
+    assert title_strip_cache.stats()['hits'] == 19
+
 if __name__ == "__main__":
     print("🧪 Testing Multi-Barcode Generator with Titles")
     print("=" * 50)
     
     success1 = test_barcode_with_titles()
     success2 = test_barcode_without_titles()
+    test_title_strips_match_direct_drawing()
+    test_shared_title_measured_and_drawn_once()
     
     if success1 and success2:
         print("\n🎉 All tests passed! The barcode generator is working correctly.")
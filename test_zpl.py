@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for ZPL label printer output
+
+The expected streams are kept as golden files in golden/. After an
+intentional change to the output, rewrite them with:
+
+    python test_zpl.py --update
+"""
+
+import io
+import sys
+from pathlib import Path
+
+from cli import run
+from zpl import write_zpl
+
+GOLDEN = Path(__file__).resolve().parent / "golden"
+
+CASES = {
+    # Plain labels: duplicates merged, untitled, special characters and UTF-8 titles
+    'labels_203.zpl': ([
+        {'number': '1120000250608', 'count': 25, 'title': 'Product A'},
+        {'number': '45678', 'count': 10},
+        {'number': 1120000250608, 'count': 5, 'title': 'Product A'},
+        {'number': 'LOT^7_B', 'count': 2, 'title': 'Größe ~ M'},
+    ], 203),
+    # Serial ranges: counted by the printer where possible, one format per label otherwise
+    'serials_300.zpl': ([
+        {'start': 98, 'count': 5, 'prefix': 'AST-', 'title': 'Asset {index}'},
+        {'start': 500, 'count': 3, 'step': -2, 'title': 'Bin'},
+        {'start': 1, 'count': 3, 'prefix': 'X9', 'title': '{number} tag'},
+    ], 300),
+}
+
+def render(specs, dpi):
+    buffer = io.BytesIO()
+    write_zpl(specs, buffer, dpi=dpi)
+    return buffer.getvalue()
+
+def test_matches_golden_files():
+    """The command streams are byte-for-byte the reviewed golden files"""
+    for name, (specs, dpi) in CASES.items():
+        assert render(specs, dpi) == (GOLDEN / name).read_bytes(), f"{name} differs (python test_zpl.py --update)"
+
+def test_thousands_of_labels_stay_small():
+    """Print quantities and printer-side counting keep big jobs to a few kilobytes"""
+    specs = [{'number': str(1120000250608 + i), 'count': 250, 'title': f'Product {i}'} for i in range(20)]
+    specs.append({'start': 1, 'count': 100000, 'prefix': 'AST-', 'title': 'Asset {index}'})
+    data = render(specs, 203)
+    print(f"105000 labels in {len(data)} bytes")
+    assert len(data) < 6000
+    text = data.decode('utf-8')
+    assert text.count('^XA') == text.count('^XZ') == 20 + 6      # one per digit count in the range
+    assert sum(int(line[3:]) for line in text.splitlines() if line.startswith('^PQ')) == 105000
+
+def test_title_templates():
+    """Padded fields get one format per label; a bad template raises ValueError"""
+    text = render([{'start': 9, 'count': 2, 'title': 'Lot {index:03d}'}], 203).decode('utf-8')
+    assert '^FDLot 001^FS' in text and '^FDLot 002^FS' in text
+    try:
+        render([{'start': 9, 'count': 2, 'title': 'Lot {'}], 203)
+    except ValueError as e:
+        assert 'Invalid title template' in str(e)
+    else:
+        raise AssertionError("a single '{' was accepted")
+
+def test_cli_zpl_output(tmp_path):
+    """The CLI picks ZPL from the extension and reports formats instead of sheets"""
+    output = tmp_path / "labels.zpl"
+    summary = run([{'number': 12345, 'count': 40, 'title': 'Box'}], str(output), fmt='zpl', dpi=203)
+    assert summary['labels'] == 40 and summary['formats'] == 1 and summary['sheets'] is None
+    assert output.read_bytes().startswith(b'^XA') and summary['bytes'] == output.stat().st_size
+
+if __name__ == "__main__":
+    if '--update' in sys.argv:
+        GOLDEN.mkdir(exist_ok=True)
+        for name, (specs, dpi) in CASES.items():
+            (GOLDEN / name).write_bytes(render(specs, dpi))
+            print(f"Wrote {GOLDEN / name}")
+        sys.exit(0)
+    import tempfile
+    test_matches_golden_files()
+    test_thousands_of_labels_stay_small()
+    test_title_templates()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cli_zpl_output(Path(tmp))
+    print("✅ ZPL tests passed")
@@ -1,20 +1,79 @@
 # Bulk barcode generator for A4 sheet printing
+#
+# Modules only some paths need (font downloads, the ImageWriter engine, the
+# vector backend) are imported where they are used, to keep start-up short.
 
-from barcode.codex import Code128
-from barcode.writer import ImageWriter
 from PIL import Image, ImageDraw, ImageFont
+from raster import SheetCompositor, barcode_size, render_code128, serial_patterns, supports_options, tile_pixels
+from pdf_writer import EncodedPage, PdfStreamWriter, encode_page, write_pdf
+from render_cache import CACHE_VERSION
+from metrics import NULL_METRICS, RenderMetrics
+import contextlib
+import functools
+import hashlib
 import io
+import logging
 import os
-import urllib.request
-import tempfile
+import string
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
 from pathlib import Path
 
-def download_font(font_url, font_name):
+# Job summaries (layout, page reuse, font downloads) go here; silent unless logging is configured
+logger = logging.getLogger(__name__)
+
+# Where fonts are downloaded to or pre-seeded (e.g. at Docker build time)
+FONTS_DIR_ENV = 'BARCODE_FONTS_DIR'
+# Set to 1 to never download fonts at render time (use system/pre-seeded fonts only)
+FONTS_OFFLINE_ENV = 'BARCODE_FONTS_OFFLINE'
+
+# Font URLs - using reliable sources
+FONT_OPTIONS = [
+    # Try system fonts first
+    {"type": "system", "path": "arial.ttf"},
+    {"type": "system", "path": "Arial.ttf"},
+    {"type": "system", "path": "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"},
+    {"type": "system", "path": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"},
+    {"type": "system", "path": "/System/Library/Fonts/Arial.ttf"},  # macOS
+    {"type": "system", "path": "C:\\Windows\\Fonts\\arial.ttf"},     # Windows
+    
+    # Downloadable fonts as fallback
+    {
+        "type": "download",
+        "url": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
+        "name": "Roboto-Regular.ttf"
+    },
+    {
+        "type": "download", 
+        "url": "https://github.com/google/fonts/raw/main/ofl/opensans/OpenSans-Regular.ttf",
+        "name": "OpenSans-Regular.ttf"
+    }
+]
+
+# Resolved fonts, kept for the life of the process (and so across Streamlit reruns)
+_font_cache = {}
+_font_sources = {}
+_resolved_font_file = None
+_font_lock = threading.Lock()
+
+def get_fonts_dir():
+    """Directory holding downloaded or pre-seeded fonts"""
+    default = Path(__file__).resolve().parent / "fonts"
+    return Path(os.environ.get(FONTS_DIR_ENV) or default)
+
+def fonts_offline():
+    """True when render-time font downloads are disabled"""
+    return os.environ.get(FONTS_OFFLINE_ENV, '') not in ('', '0')
+
+def download_font(font_url, font_name, allow_download=True):
     """Download a font file and return the local path"""
     try:
         # Create fonts directory if it doesn't exist
-        fonts_dir = Path("fonts")
-        fonts_dir.mkdir(exist_ok=True)
+        fonts_dir = get_fonts_dir()
+        fonts_dir.mkdir(parents=True, exist_ok=True)
         
         font_path = fonts_dir / font_name
         
@@ -22,67 +81,140 @@ def download_font(font_url, font_name):
         if font_path.exists():
             return str(font_path)
         
-        print(f"Downloading font: {font_name}...")
+        if not allow_download:
+            return None
+        
+        import urllib.request
+        logger.info("Downloading font: %s...", font_name)
         urllib.request.urlretrieve(font_url, font_path)
-        print(f"Font downloaded successfully: {font_path}")
+        logger.info("Font downloaded successfully: %s", font_path)
         return str(font_path)
         
     except Exception as e:
-        print(f"Failed to download font {font_name}: {e}")
+        logger.warning("Failed to download font %s: %s", font_name, e)
         return None
 
-def get_font(size=30):
-    """Get a font with fallback options including font download"""
-    
-    # Font URLs - using reliable sources
-    font_options = [
-        # Try system fonts first
-        {"type": "system", "path": "arial.ttf"},
-        {"type": "system", "path": "Arial.ttf"},
-        {"type": "system", "path": "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"},
-        {"type": "system", "path": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"},
-        {"type": "system", "path": "/System/Library/Fonts/Arial.ttf"},  # macOS
-        {"type": "system", "path": "C:\\Windows\\Fonts\\arial.ttf"},     # Windows
-        
-        # Downloadable fonts as fallback
-        {
-            "type": "download",
-            "url": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
-            "name": "Roboto-Regular.ttf"
-        },
-        {
-            "type": "download", 
-            "url": "https://github.com/google/fonts/raw/main/ofl/opensans/OpenSans-Regular.ttf",
-            "name": "OpenSans-Regular.ttf"
-        }
-    ]
+def seed_fonts():
+    """Download the fallback fonts into the fonts directory (run at image build time)
     
-    # Try each font option
-    for font_option in font_options:
+    Returns the list of font files now available locally.
+    """
+    seeded = []
+    for font_option in FONT_OPTIONS:
+        if font_option["type"] == "download":
+            font_path = download_font(font_option["url"], font_option["name"])
+            if font_path:
+                seeded.append(font_path)
+    return seeded
+
+def _resolve_font_file(size):
+    """Walk FONT_OPTIONS and return (font, source, path) for the first usable font"""
+    for font_option in FONT_OPTIONS:
         try:
             if font_option["type"] == "system":
                 font = ImageFont.truetype(font_option["path"], size)
-                return font
+                return font, "system", font_option["path"]
             elif font_option["type"] == "download":
-                font_path = download_font(font_option["url"], font_option["name"])
+                local_path = get_fonts_dir() / font_option["name"]
+                already_local = local_path.exists()
+                font_path = download_font(font_option["url"], font_option["name"], allow_download=not fonts_offline())
                 if font_path:
                     font = ImageFont.truetype(font_path, size)
-                    return font
+                    return font, "bundled" if already_local else "download", font_path
         except Exception as e:
             continue
     
     # Final fallback to default font
     try:
-        return ImageFont.load_default(size=size)
+        return ImageFont.load_default(size=size), "default", None
     except:
         # Very old PIL versions might not support size parameter
-        return ImageFont.load_default()
+        return ImageFont.load_default(), "default", None
+
+def get_font(size=30):
+    """Get a font with fallback options including font download
+    
+    Fonts are resolved once per process and cached by size; after the first
+    lookup other sizes reuse the same font file without walking the fallbacks.
+    See get_font_sources() for where each size came from.
+    """
+    global _resolved_font_file
+    
+    font = _font_cache.get(size)
+    if font is not None:
+        return font
+    
+    with _font_lock:
+        font = _font_cache.get(size)
+        if font is not None:
+            return font
+        
+        started = time.perf_counter()
+        font = None
+        if _resolved_font_file is not None:
+            path = _resolved_font_file
+            try:
+                font = ImageFont.truetype(path, size)
+                source = 'cached'
+            except Exception:
+                font = None
+        if font is None:
+            font, source, path = _resolve_font_file(size)
+            if path is not None:
+                _resolved_font_file = path
+        
+        _font_sources[size] = {
+            'source': source,
+            'path': path,
+            'seconds': round(time.perf_counter() - started, 6),
+        }
+        _font_cache[size] = font
+        return font
+
+def get_font_sources():
+    """Return {size: {'source', 'path', 'seconds'}} for every resolved font
+    
+    'source' is 'system', 'bundled' (found in the fonts directory), 'download'
+    (fetched over the network during this render), 'default' (Pillow's
+    built-in font) or 'cached' (the file an earlier size resolved to).
+    """
+    with _font_lock:
+        return {size: dict(info) for size, info in _font_sources.items()}
+
+def clear_font_cache():
+    """Forget resolved fonts (mainly for tests)"""
+    global _resolved_font_file
+    with _font_lock:
+        _font_cache.clear()
+        _font_sources.clear()
+        _resolved_font_file = None
+    measure_title.cache_clear()
+    title_layout.cache_clear()
+    _tile_size.cache_clear()
+    title_strip_cache.clear()
 
-def generate_single_barcode(number, options):
-    """Generate a single barcode and return as PIL Image"""
+def generate_single_barcode(number, options, dpi=300, mode='RGB', pattern=None):
+    """Generate a single barcode and return as PIL Image (mode 'RGB' or bilevel '1')
+    
+    ``pattern`` is an optional pre-built Code128 module pattern (see serial_patterns).
+    """
+    # Render straight to pixels when the options allow it (same output, no PNG round trip)
+    if supports_options(options):
+        return render_code128(number, options, dpi=dpi, pattern=pattern, mode=mode)
+    barcode_img = generate_single_barcode_imagewriter(number, options, dpi=dpi)
+    return to_bilevel(barcode_img) if mode == '1' else barcode_img
+
+def to_bilevel(image):
+    """Threshold an image to mode '1' at mid-grey (no dithering)"""
+    return image.convert('L').point(lambda value: 255 if value >= 128 else 0, mode='1')
+
+def generate_single_barcode_imagewriter(number, options, dpi=300):
+    """Generate a single barcode through python-barcode's ImageWriter (PNG round trip)"""
+    from barcode.codex import Code128
+    from barcode.writer import ImageWriter
     writer = ImageWriter()
     writer.format = 'PNG'
-    writer.dpi = 300
+    writer.dpi = dpi
     
     # Create barcode
     my_code = Code128(str(number), writer=writer)
@@ -95,26 +227,24 @@ def generate_single_barcode(number, options):
     # Open as PIL Image
     return Image.open(buffer)
 
-def generate_barcode_with_title(number, title, options):
-    """Generate a barcode with custom title text on top"""
-    # First generate the standard barcode
-    barcode_img = generate_single_barcode(number, options)
-    
-    if not title:
-        return barcode_img
-    
-    # Calculate dimensions for the combined image
-    barcode_width, barcode_height = barcode_img.size
-    
-    # Get font with fallback options including downloading if needed
-    font = get_font(size=30)
+@functools.lru_cache(maxsize=4096)
+def measure_title(title, font_size):
+    """Return the title's text bounding box (same as ImageDraw.textbbox at (0, 0))"""
+    return get_font(size=font_size).getbbox(title)
+
+@functools.lru_cache(maxsize=4096)
+def title_layout(title, barcode_size, font_size):
+    """Work out where the title and barcode go in a titled label
     
-    # Create a temporary image to measure text size
-    temp_img = Image.new('RGB', (1, 1), 'white')
-    temp_draw = ImageDraw.Draw(temp_img)
+    Returns a dictionary with the combined 'size', the title 'text_pos', the
+    'barcode_pos' and the 'strip_height' of the pre-rendered title strip.
+    Memoized per (title, barcode size, font size), so labels sharing a title
+    measure it once.
+    """
+    barcode_width, barcode_height = barcode_size
     
     # Get text bounding box
-    bbox = temp_draw.textbbox((0, 0), title, font=font)
+    bbox = measure_title(title, font_size)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
     
@@ -126,161 +256,991 @@ def generate_barcode_with_title(number, title, options):
     combined_width = max(barcode_width, text_width + (text_padding * 2))
     combined_height = barcode_height + title_section_height
     
-    combined_img = Image.new('RGB', (combined_width, combined_height), 'white')
-    draw = ImageDraw.Draw(combined_img)
+    return {
+        'size': (combined_width, combined_height),
+        # Draw the title text centered at the top
+        'text_pos': ((combined_width - text_width) // 2, text_padding),
+        # Paste the barcode below the title
+        'barcode_pos': ((combined_width - barcode_width) // 2, title_section_height),
+        # Ink can reach below the title section; keep it so the strip matches
+        # drawing the title straight onto the label
+        'strip_height': min(combined_height, max(title_section_height, text_padding + bbox[3])),
+    }
+
+def get_title_strip(title, layout, font_size, mode='RGB'):
+    """Return the (shared, read-only) title strip for a label, drawing it only once"""
+    width = layout['size'][0]
+    key = (title, width, layout['strip_height'], font_size, mode)
+    
+    def render():
+        # Mode '1' images get aliased (bilevel) title text from ImageDraw
+        strip = Image.new(mode, (width, layout['strip_height']), 'white')
+        ImageDraw.Draw(strip).text(layout['text_pos'], title, fill='black', font=get_font(size=font_size))
+        return strip
+    
+    return title_strip_cache.get(key, render)
+
+def generate_barcode_with_title(number, title, options, dpi=300, mode='RGB', pattern=None):
+    """Generate a barcode with custom title text on top"""
+    # First generate the standard barcode
+    barcode_img = generate_single_barcode(number, options, dpi=dpi, mode=mode, pattern=pattern)
+    
+    if not title:
+        return barcode_img
     
-    # Draw the title text centered at the top
-    text_x = (combined_width - text_width) // 2
-    text_y = text_padding
-    draw.text((text_x, text_y), title, fill='black', font=font)
+    # Title font is 30px at 300 DPI, scaled for other resolutions
+    font_size = max(1, 30 * dpi // 300)
+    layout = title_layout(title, barcode_img.size, font_size)
     
-    # Paste the barcode below the title
-    barcode_x = (combined_width - barcode_width) // 2
-    barcode_y = title_section_height
-    combined_img.paste(barcode_img, (barcode_x, barcode_y))
+    # Combine the pre-rendered title strip with the barcode
+    combined_img = Image.new(mode, layout['size'], 'white')
+    combined_img.paste(get_title_strip(title, layout, font_size, mode), (0, 0))
+    combined_img.paste(barcode_img, layout['barcode_pos'])
     
     return combined_img
 
+class TileCache:
+    """Bounded LRU cache of rendered barcode tiles
+    
+    Tiles are keyed on (number, title, writer options, DPI) and shared between
+    every label that uses them, so callers must treat a returned tile as
+    read-only and ``copy()`` it before drawing on it.
+    """
+    
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._tiles)
+    
+    @staticmethod
+    def make_key(number, title, options, dpi=300, mode='RGB'):
+        """Build a hashable cache key for one tile"""
+        return (str(number), title or '', tuple(sorted(options.items())), dpi, mode)
+    
+    def get(self, key, render):
+        """Return the tile for ``key``, calling ``render()`` on a miss"""
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+        
+        # Render outside the lock so other sessions are not blocked; two threads
+        # racing on the same key just render it twice
+        tile = render()
+        tile.load()
+        
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.maxsize:
+                self._tiles.popitem(last=False)
+                self.evictions += 1
+        return tile
+    
+    def clear(self):
+        """Drop all cached tiles and reset the counters"""
+        with self._lock:
+            self._tiles.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        """Return hit/miss/eviction counters as a dictionary"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._tiles),
+                'maxsize': self.maxsize,
+            }
+
+# Process-wide tile cache shared by all sheet generation calls
+tile_cache = TileCache()
+# Pre-rendered title strips, shared by every label with the same title and width
+title_strip_cache = TileCache(maxsize=64)
+# Screen-resolution tiles for previews, keyed on the tile key and the scale
+preview_tile_cache = TileCache(maxsize=256)
+
+def get_barcode_tile(number, title, options, dpi=300, cache=None, mode='RGB'):
+    """Return a (shared, read-only) barcode tile, rendering it only once"""
+    cache = tile_cache if cache is None else cache
+    key = cache.make_key(number, title, options, dpi, mode)
+    if title:
+        return cache.get(key, lambda: generate_barcode_with_title(number, title, options, dpi=dpi, mode=mode))
+    return cache.get(key, lambda: generate_single_barcode(number, options, dpi=dpi, mode=mode))
+
+@functools.lru_cache(maxsize=4096)
+def _tile_size(number, title, options_items, dpi, mode):
+    options = dict(options_items)
+    if not supports_options(options):
+        # ImageWriter fallback: the only way to know the size is to render
+        return get_barcode_tile(number, title, options, dpi=dpi, mode=mode).size
+    size = barcode_size(number, options, dpi=dpi)
+    if title:
+        size = title_layout(title, size, max(1, 30 * dpi // 300))['size']
+    return size
+
+def tile_size(number, title, options, dpi=300, mode='RGB'):
+    """Return the (width, height) of a label tile without rendering it
+    
+    Sizes come from the barcode geometry and the title layout, so planning a
+    job measures each distinct label once and draws nothing.
+    """
+    return _tile_size(str(number), title or '', tuple(sorted(options.items())), dpi, mode)
+
 def create_a4_barcode_sheet(start_number, count=65):
     """Create an A4 sheet with multiple barcodes (legacy function for backwards compatibility)"""
     barcode_specs = [{'number': start_number, 'count': count, 'title': ''}]
     sheets = create_multi_barcode_sheet(barcode_specs)
     return sheets[0] if isinstance(sheets, list) else sheets
 
-def create_multi_barcode_sheet(barcode_specs):
+def create_multi_barcode_sheet(barcode_specs, workers=None, mode='RGB', dpi=300, metrics=None):
     """Create multiple A4 sheets with different barcodes
     
     Args:
         barcode_specs: List of dictionaries with 'number', 'count', and optional 'title' keys
                       e.g., [{'number': 12345, 'count': 25, 'title': 'Product A'}, 
                              {'number': 67890, 'count': 30, 'title': 'Product B'}]
+                      A spec with 'start' instead of 'number' is a serial range:
+                      {'start': 1000, 'count': 500, 'step': 1, 'prefix': 'AST-',
+                       'title': 'Asset {index}'} makes AST-1000 ... AST-1499
+                      (see expand_specs for the title placeholders)
+        workers: Number of processes to render sheets with. None picks one per CPU
+                 (capped at MAX_DEFAULT_WORKERS); 1 forces serial rendering. Jobs with
+                 fewer than PARALLEL_MIN_SHEETS sheets are always rendered serially.
+        mode: 'RGB' (default) or '1' for bilevel sheets. Bilevel tiles, titles and
+              canvases use 1 bit per pixel and compress losslessly in write_sheets_pdf.
+        dpi: Sheet resolution; A4 pages, margins, labels and titles scale with it.
+        metrics: Optional metrics.RenderMetrics for progress callbacks, stage
+                 timers and cache counters. Without one nothing is reported
+                 per label.
     
     Returns:
-        List of PIL Images (one per A4 sheet) or single PIL Image if only one sheet
+        List of PIL Images (one per A4 sheet) or single PIL Image if only one sheet.
+        Consecutive identical sheets are rendered once; each still gets its
+        own Image, so sheets can be edited independently.
     """
+    sheets = []
+    previous = None
+    for sheet in iter_barcode_sheets(barcode_specs, workers=workers, mode=mode, dpi=dpi, metrics=metrics):
+        # A repeated page arrives as the same object as the one before it
+        sheets.append(sheet.copy() if sheet is previous else sheet)
+        previous = sheet
+    del previous
     
-    # A4 dimensions at 300 DPI: 2480 x 3508 pixels
-    a4_width = 2480
-    a4_height = 3508
-    
-    # Margins (in pixels at 300 DPI)
-    margin_left = 100
-    margin_top = 100
-    margin_right = 100
-    margin_bottom = 100
-    
-    # Available space for barcodes
-    available_width = a4_width - margin_left - margin_right
-    available_height = a4_height - margin_top - margin_bottom
-    
-    # Barcode generation options - smaller for fitting more on page
-    options = {
-        'module_width': 0.25,  # Reduced width for smaller barcodes
-        'module_height': 8.0,  # Reduced height
-        'quiet_zone': 3.0,     # Smaller quiet zone
-        'font_size': 6,        # Smaller font
-        'text_distance': 3.0,  # Less distance
-        'background': 'white',
-        'foreground': 'black',
-    }
-      # Generate first barcode to get dimensions (check if it has a title for sizing)
-    if not barcode_specs:
-        raise ValueError("No barcode specifications provided")
+    # Return single sheet if only one, otherwise return list
+    return sheets[0] if len(sheets) == 1 else sheets
+
+def iter_barcode_sheets(barcode_specs, workers=None, mode='RGB', dpi=300, metrics=None):
+    """Yield A4 sheets one at a time, in page order
     
-    first_spec = barcode_specs[0]
-    first_title = first_spec.get('title', '')
-    if first_title:
-        sample_barcode = generate_barcode_with_title(first_spec['number'], first_title, options)
-    else:
-        sample_barcode = generate_single_barcode(first_spec['number'], options)
-    barcode_width, barcode_height = sample_barcode.size
+    Takes the same arguments as create_multi_barcode_sheet. Only the sheet being
+    yielded (plus, with workers, the few sheets in flight) is held in memory, so
+    pairing this with write_sheets_pdf keeps memory flat whatever the job size.
+    Unlike create_multi_barcode_sheet, a repeated sheet is yielded as the same
+    Image object as the one before it; copy() a sheet before drawing on it.
+    """
+    plan = plan_sheets(barcode_specs, mode=mode, dpi=dpi, metrics=metrics)
+    yield from render_pages(plan, workers=workers, metrics=metrics)
+
+# Fields a serial range's title template can use (see expand_specs)
+TITLE_FIELDS = ('number', 'serial', 'index')
+
+def _check_title_template(title):
+    """Raise ValueError unless ``title`` formats with just the TITLE_FIELDS"""
+    try:
+        for _literal, field, _spec, _conversion in string.Formatter().parse(title):
+            if field is not None and field not in TITLE_FIELDS:
+                raise ValueError(f"unknown field {{{field}}}")
+        title.format(number='0', serial=0, index=1)
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        raise ValueError(f"Invalid title template {title!r}: {e} (use {{number}}, {{serial}} or {{index}}, "
+                         f"and {{{{ or }}}} for a literal brace)") from None
+
+class _SampleDigits(int):
+    """An int that formats as usual but with every digit shown as ``digit``"""
+    
+    def __new__(cls, value, digit):
+        sample = super().__new__(cls, value)
+        sample.digits = str.maketrans('0123456789', digit * 10)
+        return sample
+    
+    def __format__(self, spec):
+        return format(int(self), spec).translate(self.digits)
+    
+    def __str__(self):
+        return self.__format__('')
+
+class SerialRun(namedtuple('SerialRun', 'prefix start step title index')):
+    """A stretch of a serial range whose numbers all have the same digit count
+    
+    Label ``i`` of the run encodes ``prefix + str(start + i * step)``; ``index``
+    is the run's offset within the whole range, for ``{index}`` in titles.
+    """
+    
+    __slots__ = ()
     
-    # Calculate grid layout
-    # Try to fit as many as possible while maintaining readability
-    cols = available_width // (barcode_width + 10)  # 10px spacing
-    rows = available_height // (barcode_height + 10)  # 10px spacing
-    barcodes_per_sheet = cols * rows
+    def value(self, offset):
+        return self.start + offset * self.step
     
-    print(f"Grid layout: {cols}x{rows} = {barcodes_per_sheet} barcodes per sheet")
-    print(f"Barcode size: {barcode_width}x{barcode_height} pixels")
+    def labels(self, offset, count):
+        """Return [(number, title)] for ``count`` labels starting at ``offset``"""
+        labels = []
+        for position in range(offset, offset + count):
+            serial = self.value(position)
+            number = f"{self.prefix}{serial}"
+            title = self.title.format(number=number, serial=serial, index=self.index + position + 1) if self.title else ''
+            labels.append((number, title))
+        return labels
     
-    # Create all barcodes based on specifications
-    all_barcodes = []
+    def patterns(self, offset, count):
+        """Return the Code128 module patterns for ``count`` labels, encoded in one batch"""
+        return serial_patterns(self.prefix, [self.value(position) for position in range(offset, offset + count)])
+    
+    def sample(self, count, digit='0'):
+        """Return a (number, title) as wide as any label of the run
+        
+        The title gets the same field types as in labels(), but every digit is
+        shown as ``digit`` (pass the widest one in the title font), so a single
+        measurement covers the whole run.
+        """
+        serial = _SampleDigits(self.start, digit)
+        number = f"{self.prefix}{serial}"
+        index = _SampleDigits(self.index + count, digit)
+        title = self.title.format(number=number, serial=serial, index=index) if self.title else ''
+        return f"{self.prefix}{self.start}", title
+
+def expand_specs(barcode_specs):
+    """Turn barcode specs into layout segments, splitting serial ranges lazily
+    
+    Plain specs ({'number', 'count', 'title'}) pass through unchanged. Range
+    specs ({'start', 'count', 'step', 'prefix', 'title'}) become one segment
+    per digit count, with a SerialRun as the segment's 'number'; the labels
+    themselves are only produced when their page is rendered. Range titles are
+    str.format templates and may use {number}, {serial} and {index} (1-based
+    ints, so '{index:03d}' works); a bad template raises ValueError here.
+    """
+    segments = []
     for spec in barcode_specs:
-        number = spec['number']
-        count = spec['count']
-        title = spec.get('title', '')
-        for _ in range(count):
-            all_barcodes.append({'number': number, 'title': title})
-            
-    total_barcodes = len(all_barcodes)
-    sheets_needed = (total_barcodes + barcodes_per_sheet - 1) // barcodes_per_sheet
+        if 'start' not in spec:
+            segments.append(spec)
+            continue
+        
+        start, count, step = int(spec['start']), int(spec['count']), int(spec.get('step', 1))
+        prefix, title = str(spec.get('prefix', '') or ''), spec.get('title', '') or ''
+        if start < 0 or start + (count - 1) * step < 0:
+            raise ValueError("Serial ranges must stay at or above zero")
+        if title:
+            _check_title_template(title)
+        
+        index = 0
+        while index < count:
+            value = start + index * step
+            digits = len(str(value))
+            # How many labels until the digit count changes
+            if step > 0:
+                run = -(-(10 ** digits - value) // step)
+            elif step < 0:
+                lowest = 10 ** (digits - 1) if digits > 1 else 0
+                run = (value - lowest) // -step + 1
+            else:
+                run = count
+            run = min(run, count - index)
+            segments.append({'number': SerialRun(prefix, value, step, title, index), 'count': run, 'title': ''})
+            index += run
+    return segments
+
+class LayoutPlan:
+    """Where every label of a job goes, worked out before any pixels are rendered
     
-    print(f"Total barcodes to generate: {total_barcodes}")
-    print(f"Sheets needed: {sheets_needed}")
+    Labels are packed in order onto shelves (rows) using each spec's real tile
+    size: a shelf fills left to right, is as tall as its tallest label, and a
+    new sheet starts when the next shelf does not fit. Jobs where every label
+    has the same size keep the classic grid centered on the page.
     
-    sheets = []
+    Labels are stored per spec (one number/title plus a cumulative start
+    offset) and positions as regular blocks of same-size labels, so the plan
+    stays small for any job size. Position and label lookups are a binary
+    search over the blocks and specs. Serial ranges are split into segments
+    by expand_specs and ``tile_sizes`` has one entry per segment.
+    """
     
-    for sheet_num in range(sheets_needed):
-        # Create A4 canvas
-        canvas = Image.new('RGB', (a4_width, a4_height), 'white')
+    def __init__(self, barcode_specs, tile_sizes, page_size=(2480, 3508), margins=(100, 100, 100, 100),
+                 spacing=10, options=None, mode='RGB', dpi=300):
+        if not barcode_specs:
+            raise ValueError("No barcode specifications provided")
+        barcode_specs = expand_specs(barcode_specs)
         
-        # Calculate actual spacing to center the grid
-        total_grid_width = cols * barcode_width + (cols - 1) * 10
-        total_grid_height = rows * barcode_height + (rows - 1) * 10
+        self.page_size = page_size
+        self.spacing = spacing
+        self.options = options
+        self.mode = mode
+        self.dpi = dpi
         
-        start_x = margin_left + (available_width - total_grid_width) // 2
-        start_y = margin_top + (available_height - total_grid_height) // 2
+        # Compact label storage: one entry per spec
+        self.numbers = [spec['number'] for spec in barcode_specs]
+        self.titles = [spec.get('title', '') or '' for spec in barcode_specs]
+        self.sizes = [tuple(size) for size in tile_sizes]
+        self.offsets = array('q', [0])
+        for spec in barcode_specs:
+            self.offsets.append(self.offsets[-1] + int(spec['count']))
+        self.total = self.offsets[-1]
         
-        # Calculate barcode range for this sheet
-        start_idx = sheet_num * barcodes_per_sheet
-        end_idx = min(start_idx + barcodes_per_sheet, total_barcodes)
+        margin_left, margin_top, margin_right, margin_bottom = margins
+        available_width = page_size[0] - margin_left - margin_right
+        available_height = page_size[1] - margin_top - margin_bottom
+        self.printable_area = available_width * available_height
+        for width, height in self.sizes:
+            if width > available_width or height > available_height:
+                raise ValueError(f"A {width}x{height} label does not fit on the page")
         
-        # Generate and place barcodes for this sheet
-        for i in range(start_idx, end_idx):
-            position_on_sheet = i - start_idx
-            row = position_on_sheet // cols
-            col = position_on_sheet % cols
-            if row >= rows:
-                break
-                
-            barcode_data = all_barcodes[i]
-            current_number = barcode_data['number']
-            current_title = barcode_data['title']
+        if len(set(self.sizes)) == 1:
+            # Uniform job: calculate grid layout and center it on the page
+            barcode_width, barcode_height = self.sizes[0]
+            cols = available_width // (barcode_width + spacing)
+            rows = available_height // (barcode_height + spacing)
+            grid_width = cols * barcode_width + (cols - 1) * spacing
+            grid_height = rows * barcode_height + (rows - 1) * spacing
+            left = margin_left + (available_width - grid_width) // 2
+            top = margin_top + (available_height - grid_height) // 2
+            self.area = (left, top, left + grid_width, top + grid_height)
+        else:
+            self.area = (margin_left, margin_top, margin_left + available_width, margin_top + available_height)
+        
+        # Blocks of same-size labels laid out as a regular grid: label j of a
+        # block sits in column j % cols of row (j // cols) % rows on sheet
+        # block_sheet + j // (cols * rows)
+        self.block_first = array('q')
+        self.block_sheet = array('q')
+        self.block_x = array('l')
+        self.block_y = array('l')
+        self.block_cols = array('l')
+        self.block_rows = array('l')
+        self.block_spec = array('l')
+        # First label of every sheet, plus the label area used on it
+        self.sheet_first = array('q')
+        self.sheet_used = array('d')
+        self._pack()
+        self.sheets = len(self.sheet_first)
+        self.sheet_first.append(self.total)
+    
+    def _add_block(self, spec, first, count, sheet, x, y, cols, rows):
+        self.block_first.append(first)
+        self.block_sheet.append(sheet)
+        self.block_x.append(x)
+        self.block_y.append(y)
+        self.block_cols.append(cols)
+        self.block_rows.append(rows)
+        self.block_spec.append(spec)
+        
+        width, height = self.sizes[spec]
+        per_sheet = cols * rows
+        for offset in range(0, count, per_sheet):
+            page = sheet + offset // per_sheet
+            if page == len(self.sheet_first):
+                self.sheet_first.append(first + offset)
+                self.sheet_used.append(0.0)
+            self.sheet_used[page] += min(per_sheet, count - offset) * width * height
+    
+    def _pack(self):
+        """Shelf-pack every spec's labels in order"""
+        left, top, right, bottom = self.area
+        spacing = self.spacing
+        sheet, x, y, shelf_height = 0, left, top, 0
+        
+        for spec, (width, height) in enumerate(self.sizes):
+            first = self.offsets[spec]
+            remaining = self.offsets[spec + 1] - first
+            step_x, step_y = width + spacing, height + spacing
             
-            # Generate barcode with or without title
-            if current_title:
-                barcode_img = generate_barcode_with_title(current_number, current_title, options)
+            while remaining:
+                if x > left:
+                    # Continue the open shelf if this label fits beside the others
+                    if x + width <= right and y + max(shelf_height, height) <= bottom:
+                        count = min(remaining, (right - x + spacing) // step_x)
+                        self._add_block(spec, first, count, sheet, x, y, count, 1)
+                        x += count * step_x
+                        shelf_height = max(shelf_height, height)
+                        first += count
+                        remaining -= count
+                        continue
+                    # Close the shelf
+                    x, y, shelf_height = left, y + shelf_height + spacing, 0
+                
+                if y + height > bottom:
+                    sheet, y = sheet + 1, top
+                
+                cols = (right - left + spacing) // step_x
+                rows = (bottom - y + spacing) // step_y
+                if y == top and remaining >= cols * rows:
+                    # Whole sheets of this label
+                    sheets = remaining // (cols * rows)
+                    count = sheets * cols * rows
+                    self._add_block(spec, first, count, sheet, left, y, cols, rows)
+                    sheet += sheets
+                elif remaining >= cols:
+                    # Full shelves on the current sheet
+                    rows = min(rows, remaining // cols)
+                    count = rows * cols
+                    self._add_block(spec, first, count, sheet, left, y, cols, rows)
+                    y += rows * step_y
+                else:
+                    # A partial shelf, left open for the next spec
+                    count = remaining
+                    self._add_block(spec, first, count, sheet, left, y, count, 1)
+                    x, shelf_height = left + count * step_x, height
+                first += count
+                remaining -= count
+    
+    def __len__(self):
+        return self.total
+    
+    def position(self, index):
+        """Return (sheet, x, y) for label ``index``"""
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        block = bisect_right(self.block_first, index) - 1
+        cols = self.block_cols[block]
+        page, slot = divmod(index - self.block_first[block], cols * self.block_rows[block])
+        row, col = divmod(slot, cols)
+        width, height = self.sizes[self.block_spec[block]]
+        return (self.block_sheet[block] + page,
+                self.block_x[block] + col * (width + self.spacing),
+                self.block_y[block] + row * (height + self.spacing))
+    
+    def label(self, index):
+        """Return (number, title) for label ``index``"""
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        spec = bisect_right(self.offsets, index) - 1
+        number = self.numbers[spec]
+        if isinstance(number, SerialRun):
+            return number.labels(index - self.offsets[spec], 1)[0]
+        return number, self.titles[spec]
+    
+    def segments(self, start, stop):
+        """Yield (spec, first_index, count) for the specs covering labels start..stop-1"""
+        spec = bisect_right(self.offsets, start) - 1
+        index = start
+        while index < stop and spec < len(self.numbers):
+            run_end = min(stop, self.offsets[spec + 1])
+            if run_end > index:
+                yield spec, index, run_end - index
+                index = run_end
+            spec += 1
+    
+    def runs(self, start, stop):
+        """Yield (number, title, first_index, count) runs covering labels start..stop-1
+        
+        Serial ranges yield one run per label.
+        """
+        for spec, first, count in self.segments(start, stop):
+            number = self.numbers[spec]
+            if isinstance(number, SerialRun):
+                for offset, (serial, title) in enumerate(number.labels(first - self.offsets[spec], count)):
+                    yield serial, title, first + offset, 1
             else:
-                barcode_img = generate_single_barcode(current_number, options)
-            
-            # Calculate position
-            x = start_x + col * (barcode_width + 10)
-            y = start_y + row * (barcode_height + 10)
-            
-            # Paste barcode on canvas
-            canvas.paste(barcode_img, (x, y))
-            
-            title_info = f" ('{current_title}')" if current_title else ""
-            print(f"Generated barcode {i+1}/{total_barcodes}: {current_number}{title_info} (Sheet {sheet_num + 1})")
+                yield number, self.titles[spec], first, count
+    
+    def sheet_range(self, sheet):
+        """Return the (start, stop) label indices on ``sheet``"""
+        if not 0 <= sheet < self.sheets:
+            raise IndexError(f"Sheet {sheet} is out of range (job has {self.sheets})")
+        return self.sheet_first[sheet], self.sheet_first[sheet + 1]
+    
+    def placements(self, sheet):
+        """Yield (number, title, x, y) for every label on ``sheet``"""
+        for number, title, first, count in self.runs(*self.sheet_range(sheet)):
+            for index in range(first, first + count):
+                _, x, y = self.position(index)
+                yield number, title, x, y
+    
+    @property
+    def page_mode(self):
+        """Mode sheets go to the PDF writer in: greyscale for RGB jobs (labels
+        only hold greys, so nothing is lost and no RGB copy is made), else the
+        job's own mode"""
+        return 'L' if self.mode == 'RGB' else self.mode
+    
+    def utilization(self):
+        """Return one dict per sheet with its label count and the share of the
+        printable area (inside the margins) covered by labels"""
+        return [
+            {
+                'sheet': sheet + 1,
+                'labels': self.sheet_first[sheet + 1] - self.sheet_first[sheet],
+                'utilization': self.sheet_used[sheet] / self.printable_area,
+            }
+            for sheet in range(self.sheets)
+        ]
+
+def plan_sheets(barcode_specs, mode='RGB', dpi=300, metrics=None):
+    """Work out where every label goes and return the job's LayoutPlan
+    
+    ``metrics`` is an optional metrics.RenderMetrics that records the
+    planning time and the job size. The label sizes and per-sheet
+    utilization are logged at INFO level.
+    """
+    metrics = metrics or NULL_METRICS
+    with metrics.timer('plan'):
+        plan = _plan_sheets(barcode_specs, mode, dpi)
+    metrics.set_job(plan.total, plan.sheets)
+    
+    if logger.isEnabledFor(logging.INFO):
+        report = plan.utilization()
+        logger.info("Label sizes: %s pixels", ', '.join(f'{w}x{h}' for w, h in sorted(set(plan.sizes))))
+        logger.info("Total barcodes to generate: %d", plan.total)
+        logger.info("Sheets needed: %d", plan.sheets)
+        if len(report) <= 20:
+            for row in report:
+                logger.info("  Sheet %d: %d labels, %.1f%% of printable area used",
+                            row['sheet'], row['labels'], 100 * row['utilization'])
+        else:
+            average = sum(row['utilization'] for row in report) / len(report)
+            logger.info("  Average utilization: %.1f%% of printable area used", 100 * average)
+    
+    return plan
+
+# Barcode generation options (sizes in mm, font in pt) - smaller for fitting more on page
+LABEL_OPTIONS = {
+    'module_width': 0.25,  # Reduced width for smaller barcodes
+    'module_height': 8.0,  # Reduced height
+    'quiet_zone': 3.0,     # Smaller quiet zone
+    'font_size': 6,        # Smaller font
+    'text_distance': 3.0,  # Less distance
+    'background': 'white',
+    'foreground': 'black',
+}
+
+def _plan_sheets(barcode_specs, mode, dpi):
+    options = dict(LABEL_OPTIONS)
+    
+    if not barcode_specs:
+        raise ValueError("No barcode specifications provided")
+    
+    # Measure each distinct label once (no rendering needed); a serial range
+    # is measured once per digit count using its widest possible title
+    title_font_size = max(1, 30 * dpi // 300)
+    widest_digit = max('0123456789', key=lambda digit: measure_title(digit, title_font_size)[2])
+    tile_sizes = []
+    for spec in expand_specs(barcode_specs):
+        number, title = spec['number'], spec.get('title', '')
+        if isinstance(number, SerialRun):
+            number, title = number.sample(spec['count'], widest_digit)
+        tile_sizes.append(tile_size(number, title, options, dpi=dpi, mode=mode))
+    
+    # A4 at 300 DPI (2480 x 3508 pixels) with 100px margins and 10px spacing,
+    # scaled for other resolutions
+    page_size = (round(2480 * dpi / 300), round(3508 * dpi / 300))
+    margin = round(100 * dpi / 300)
+    return LayoutPlan(barcode_specs, tile_sizes, page_size=page_size, margins=(margin,) * 4,
+                      spacing=round(10 * dpi / 300), options=options, mode=mode, dpi=dpi)
+
+def render_pages(plan, pages=None, workers=None, metrics=None, mode=None):
+    """Render selected sheets of a plan, yielding them in the order requested
+    
+    Args:
+        plan: LayoutPlan from plan_sheets
+        pages: Iterable of 0-based sheet numbers (e.g. [36] to reprint page 37);
+               None renders every sheet
+        workers: As for create_multi_barcode_sheet
+        metrics: Optional metrics.RenderMetrics; gets the encode, rasterize,
+                 compose and paste times, tile cache counters and a 'render'
+                 progress call per sheet
+        mode: Mode of the yielded sheets; defaults to ``plan.mode``. 'L' (see
+              LayoutPlan.page_mode) hands RGB jobs over as greyscale sheets
+              that wrap the compositor's buffer without a copy.
+    
+    Any page can be rendered without rendering the pages before it. A page
+    identical to the one before it is yielded as the same Image object rather
+    than rendered again, so drawing on one changes both; copy() a sheet
+    before drawing on it.
+    """
+    metrics = metrics or NULL_METRICS
+    mode = mode or plan.mode
+    if mode != plan.mode and (mode, plan.mode) != ('L', 'RGB'):
+        raise ValueError(f"Cannot render a {plan.mode} job as {mode} sheets")
+    pages = list(range(plan.sheets)) if pages is None else list(pages)
+    for sheet in pages:
+        plan.sheet_range(sheet)   # validate before starting any work
+    
+    # A page identical to the one before it (a spec filling several whole
+    # pages) is rendered once and yielded again as the same Image object
+    fingerprints = [sheet_fingerprint(plan, sheet) for sheet in pages]
+    distinct = [sheet for i, sheet in enumerate(pages) if i == 0 or fingerprints[i] != fingerprints[i - 1]]
+    
+    workers = resolve_workers(workers)
+    if workers > 1 and len(distinct) >= PARALLEL_MIN_SHEETS:
+        sheets = _render_sheets_parallel(plan, distinct, workers, metrics, mode)
+    else:
+        sheets = _render_sheets_serial(plan, distinct, metrics, mode)
+    sheet = None
+    with contextlib.closing(sheets):
+        for done in range(len(pages)):
+            if done == 0 or fingerprints[done] != fingerprints[done - 1]:
+                sheet = next(sheets)
+            else:
+                metrics.count('sheets.repeated')
+            metrics.progress('render', done + 1, len(pages))
+            yield sheet
+    del sheet
+
+def _render_sheets_serial(plan, pages, metrics, mode):
+    for sheet in pages:
+        before = tile_cache.stats(), title_strip_cache.stats()
+        canvas = _render_sheet(plan, sheet, metrics, mode)
+        metrics.count_cache('tile_cache', before[0], tile_cache.stats())
+        metrics.count_cache('title_strip_cache', before[1], title_strip_cache.stats())
+        yield canvas
+        del canvas
+
+def render_preview(plan, sheet_num, max_size=(600, 800)):
+    """Render one sheet straight at screen resolution for a preview
+    
+    Each distinct tile is scaled down once (and cached) and pasted at its
+    scaled position on a small greyscale canvas, so the full-resolution sheet
+    is never rasterized. Returns a mode 'L' image that fits in ``max_size``.
+    """
+    scale = min(max_size[0] / plan.page_size[0], max_size[1] / plan.page_size[1])
+    # Share full-size tiles with sheet rendering (see _compose_sheet)
+    tile_mode = '1' if plan.mode == '1' else 'L'
+    canvas = Image.new('L', (max(1, round(plan.page_size[0] * scale)), max(1, round(plan.page_size[1] * scale))), 'white')
+    
+    def shrink(tile):
+        size = (max(1, round(tile.width * scale)), max(1, round(tile.height * scale)))
+        return tile.convert('L').resize(size, Image.Resampling.LANCZOS)
+    
+    for spec, first, count in plan.segments(*plan.sheet_range(sheet_num)):
+        number = plan.numbers[spec]
+        if isinstance(number, SerialRun):
+            offset = first - plan.offsets[spec]
+            labels = number.labels(offset, count)
+            patterns = number.patterns(offset, count)
+            tiles = (shrink(generate_barcode_with_title(serial, title, plan.options, dpi=plan.dpi, mode=tile_mode,
+                                                        pattern=pattern))
+                     for (serial, title), pattern in zip(labels, patterns))
+        else:
+            title = plan.titles[spec]
+            key = (TileCache.make_key(number, title, plan.options, plan.dpi, tile_mode), scale)
+            tile = preview_tile_cache.get(
+                key, lambda: shrink(get_barcode_tile(number, title, plan.options, dpi=plan.dpi, mode=tile_mode)))
+            tiles = (tile for _ in range(count))
         
-        sheets.append(canvas)
+        for index, tile in zip(range(first, first + count), tiles):
+            _, x, y = plan.position(index)
+            canvas.paste(tile, (round(x * scale), round(y * scale)))
     
-    # Return single sheet if only one, otherwise return list
-    return sheets[0] if len(sheets) == 1 else sheets
+    return canvas
+
+# Process pool settings for create_multi_barcode_sheet
+MAX_DEFAULT_WORKERS = 4
+# Below this many sheets process start-up costs more than it saves
+PARALLEL_MIN_SHEETS = 8
+
+def resolve_workers(workers=None):
+    """Turn a ``workers=`` argument into a concrete process count"""
+    if workers is None:
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+        return max(1, min(cpus, MAX_DEFAULT_WORKERS))
+    return max(1, int(workers))
+
+def _render_sheet(plan, sheet_num, metrics=NULL_METRICS, mode=None):
+    """Render one sheet of a plan as a PIL Image in ``mode`` (default ``plan.mode``)"""
+    compositor = _compose_sheet(plan, sheet_num, metrics)
+    with metrics.timer('compose'):
+        return compositor.image(mode)
+
+def _compose_sheet(plan, sheet_num, metrics=NULL_METRICS):
+    """Place every label of one sheet into a raster.SheetCompositor
+    
+    RGB sheets are composed from greyscale tiles (labels only hold greys), so
+    a shared tile is converted to an array once per segment and written with
+    slice assignments, a whole row at a time. Stages are timed per segment
+    rather than per label, so the quiet default costs a few clock reads per
+    sheet.
+    """
+    clock = time.perf_counter
+    tile_mode = '1' if plan.mode == '1' else 'L'
+    with metrics.timer('compose'):
+        compositor = SheetCompositor(plan.page_size, plan.mode)
+    
+    # Generate and place barcodes for this sheet
+    for spec, first, count in plan.segments(*plan.sheet_range(sheet_num)):
+        current_number = plan.numbers[spec]
+        if isinstance(current_number, SerialRun):
+            # Serial labels are all different: encode the page's share of the
+            # range in one batch and skip the shared tile cache
+            offset = first - plan.offsets[spec]
+            started = clock()
+            labels = current_number.labels(offset, count)
+            patterns = current_number.patterns(offset, count)
+            metrics.add('encode', clock() - started)
+            rasterize = paste = 0.0
+            for index, (serial, title), pattern in zip(range(first, first + count), labels, patterns):
+                started = clock()
+                barcode_img = tile_pixels(generate_barcode_with_title(serial, title, plan.options, dpi=plan.dpi,
+                                                                      mode=tile_mode, pattern=pattern))
+                pasted = clock()
+                _, x, y = plan.position(index)
+                compositor.paste(barcode_img, x, y)
+                rasterize += pasted - started
+                paste += clock() - pasted
+            metrics.add('rasterize', rasterize, count)
+            metrics.add('paste', paste, count)
+            continue
+        
+        # Generate barcode with or without title (cached per distinct label)
+        current_title = plan.titles[spec]
+        with metrics.timer('rasterize'):
+            barcode_img = tile_pixels(get_barcode_tile(current_number, current_title, plan.options, dpi=plan.dpi,
+                                                       mode=tile_mode))
+        
+        started = clock()
+        compositor.paste_many(barcode_img, (plan.position(index)[1:] for index in range(first, first + count)))
+        metrics.add('paste', clock() - started, count)
+    
+    return compositor
+
+def _render_sheet_range(job):
+    """Process pool entry point: render a range of sheets and return them as raw bytes
+    
+    RGB sheets only contain black, white and anti-aliased grey, so they travel
+    back as 8-bit greyscale buffers (a third of the RGB size) and are expanded to
+    RGB again in the parent without any loss. Bilevel sheets travel as packed bits.
+    """
+    plan, pages, instrumented = job
+    metrics = RenderMetrics() if instrumented else NULL_METRICS
+    before = tile_cache.stats(), title_strip_cache.stats()
+    rendered = []
+    for sheet_num in pages:
+        compositor = _compose_sheet(plan, sheet_num, metrics)
+        with metrics.timer('compose'):
+            rendered.append(compositor.tobytes())
+        del compositor
+    if not instrumented:
+        return rendered, None
+    metrics.count_cache('tile_cache', before[0], tile_cache.stats())
+    metrics.count_cache('title_strip_cache', before[1], title_strip_cache.stats())
+    return rendered, metrics.stage_totals()
+
+def _render_sheets_parallel(plan, pages, workers, metrics=NULL_METRICS, mode=None):
+    """Render sheets on a process pool, yielding them in the order of ``pages``
+    
+    Workers receive the plan itself (a few lists sized by the number of specs)
+    and the sheet numbers to draw. Jobs are submitted lazily with at most two
+    per worker in flight, so memory stays bounded no matter how many sheets
+    the job has. Stage times and cache counters from the workers are merged
+    into ``metrics``.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from collections import deque
+    
+    # Small contiguous ranges keep the pool busy without holding many sheets
+    chunk = max(1, min(4, len(pages) // (workers * 4)))
+    instrumented = metrics is not NULL_METRICS
+    job_iter = ((plan, pages[first:first + chunk], instrumented) for first in range(0, len(pages), chunk))
+    
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for job in job_iter:
+                pending.append(executor.submit(_render_sheet_range, job))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                rendered, totals = pending.popleft().result()
+                if totals is not None:
+                    metrics.merge(totals)
+                next_job = next(job_iter, None)
+                if next_job is not None:
+                    pending.append(executor.submit(_render_sheet_range, next_job))
+                for data in rendered:
+                    with metrics.timer('compose'):
+                        if plan.mode == 'RGB':
+                            sheet = Image.frombuffer('L', plan.page_size, data, 'raw', 'L', 0, 1)
+                            if mode != 'L':
+                                sheet = sheet.convert('RGB')
+                        else:
+                            sheet = Image.frombytes(plan.mode, plan.page_size, data)
+                    yield sheet
+                    del sheet
+                del rendered
+        finally:
+            # Closed early (e.g. a cancelled job): drop the ranges not yet started
+            for future in pending:
+                future.cancel()
 
 def save_sheets_as_pdf(sheets, filename):
-    """Save multiple sheets as a single PDF file"""
-    if not isinstance(sheets, list):
+    """Save multiple sheets as a single PDF file
+    
+    ``filename`` may also be a binary file-like object such as io.BytesIO.
+    """
+    if isinstance(sheets, Image.Image):
         sheets = [sheets]
     
-    if len(sheets) == 1:
-        sheets[0].save(filename, format='PDF', dpi=(300, 300))
-    else:
-        # Save first sheet as PDF and append others
-        sheets[0].save(filename, format='PDF', dpi=(300, 300), save_all=True, append_images=sheets[1:])
+    write_sheets_pdf(sheets, filename)
+
+def sheets_pdf_bytes(sheets, dpi=300, bilevel_compression='flate'):
+    """Return the PDF for ``sheets`` as bytes, without touching the filesystem"""
+    if isinstance(sheets, Image.Image):
+        sheets = [sheets]
+    buffer = io.BytesIO()
+    write_sheets_pdf(sheets, buffer, dpi=dpi, bilevel_compression=bilevel_compression)
+    return buffer.getvalue()
+
+def write_sheets_pdf(sheets, fp, dpi=300, bilevel_compression='flate', metrics=None):
+    """Stream sheets (any iterable, e.g. iter_barcode_sheets) into a PDF
+    
+    Each page is written out and released before the next one is pulled, so
+    peak memory is about one sheet. ``fp`` is a filename or a binary file-like
+    object. Bilevel (mode '1') sheets are stored losslessly with
+    ``bilevel_compression`` 'flate' (the default) or 'group4' (CCITT G4).
+    ``metrics`` (a metrics.RenderMetrics) gets the encode-and-write time per
+    page and a 'write' progress call. Returns the number of pages written.
+    """
+    if metrics is None:
+        return write_pdf(sheets, fp, dpi=dpi, bilevel_compression=bilevel_compression)
+    with PdfStreamWriter(fp, dpi=dpi, bilevel_compression=bilevel_compression) as pdf:
+        for sheet in sheets:
+            with metrics.timer('pdf_write'):
+                pdf.add_page(sheet)
+            del sheet
+            metrics.progress('write', pdf.page_count, metrics.sheets)
+        return pdf.page_count
+
+def sheet_fingerprint(plan, sheet_num):
+    """Content hash of one sheet: page setup plus every label and its position
+    
+    Two sheets with the same fingerprint render to the same pixels, whichever
+    job or spec list they came from.
+    """
+    digest = hashlib.sha256(repr((plan.page_size, plan.dpi, plan.mode, sorted(plan.options.items()))).encode('utf-8'))
+    for number, title, x, y in plan.placements(sheet_num):
+        digest.update(repr((str(number), title, x, y)).encode('utf-8'))
+    return digest.hexdigest()
+
+def write_plan_pdf(plan, fp, cache=None, workers=None, bilevel_compression='flate', on_page=None, metrics=None):
+    """Write a plan's sheets to a PDF, rendering each distinct sheet once
+    
+    Sheets with the same fingerprint (the same labels in the same places, e.g.
+    the full pages of a large single-barcode spec) are rendered and embedded
+    once; the repeats are pages that point at the first one's image, so time
+    and file size follow the number of distinct pages.
+    
+    Encoded pages are kept in ``cache`` (anything with ``get(key, count)`` and
+    ``put(key, bytes)``, e.g. a render_cache.RenderCache) under their sheet
+    fingerprint. When a list edit leaves a sheet's labels and positions alone,
+    the stored page is written again without rendering or encoding. Only the
+    dirty sheets go through render_pages. ``on_page(sheet_num, image,
+    fingerprint)`` is called for every page in order, with ``image=None`` for
+    reused and repeated pages. ``metrics`` (a metrics.RenderMetrics) is passed
+    on to render_pages and also gets the PDF write time, page counters and a
+    'write' progress call per page.
+    
+    Returns {'pages', 'rendered', 'reused', 'repeated'}: distinct pages
+    rendered now, distinct pages taken from the cache, and pages that repeat
+    an earlier page of this PDF. The same counts are logged at INFO level.
+    """
+    metrics = metrics or NULL_METRICS
+    keys = [f"page-v{CACHE_VERSION}-{sheet_fingerprint(plan, sheet)}-{bilevel_compression}" for sheet in range(plan.sheets)]
+    first_sheets = {}
+    for sheet, key in enumerate(keys):
+        first_sheets.setdefault(key, sheet)
+    unique = list(first_sheets.values())
+    
+    reused = {}
+    if cache is not None:
+        for sheet in unique:
+            # Page lookups are companions of the job lookup: keep them out of the hit rate
+            blob = cache.get(keys[sheet], count=False)
+            if blob is not None:
+                reused[sheet] = EncodedPage.from_bytes(blob)
+    dirty = [sheet for sheet in unique if sheet not in reused]
+    rendered = render_pages(plan, pages=dirty, workers=workers, metrics=metrics, mode=plan.page_mode)
+    
+    # An exception from on_page or metrics (e.g. a cancelled job) stops the
+    # renderer straight away instead of when the generator is collected
+    with contextlib.closing(rendered), \
+            PdfStreamWriter(fp, dpi=plan.dpi, bilevel_compression=bilevel_compression) as pdf:
+        for sheet, key in enumerate(keys):
+            image = None
+            if pdf.has_page(key):
+                with metrics.timer('pdf_write'):
+                    pdf.repeat_page(key)
+            else:
+                page = reused.pop(sheet, None)
+                if page is None:
+                    image = next(rendered)
+                    started = time.perf_counter()
+                    page = encode_page(image, bilevel_compression)
+                    metrics.add('pdf_write', time.perf_counter() - started, 0)
+                    if cache is not None:
+                        cache.put(key, page.to_bytes())
+                with metrics.timer('pdf_write'):
+                    pdf.add_encoded_page(page, key=key)
+                del page
+            metrics.progress('write', sheet + 1, plan.sheets)
+            if on_page is not None:
+                on_page(sheet, image, key)
+            del image
+    
+    stats = {
+        'pages': plan.sheets,
+        'rendered': len(dirty),
+        'reused': len(unique) - len(dirty),
+        'repeated': plan.sheets - len(unique),
+    }
+    for name in ('rendered', 'reused', 'repeated'):
+        metrics.count(f'pages.{name}', stats[name])
+    logger.info("Pages: %d rendered, %d reused, %d repeated", stats['rendered'], stats['reused'], stats['repeated'])
+    return stats
+
+def write_vector_pdf(barcode_specs, fp):
+    """Write barcode sheets as a vector PDF (filled rectangles and embedded-font text)
+    
+    Uses the same grid and margins as create_multi_barcode_sheet, but instead of
+    300 DPI bitmaps each distinct label is defined once as a Form XObject and
+    placed wherever it appears, so files stay in the kilobyte range and print
+    crisply at any resolution. ``fp`` is a filename or binary file-like object.
+    Returns the number of pages written.
+    
+    When the title font cannot be embedded (see vector_pdf.can_embed) the
+    sheets are written as a raster PDF instead, so the layout stays the same.
+    """
+    from vector_pdf import VectorSheetWriter, can_embed, label_geometry
+    plan = plan_sheets(barcode_specs)
+    title_font = get_font(size=30)
+    if not can_embed(title_font):
+        logger.warning("Title font %s cannot be embedded; writing a raster PDF instead",
+                       getattr(title_font, 'path', title_font))
+        write_plan_pdf(plan, fp)
+        return plan.sheets
+    
+    with VectorSheetWriter(fp, plan.page_size) as writer:
+        for sheet_num in range(plan.sheets):
+            placements = []
+            for number, title, x, y in plan.placements(sheet_num):
+                key = (str(number), title)
+                if key not in writer.forms:
+                    writer.add_form(key, label_geometry(number, title, plan.options, title_font))
+                placements.append((key, x, y))
+            writer.add_page(placements)
+        return writer.close()
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     try:
         # Starting number for barcodes
         start_number = 1120000250608
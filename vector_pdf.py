@@ -0,0 +1,390 @@
+# Vector PDF output: bars as filled rectangles, text in an embedded (subset) font
+
+from barcode.codex import Code128
+from barcode.writer import mm2px, pt2mm
+from raster import _text_font, resolve_writer_settings
+from pdf_writer import PdfStreamWriter
+import hashlib
+import struct
+import zlib
+
+# Tables a PDF viewer needs from an embedded TrueType program (ISO 32000-1, 9.9)
+_REQUIRED_TABLES = (b'cvt ', b'fpgm', b'glyf', b'head', b'hhea', b'hmtx', b'loca', b'maxp', b'prep')
+
+def _table_checksum(data):
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack(f'>{len(data) // 4}I', data)) & 0xFFFFFFFF
+
+class TrueTypeFont:
+    """Just enough of a TrueType font to embed a glyph subset in a PDF"""
+
+    def __init__(self, data):
+        if data[:4] not in (b'\0\1\0\0', b'true'):
+            raise ValueError("Only single TrueType (glyf) fonts can be embedded")
+        self.data = data
+        num_tables = struct.unpack_from('>H', data, 4)[0]
+        self.tables = {}
+        for index in range(num_tables):
+            tag, _checksum, offset, length = struct.unpack_from('>4sIII', data, 12 + 16 * index)
+            self.tables[tag] = data[offset:offset + length]
+
+        head = self.tables[b'head']
+        self.units_per_em = struct.unpack_from('>H', head, 18)[0]
+        self.bbox = struct.unpack_from('>hhhh', head, 36)
+        long_loca = struct.unpack_from('>h', head, 50)[0] == 1
+
+        hhea = self.tables[b'hhea']
+        self.ascent, self.descent = struct.unpack_from('>hh', hhea, 4)
+        num_hmetrics = struct.unpack_from('>H', hhea, 34)[0]
+        self.num_glyphs = struct.unpack_from('>H', self.tables[b'maxp'], 4)[0]
+
+        hmtx = self.tables[b'hmtx']
+        advances = [struct.unpack_from('>H', hmtx, 4 * i)[0] for i in range(num_hmetrics)]
+        self.advances = advances + [advances[-1]] * (self.num_glyphs - num_hmetrics)
+
+        loca = self.tables[b'loca']
+        if long_loca:
+            self.loca = struct.unpack(f'>{self.num_glyphs + 1}I', loca[:4 * (self.num_glyphs + 1)])
+        else:
+            self.loca = [2 * v for v in struct.unpack(f'>{self.num_glyphs + 1}H', loca[:2 * (self.num_glyphs + 1)])]
+
+        self.cmap = self._read_cmap(self.tables[b'cmap'])
+
+    @classmethod
+    def from_pil(cls, font):
+        """Load the font file behind a PIL FreeTypeFont"""
+        source = font.path
+        if isinstance(source, (str, bytes)):
+            with open(source, 'rb') as handle:
+                return cls(handle.read())
+        source.seek(0)
+        return cls(source.read())
+
+    @staticmethod
+    def _read_cmap(cmap):
+        """Read the Unicode BMP (3, 1) format 4 subtable into {codepoint: glyph id}"""
+        num_subtables = struct.unpack_from('>H', cmap, 2)[0]
+        for index in range(num_subtables):
+            platform, encoding, offset = struct.unpack_from('>HHI', cmap, 4 + 8 * index)
+            if (platform, encoding) in ((3, 1), (0, 3)) and struct.unpack_from('>H', cmap, offset)[0] == 4:
+                break
+        else:
+            raise ValueError("Font has no Unicode BMP cmap")
+
+        seg_count = struct.unpack_from('>H', cmap, offset + 6)[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * seg_count + 2
+        deltas_at = starts_at + 2 * seg_count
+        ranges_at = deltas_at + 2 * seg_count
+        mapping = {}
+        for seg in range(seg_count):
+            end = struct.unpack_from('>H', cmap, ends_at + 2 * seg)[0]
+            start = struct.unpack_from('>H', cmap, starts_at + 2 * seg)[0]
+            delta = struct.unpack_from('>h', cmap, deltas_at + 2 * seg)[0]
+            range_offset = struct.unpack_from('>H', cmap, ranges_at + 2 * seg)[0]
+            for code in range(start, min(end, 0xFFFE) + 1):
+                if range_offset == 0:
+                    glyph = (code + delta) & 0xFFFF
+                else:
+                    at = ranges_at + 2 * seg + range_offset + 2 * (code - start)
+                    glyph = struct.unpack_from('>H', cmap, at)[0]
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def glyph_id(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def _components(self, glyph):
+        """Glyph ids referenced by a composite glyph"""
+        data = self.tables[b'glyf'][self.loca[glyph]:self.loca[glyph + 1]]
+        if len(data) < 10 or struct.unpack_from('>h', data, 0)[0] >= 0:
+            return []
+        components = []
+        at = 10
+        while True:
+            flags, component = struct.unpack_from('>HH', data, at)
+            components.append(component)
+            at += 4 + (4 if flags & 0x0001 else 2)
+            if flags & 0x0008:
+                at += 2
+            elif flags & 0x0040:
+                at += 4
+            elif flags & 0x0080:
+                at += 8
+            if not flags & 0x0020:
+                return components
+
+    def subset(self, glyphs):
+        """Return a font program keeping only ``glyphs`` (ids are unchanged)
+
+        Unused glyphs become empty outlines, so the character-to-glyph mapping
+        written into the PDF stays valid without rebuilding cmap or hmtx.
+        """
+        keep = {0}
+        pending = list(glyphs)
+        while pending:
+            glyph = pending.pop()
+            if glyph not in keep and glyph < self.num_glyphs:
+                keep.add(glyph)
+                pending.extend(self._components(glyph))
+
+        glyf = self.tables[b'glyf']
+        new_glyf = bytearray()
+        offsets = []
+        for glyph in range(self.num_glyphs):
+            offsets.append(len(new_glyf))
+            if glyph in keep:
+                new_glyf += glyf[self.loca[glyph]:self.loca[glyph + 1]]
+                new_glyf += b'\0' * (-len(new_glyf) % 4)
+        offsets.append(len(new_glyf))
+
+        tables = {tag: self.tables[tag] for tag in _REQUIRED_TABLES if tag in self.tables}
+        tables[b'glyf'] = bytes(new_glyf)
+        tables[b'loca'] = struct.pack(f'>{len(offsets)}I', *offsets)
+        head = bytearray(self.tables[b'head'])
+        head[8:12] = b'\0\0\0\0'                 # checkSumAdjustment
+        head[50:52] = struct.pack('>h', 1)       # long loca offsets
+        tables[b'head'] = bytes(head)
+
+        tags = sorted(tables)
+        search_range = 1
+        entry_selector = 0
+        while search_range * 2 <= len(tags):
+            search_range *= 2
+            entry_selector += 1
+        directory = struct.pack('>IHHHH', 0x00010000, len(tags), search_range * 16, entry_selector,
+                                len(tags) * 16 - search_range * 16)
+        offset = 12 + 16 * len(tags)
+        body = b''
+        for tag in tags:
+            table = tables[tag]
+            directory += struct.pack('>4sIII', tag, _table_checksum(table), offset + len(body), len(table))
+            body += table + b'\0' * (-len(table) % 4)
+        return directory + body
+
+def can_embed(font):
+    """True when a PIL font's file is a single TrueType (glyf) font that can be subset
+
+    CFF-flavoured OpenType (.otf) and collection (.ttc) files cannot.
+    """
+    try:
+        TrueTypeFont.from_pil(font)
+    except (AttributeError, KeyError, OSError, ValueError, struct.error):
+        return False
+    return True
+
+class EmbeddedFont:
+    """A Type0 (Identity-H) font whose subset is written when the PDF closes"""
+
+    def __init__(self, pdf, font):
+        self.pdf = pdf
+        self.font = font
+        self.object_id = pdf.reserve_id()
+        self.used = {}
+
+    def encode(self, text):
+        """Return the hex string operand for ``text`` and record the glyphs used"""
+        codes = []
+        for char in text:
+            glyph = self.font.glyph_id(char)
+            self.used.setdefault(glyph, char)
+            codes.append(b'%04X' % glyph)
+        return b'<' + b''.join(codes) + b'>'
+
+    def write(self):
+        font = self.font
+        scale = 1000.0 / font.units_per_em
+        tag = hashlib.sha1(repr(sorted(self.used)).encode()).hexdigest()[:6].upper().translate(
+            str.maketrans('0123456789', 'GHIJKLMNOP'))
+        name = b'%s+EmbeddedFont%d' % (tag.encode(), self.object_id)
+
+        program = font.subset(self.used)
+        file_id = self.pdf.reserve_id()
+        self.pdf.write_object(file_id, b"<< /Filter /FlateDecode /Length1 %d >>" % len(program), zlib.compress(program, 9))
+
+        descriptor_id = self.pdf.reserve_id()
+        self.pdf.write_object(
+            descriptor_id,
+            b"<< /Type /FontDescriptor /FontName /%s /Flags 4 /FontBBox [%d %d %d %d] /ItalicAngle 0 "
+            b"/Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>"
+            % ((name,) + tuple(int(v * scale) for v in font.bbox)
+               + (int(font.ascent * scale), int(font.descent * scale), int(font.ascent * scale), file_id)),
+        )
+
+        widths = b" ".join(b"%d [%d]" % (glyph, round(font.advances[glyph] * scale)) for glyph in sorted(self.used))
+        cid_font_id = self.pdf.reserve_id()
+        self.pdf.write_object(
+            cid_font_id,
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor %d 0 R /CIDToGIDMap /Identity /W [%s] >>" % (name, descriptor_id, widths),
+        )
+
+        # ToUnicode map so text in the PDF can be searched and copied
+        mappings = b"\n".join(b"<%04X> <%s>" % (glyph, char.encode('utf-16-be').hex().upper().encode())
+                              for glyph, char in sorted(self.used.items()))
+        cmap = (b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+                b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def "
+                b"/CMapName /Adobe-Identity-UCS def /CMapType 2 def "
+                b"1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+                b"%d beginbfchar\n%s\nendbfchar endcmap CMapName currentdict /CMap defineresource pop end end"
+                % (len(self.used), mappings))
+        to_unicode_id = self.pdf.reserve_id()
+        self.pdf.write_object(to_unicode_id, b"<< >>", cmap)
+
+        self.pdf.write_object(
+            self.object_id,
+            b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H "
+            b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (name, cid_font_id, to_unicode_id),
+        )
+
+def _number(value):
+    """Format a coordinate compactly for a content stream"""
+    return (b"%.3f" % value).rstrip(b'0').rstrip(b'.')
+
+def label_geometry(number, title, options, title_font, dpi=300):
+    """Describe a label (barcode plus optional title) as vector primitives
+
+    Uses the same sizes and positions as the raster tiles from
+    generate_barcode_with_title, in pixels at ``dpi`` with y growing downwards.
+    Returns a dictionary with 'size', 'bars' as (x, y, width, height) and
+    'texts' as (font, size, x, baseline, text).
+    """
+    settings = resolve_writer_settings(number, options)
+    pattern = Code128(str(number)).build()[0]
+    width_mm, height_mm = settings.calculate_size(len(pattern), 1)
+    barcode_width = int(mm2px(width_mm, dpi))
+    barcode_height = int(mm2px(height_mm, dpi))
+
+    # Title layout mirrors generate_barcode_with_title
+    offset_x = offset_y = 0
+    width, height = barcode_width, barcode_height
+    texts = []
+    if title:
+        bbox = title_font.getbbox(title)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        text_padding = 10
+        title_section_height = text_height + (text_padding * 2)
+        width = max(barcode_width, text_width + (text_padding * 2))
+        height = barcode_height + title_section_height
+        ascent = title_font.getmetrics()[0]
+        texts.append((title_font, title_font.size, (width - text_width) // 2, text_padding + ascent, title))
+        offset_x = (width - barcode_width) // 2
+        offset_y = title_section_height
+
+    # Bars at their exact (unrounded) positions
+    bars = []
+    top = offset_y + mm2px(settings.margin_top, dpi)
+    bar_height = mm2px(settings.module_height, dpi)
+    xpos = settings.quiet_zone
+    for mod, _height_factor in settings.packed(pattern):
+        module = settings.module_width * abs(mod)
+        if mod > 0:
+            bars.append((offset_x + mm2px(xpos, dpi), top, mm2px(module, dpi), bar_height))
+        xpos += module
+
+    # Human-readable line, anchored middle/descender like ImageWriter
+    if settings.text:
+        size = int(mm2px(pt2mm(settings.font_size), dpi))
+        font = _text_font(settings.font_path, size)
+        centre = offset_x + mm2px(settings.quiet_zone + (xpos - settings.quiet_zone) / 2.0, dpi)
+        ypos = settings.margin_top + settings.module_height + settings.text_distance
+        for subtext in settings.text.split("\n"):
+            baseline = offset_y + mm2px(ypos, dpi) - font.getmetrics()[1]
+            texts.append((font, size, centre - font.getlength(subtext) / 2, baseline, subtext))
+            ypos += pt2mm(settings.font_size) / 2 + settings.text_line_distance
+
+    return {'size': (width, height), 'bars': bars, 'texts': texts}
+
+class VectorSheetWriter:
+    """Write barcode sheets as vector pages
+
+    Every distinct label becomes one Form XObject (rectangles for the bars,
+    text for the title and digits) that pages place as often as needed. Fonts
+    are embedded once per file as glyph subsets when the PDF is closed.
+    Coordinates are given in pixels at ``dpi``, top-left origin, matching the
+    raster sheet layout.
+    """
+
+    def __init__(self, fp, page_size, dpi=300):
+        self.pdf = PdfStreamWriter(fp, dpi=dpi)
+        self.page_size = page_size
+        self.dpi = dpi
+        self.forms = {}
+        self._fonts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pdf.__exit__(exc_type, exc, tb)
+
+    def _font(self, pil_font):
+        key = pil_font.path if isinstance(pil_font.path, str) else id(pil_font.path)
+        font = self._fonts.get(key)
+        if font is None:
+            font = EmbeddedFont(self.pdf, TrueTypeFont.from_pil(pil_font))
+            self._fonts[key] = font
+        return font
+
+    def add_form(self, key, geometry):
+        """Define a label once as a Form XObject; returns its resource name"""
+        form = self.forms.get(key)
+        if form is not None:
+            return form[0]
+
+        width, height = geometry['size']
+        ops = [b"0 g"]
+        ops.extend(b"%s %s %s %s re" % (_number(x), _number(height - y - h), _number(w), _number(h))
+                   for x, y, w, h in geometry['bars'])
+        ops.append(b"f")
+        fonts = {}
+        for pil_font, size, x, baseline, text in geometry['texts']:
+            font = self._font(pil_font)
+            name = b"F%d" % font.object_id
+            fonts[name] = font.object_id
+            ops.append(b"BT /%s %d Tf %s %s Td %s Tj ET"
+                       % (name, size, _number(x), _number(height - baseline), font.encode(text)))
+
+        font_resources = b" ".join(b"/%s %d 0 R" % (name, object_id) for name, object_id in fonts.items())
+        form_id = self.pdf.reserve_id()
+        self.pdf.write_object(
+            form_id,
+            b"<< /Type /XObject /Subtype /Form /BBox [0 0 %d %d] /Filter /FlateDecode "
+            b"/Resources << /Font << %s >> >> >>" % (width, height, font_resources),
+            zlib.compress(b"\n".join(ops), 6),
+        )
+        name = b"L%d" % form_id
+        self.forms[key] = (name, form_id, height)
+        return name
+
+    def add_page(self, placements):
+        """Write one page from (form key, x, y) placements"""
+        page_width, page_height = self.page_size
+        scale = 72.0 / self.dpi
+        ops = [b"q %s 0 0 %s 0 0 cm" % (_number(scale), _number(scale))]
+        used = {}
+        for key, x, y in placements:
+            name, form_id, height = self.forms[key]
+            used[name] = form_id
+            ops.append(b"q 1 0 0 1 %d %d cm /%s Do Q" % (x, page_height - y - height, name))
+        ops.append(b"Q")
+
+        xobjects = b" ".join(b"/%s %d 0 R" % (name, form_id) for name, form_id in used.items())
+        resources = b"<< /ProcSet [/PDF /Text] /XObject << %s >> >>" % xobjects
+        self.pdf.add_content_page(b"\n".join(ops), resources, page_width * scale, page_height * scale, compress=True)
+
+    def close(self):
+        """Write the font subsets and finish the file; returns the page count"""
+        if not self.pdf.closed:
+            for font in self._fonts.values():
+                font.write()
+            self.pdf.close()
+        return self.pdf.page_count
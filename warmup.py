@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pre-warm the render pipeline so the first real job is as fast as the rest
+
+Importing the libraries, resolving the title font and rendering a small
+sample job fills the font, encoder and tile caches. Run it at image build
+time (fonts are seeded and bytecode is compiled) and in front of the server
+at container start, so an instance is warm before it takes traffic:
+
+    python warmup.py                                  # warm up and print the timings
+    python warmup.py --check                          # time a cold start; exit 1 over budget
+    python warmup.py streamlit run app.py ...         # warm up, then start Streamlit in this process
+
+Streamlit runs app.py inside the server process, so starting it from here
+lets every session share the warmed caches and imported modules.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Start-up budgets in seconds for a cold interpreter (see measure_startup)
+STARTUP_BUDGET = {
+    'import': 1.0,
+    'first_render': 0.5,
+}
+# Modules the render path must not import eagerly
+LAZY_MODULES = ('pandas', 'urllib.request', 'vector_pdf')
+
+# A tiny job touching the titled, untitled and serial-range paths
+SAMPLE_SPECS = [
+    {'number': '1120000250608', 'count': 2, 'title': 'Warm-up'},
+    {'number': '1120000250625', 'count': 2},
+    {'start': 1, 'count': 4, 'prefix': 'W'},
+]
+
+def prewarm(app=False, seed=False):
+    """Import the pipeline and render a sample job in every mode; return stage timings
+
+    With ``seed`` the fallback fonts are downloaded first (image build time).
+    With ``app`` the Streamlit app's own dependencies (pandas) are imported too.
+    """
+    import io
+
+    timings = {}
+    started = time.perf_counter()
+    import utils
+    if app:
+        import pandas  # noqa: F401
+        import spec_table  # noqa: F401
+    timings['import'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if seed:
+        utils.seed_fonts()
+    utils.get_font(size=30)
+    timings['fonts'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for mode in ('RGB', '1'):
+        plan = utils.plan_sheets(SAMPLE_SPECS, mode=mode)
+        utils.write_plan_pdf(plan, io.BytesIO(), workers=1)
+        utils.render_preview(plan, 0)
+    timings['render'] = time.perf_counter() - started
+    return {stage: round(seconds, 4) for stage, seconds in timings.items()}
+
+# Run in a fresh interpreter by measure_startup
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import cli, service, utils
+imported = time.perf_counter()
+utils.create_multi_barcode_sheet([{'number': '1120000250608', 'count': 1, 'title': 'Probe'}], workers=1)
+rendered = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_render': rendered - imported,
+    'eager_modules': [name for name in %r if name in sys.modules],
+}))
+"""
+
+def measure_startup():
+    """Time a cold start in a new interpreter: imports, then one titled label
+
+    Fonts are never downloaded during the probe (BARCODE_FONTS_OFFLINE).
+    """
+    import utils
+    env = dict(os.environ, **{utils.FONTS_OFFLINE_ENV: '1'})
+    result = subprocess.run([sys.executable, '-c', _PROBE % (LAZY_MODULES,)], capture_output=True, text=True,
+                            env=env, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in report.items()}
+
+def check_startup(report, budget=STARTUP_BUDGET):
+    """Return a message for every timing over budget and every eagerly imported module"""
+    problems = [f"{stage}: {report[stage]:.3f}s (budget {limit:.3f}s)"
+                for stage, limit in budget.items() if report[stage] > limit]
+    problems += [f"{name} is imported at start-up" for name in report['eager_modules']]
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm barcode rendering caches")
+    parser.add_argument('--seed-fonts', action='store_true', help="download the fallback fonts first (image build)")
+    parser.add_argument('--check', action='store_true', help="time a cold start instead; exit 1 when over budget")
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help="'streamlit run app.py ...' to start the app in this process once warm")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        report = measure_startup()
+        problems = check_startup(report)
+        print(json.dumps(report))
+        for message in problems:
+            print(f"SLOW START {message}", file=sys.stderr)
+        return 1 if problems else 0
+
+    streamlit = args.command[:1] == ['streamlit']
+    timings = prewarm(app=streamlit, seed=args.seed_fonts)
+    print(f"Warm-up: {json.dumps(timings)}", file=sys.stderr)
+    if args.command:
+        if not streamlit:
+            parser.error("only 'streamlit ...' can be started after warm-up")
+        from streamlit.web import cli as streamlit_cli
+        sys.argv = args.command
+        return streamlit_cli.main()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
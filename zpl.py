@@ -0,0 +1,160 @@
+# ZPL output for thermal label printers: the printer draws Code128 and titles itself
+
+import string
+
+from barcode.codex import Code128
+from barcode.writer import pt2mm
+from utils import LABEL_OPTIONS, SerialRun, expand_specs
+
+# Common thermal printer resolution (8 dots/mm); 300 and 600 DPI heads also exist
+DEFAULT_DPI = 203
+# Title text height at 300 DPI, as on the raster labels (get_font(size=30))
+TITLE_HEIGHT_300 = 30
+TITLE_PADDING_300 = 10
+# Width of a character of ZPL font 0 relative to its height, for sizing labels
+# (an estimate, so the output never depends on the fonts installed here)
+TITLE_CHAR_WIDTH = 0.6
+# ^SN can only count through this many digits
+SERIAL_MAX_DIGITS = 12
+# Characters that must go through ^FH hex escapes in field data
+_SPECIAL = '^~_\\'
+
+def _dots(mm, dpi):
+    return max(1, round(mm * dpi / 25.4))
+
+def _escape(text):
+    """Field data for ``text``: (prefix, data) where prefix is '^FH' when escapes were needed"""
+    if not any(char in _SPECIAL for char in text):
+        return '', text
+    return '^FH', ''.join(f"_{ord(char):02X}" if char in _SPECIAL else char for char in text)
+
+def _title_series(run):
+    """How a serial range's title changes from label to label
+
+    Returns ('', None) without a title, (text, None) for a fixed title,
+    (first_title, increment) when the title ends in a number that ^SN can
+    count, and None when every label needs its own format. The template has
+    already been checked by expand_specs.
+    """
+    if not run.title:
+        return '', None
+    parts = list(string.Formatter().parse(run.title))
+    fields = [field for _literal, field, _spec, _conversion in parts if field is not None]
+    first = run.labels(0, 1)[0][1]
+    if not fields:
+        return first, None
+    literal, field, spec, conversion = parts[-1]
+    if len(fields) > 1 or field is None or spec or conversion or any(char in _SPECIAL for char in first):
+        return None
+    if literal[-1:].isdigit():
+        return None
+    return first, 1 if field == 'index' else run.step
+
+def _serializable(run, count):
+    """True when a serial run can be one ^SN format: the serial ends the data after a non-digit"""
+    last = run.value(count - 1)
+    return (not run.prefix[-1:].isdigit()
+            and not any(char in _SPECIAL for char in run.prefix)
+            and len(str(max(run.start, last))) <= SERIAL_MAX_DIGITS)
+
+def label_format(number, title, count, dpi=DEFAULT_DPI, options=LABEL_OPTIONS, serial=None, title_step=None,
+                 title_sample=None):
+    """One ZPL label format: ``count`` copies of a barcode with an optional title
+
+    The sizes follow the raster labels (module width, bar height, quiet zone
+    and title height) converted to printer dots. With ``serial`` (the
+    increment) the barcode is a ^SN field that counts up on every copy;
+    ``title_step`` does the same for the title. ``title_sample`` is the
+    widest title, used to size the label.
+    """
+    number = str(number)
+    module = _dots(options['module_width'], dpi)
+    quiet = _dots(options['quiet_zone'], dpi)
+    bar_height = _dots(options['module_height'], dpi)
+    margin = _dots(1.0, dpi)
+    text_height = _dots(options['text_distance'] + pt2mm(options['font_size']), dpi)
+    barcode_width = len(Code128(number).build()[0]) * module + 2 * quiet
+
+    width, top, title_lines = barcode_width, margin, []
+    if title:
+        title_height = max(1, round(TITLE_HEIGHT_300 * dpi / 300))
+        padding = round(TITLE_PADDING_300 * dpi / 300)
+        sample = title_sample or title
+        width = max(barcode_width, round(len(sample) * title_height * TITLE_CHAR_WIDTH) + 2 * padding)
+        top = title_height + 2 * padding
+        escape, data = _escape(title.replace('\\', '\\\\'))
+        field = f"^SN{data},{title_step},N" if title_step is not None else f"{escape}^FD{data}"
+        title_lines.append(f"^FO0,{padding}^A0N,{title_height},{title_height}^FB{width},1,0,C{field}^FS")
+    height = top + bar_height + text_height + margin
+
+    escape, data = _escape(number)
+    field = f"^SN{data},{serial},N" if serial is not None else f"{escape}^FD{data}"
+    return "\n".join([
+        "^XA",
+        "^CI28",
+        f"^PW{width}",
+        f"^LL{height}",
+        *title_lines,
+        f"^BY{module}",
+        f"^FO{(width - barcode_width) // 2 + quiet},{top}^BCN,{bar_height},Y,N,N,A{field}^FS",
+        f"^PQ{count}",
+        "^XZ",
+    ]) + "\n"
+
+def label_formats(barcode_specs, dpi=DEFAULT_DPI):
+    """Yield the ZPL formats for a job, one per distinct label
+
+    Plain specs with the same number and title share one format whose print
+    quantity is their combined count (the first keeps its place in the job).
+    A serial range becomes one counting format per digit count when the
+    printer can do the counting (see _serializable), and one format per label
+    otherwise.
+    """
+    if not barcode_specs:
+        raise ValueError("No barcode specifications provided")
+
+    # [number, title, count, extra label_format arguments] in job order
+    formats = []
+    plain = {}
+    for spec in expand_specs(barcode_specs):
+        number, count = spec['number'], int(spec['count'])
+        if not isinstance(number, SerialRun):
+            key = (str(number), spec.get('title', '') or '')
+            if key in plain:
+                plain[key][2] += count
+            else:
+                plain[key] = [key[0], key[1], count, {}]
+                formats.append(plain[key])
+            continue
+
+        series = _title_series(number)
+        if series is not None and _serializable(number, count):
+            title, title_step = series
+            last_title = number.labels(count - 1, 1)[0][1]
+            formats.append([f"{number.prefix}{number.start}", title, count, {
+                'serial': number.step,
+                'title_step': title_step,
+                'title_sample': max(title, last_title, key=len),
+            }])
+        else:
+            formats.extend([label, title, 1, {}] for label, title in number.labels(0, count))
+
+    for number, title, count, extra in formats:
+        yield label_format(number, title, count, dpi, **extra)
+
+def write_zpl(barcode_specs, fp, dpi=DEFAULT_DPI):
+    """Write a job as a ZPL command stream for a label printer at ``dpi``
+
+    Instead of raster pages the printer gets one short format per distinct
+    label and prints it as often as needed, drawing the barcode and title
+    itself, so thousands of labels take a few kilobytes. ``fp`` is a filename
+    or binary file-like object. Returns the number of label formats written.
+    """
+    if isinstance(fp, str):
+        with open(fp, 'wb') as handle:
+            return write_zpl(barcode_specs, handle, dpi)
+    written = 0
+    for label in label_formats(barcode_specs, dpi):
+        fp.write(label.encode('utf-8'))
+        written += 1
+    return written